@@ -8,11 +8,23 @@ import click
 import uvicorn
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option('--port', default=8080, help='Port to run server')
 @click.option('--reload', is_flag=True, help='Enable auto-reload for development')
-def main(port: int, reload: bool):
+@click.option(
+    '--backend',
+    type=click.Choice(['asyncio', 'process', 'queue']),
+    default=lambda: os.environ.get('USEFLY_EXECUTION_BACKEND', 'asyncio'),
+    help='Where browser agents run: on the server event loop, in worker processes, or on `usefly worker` processes via the task queue'
+)
+@click.pass_context
+def main(ctx: click.Context, port: int, reload: bool, backend: str):
     """Start the Usefly server."""
+    if ctx.invoked_subcommand is not None:
+        return
+
+    # Passed through the environment so it also reaches reload subprocesses
+    os.environ['USEFLY_EXECUTION_BACKEND'] = backend
     uvicorn.run(
         "src.server:app",
         host="0.0.0.0",
@@ -22,5 +34,33 @@ def main(port: int, reload: bool):
     )
 
 
+@main.command()
+@click.option('--worker-id', default=None, help='Worker name shown in lease records (default: hostname + random suffix)')
+@click.option('--concurrency', default=None, type=int, help='Parallel agents on this worker (default: max browser workers setting)')
+@click.option('--poll-interval', default=2.0, help='Seconds between task queue polls')
+@click.option('--lease-seconds', default=60, help='Task lease length; renewed while the agent runs')
+def worker(worker_id: str, concurrency: int, poll_interval: float, lease_seconds: int):
+    """Run persona tasks queued by a server started with --backend queue."""
+    from src.worker import main as run_worker
+    run_worker(worker_id, concurrency, poll_interval, lease_seconds)
+
+
+@main.command('rebuild-reports')
+def rebuild_reports():
+    """Rebuild report aggregates from the stored persona runs, e.g. if reports disagree with the runs."""
+    from src.database import SessionLocal, init_db
+    from src.handlers.persona_run_events import backfill_run_events
+    from src.handlers.report_aggregates import backfill_report_aggregates
+
+    init_db()
+    db = SessionLocal()
+    try:
+        backfill_run_events(db)
+        replayed = backfill_report_aggregates(db, rebuild=True)
+    finally:
+        db.close()
+    click.echo(f"Rebuilt report aggregates from {replayed} persona runs")
+
+
 if __name__ == "__main__":
     main()
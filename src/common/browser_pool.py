@@ -0,0 +1,186 @@
+import asyncio
+
+from browser_use import BrowserSession
+
+# Recycle a browser after this many tasks to bound memory growth and leaked state
+DEFAULT_MAX_USES_PER_BROWSER = 20
+
+# Seconds to wait for a CDP round-trip before treating a browser as unhealthy
+HEALTH_CHECK_TIMEOUT = 5
+
+
+class PooledBrowser:
+    """A pre-launched browser session together with its usage count."""
+
+    def __init__(self, session: BrowserSession):
+        self.session = session
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    Pool of warm headless Chromium sessions shared across persona tasks.
+
+    Sessions are launched with keep_alive=True so the agent leaves the browser
+    running when it finishes. On release the session is reset (extra tabs closed,
+    cookies and cache cleared) and handed to the next task, or killed once it fails
+    a health check or reaches max_uses.
+    """
+
+    def __init__(self, size: int, max_uses: int = DEFAULT_MAX_USES_PER_BROWSER):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: list[PooledBrowser] = []
+        self._in_use: dict = {}  # id(session) -> PooledBrowser
+        self._launching = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def total(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._launching
+
+    async def warm(self, count: int | None = None):
+        """Pre-launch browsers so the first tasks don't pay the cold start."""
+        async with self._condition:
+            target = min(count if count is not None else self.size, self.size)
+            missing = max(0, target - self.total)
+            self._launching += missing
+
+        launched = await asyncio.gather(*(self._launch() for _ in range(missing)), return_exceptions=True)
+
+        async with self._condition:
+            self._launching -= missing
+            for browser in launched:
+                if isinstance(browser, PooledBrowser):
+                    self._idle.append(browser)
+                else:
+                    print(f"Browser pool warm-up failed: {browser}")
+            self._condition.notify_all()
+
+    async def acquire(self) -> BrowserSession:
+        """Get a healthy browser session, launching one if the pool has room."""
+        while True:
+            async with self._condition:
+                while not self._idle and self.total >= self.size:
+                    await self._condition.wait()
+
+                if self._idle:
+                    browser = self._idle.pop()
+                else:
+                    browser = None
+                    self._launching += 1
+
+            if browser is None:
+                try:
+                    browser = await self._launch()
+                finally:
+                    async with self._condition:
+                        self._launching -= 1
+                        self._condition.notify_all()
+            elif not await self._is_healthy(browser):
+                await self._kill(browser)
+                continue
+
+            async with self._condition:
+                self._in_use[id(browser.session)] = browser
+            return browser.session
+
+    async def release(self, session: BrowserSession, discard: bool = False):
+        """
+        Return a session to the pool, recycling it if it is worn out or broken.
+        Pass discard=True to close the browser outright (e.g. after a cancelled task).
+        """
+        async with self._condition:
+            browser = self._in_use.pop(id(session), None)
+        if browser is None:
+            return
+
+        browser.uses += 1
+        keep = (
+            not discard
+            and browser.uses < self.max_uses
+            and self.total < self.size
+            and await self._reset(browser)
+        )
+        if not keep:
+            await self._kill(browser)
+
+        async with self._condition:
+            if keep:
+                self._idle.append(browser)
+            self._condition.notify_all()
+
+    async def resize(self, size: int):
+        """Change the pool size. Surplus idle browsers are closed; busy ones are recycled on release."""
+        async with self._condition:
+            self.size = size
+            surplus = []
+            while self._idle and self.total > self.size:
+                surplus.append(self._idle.pop())
+            self._condition.notify_all()
+
+        for browser in surplus:
+            await self._kill(browser)
+
+    async def close(self):
+        """Close all idle browsers. Sessions still in use are closed when released."""
+        await self.resize(0)
+
+    async def _launch(self) -> PooledBrowser:
+        session = BrowserSession(headless=True, keep_alive=True)
+        await session.start()
+        return PooledBrowser(session)
+
+    async def _is_healthy(self, browser: PooledBrowser) -> bool:
+        try:
+            await asyncio.wait_for(
+                browser.session.cdp_client.send.Browser.getVersion(),
+                timeout=HEALTH_CHECK_TIMEOUT
+            )
+            return True
+        except Exception:  # noqa: BLE001
+            return False
+
+    async def _reset(self, browser: PooledBrowser) -> bool:
+        """Give the session a clean slate for the next task: one blank tab, no cookies, no cache."""
+        session = browser.session
+        try:
+            client = session.cdp_client
+            blank = await client.send.Target.createTarget(params={'url': 'about:blank'})
+            targets = await client.send.Target.getTargets()
+            for target in targets.get('targetInfos', []):
+                if target.get('type') == 'page' and target['targetId'] != blank['targetId']:
+                    await client.send.Target.closeTarget(params={'targetId': target['targetId']})
+            await session.clear_cookies()
+            await client.send.Network.clearBrowserCache()
+            return await self._is_healthy(browser)
+        except Exception as e:  # noqa: BLE001
+            print(f"Browser reset failed, recycling: {e}")
+            return False
+
+    async def _kill(self, browser: PooledBrowser):
+        try:
+            await browser.session.kill()
+        except Exception as e:  # noqa: BLE001
+            print(f"Error closing pooled browser: {e}")
+
+
+_pool: BrowserPool | None = None
+
+
+async def get_browser_pool(size: int) -> BrowserPool:
+    """Get the process-wide browser pool, creating it or adjusting its size to match max_browser_workers."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool(size)
+    elif _pool.size != size:
+        await _pool.resize(size)
+    return _pool
+
+
+async def close_browser_pool():
+    """Shut down the process-wide browser pool (called on server shutdown)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -1,27 +1,36 @@
-import asyncio
-import os
-from pathlib import Path
-from typing import Optional, Callable
-from browser_use import Agent, ChatGoogle, ChatOpenAI, ChatGroq
+from collections.abc import Callable
+
+from browser_use import (
+    Agent,
+    AgentHistoryList,
+    BrowserSession,
+    ChatGoogle,
+    ChatGroq,
+    ChatOpenAI,
+)
 from langchain_anthropic import ChatAnthropic
-from src.models import SystemConfig, UserJourneyTask
+
+from src.common.llm_rate_limiter import rate_limited
+from src.models import SystemConfig
 
 
 def _get_llm(system_config: SystemConfig):
-    """Initialize LLM based on provider configuration."""
+    """Initialize LLM based on provider configuration, behind the shared rate limiter."""
     provider = system_config.provider.lower()
 
     if provider == "openai":
-        return ChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
     elif provider == "claude":
-        return ChatAnthropic(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatAnthropic(model=system_config.model_name, api_key=system_config.api_key)
     elif provider == "groq":
-        return ChatGroq(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatGroq(model=system_config.model_name, api_key=system_config.api_key)
     elif provider == "google":
-        return ChatGoogle(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatGoogle(model=system_config.model_name, api_key=system_config.api_key)
     else:
         # Default to OpenAI if provider unknown
-        return ChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
+
+    return rate_limited(llm, provider, system_config.model_name)
 
 
 async def run_browser_use_agent(task: str, system_config: SystemConfig, max_steps: int | None = None):
@@ -50,7 +59,9 @@ async def run_browser_use_agent_with_hooks(
     task: str,
     system_config: SystemConfig,
     max_steps: int | None = None,
-    on_step_callback: Optional[Callable[[int, Optional[str], Optional[str]], None]] = None
+    on_step_callback: Callable[[int, str | None, str | None], None] | None = None,
+    browser_session: BrowserSession | None = None,
+    on_history_callback: Callable[[AgentHistoryList], None] | None = None
 ):
     """
     Run browser-use agent with lifecycle hooks for progress tracking.
@@ -61,24 +72,35 @@ async def run_browser_use_agent_with_hooks(
         max_steps: Maximum steps for the agent to take
         on_step_callback: Callback function(step: int, action: str|None, url: str|None)
                           Called after each step with progress info
+        browser_session: Optional warm session from the browser pool.
+                         When omitted the agent launches its own headless browser.
+        on_history_callback: Callback function(history: AgentHistoryList)
+                             Called after each step so finished steps can be stored
     """
     try:
         steps = max_steps or system_config.max_steps
         llm = _get_llm(system_config)
 
+        browser_kwargs = {"browser_session": browser_session} if browser_session else {"headless": True}
         agent = Agent(
             task=task,
             llm=llm,
             max_steps=steps,
             use_vision=True,
             use_thinking=True,
-            headless=True,
-            llm_timeout=90
+            llm_timeout=90,
+            **browser_kwargs
         )
 
         # Define lifecycle hooks
         async def on_step_end(agent_instance):
             """Called after each agent step to report progress."""
+            if on_history_callback and agent_instance.history:
+                try:
+                    on_history_callback(agent_instance.history)
+                except Exception as e:
+                    print(f"History callback error: {e}")
+
             if on_step_callback:
                 try:
                     # Get current step count
@@ -99,7 +121,7 @@ async def run_browser_use_agent_with_hooks(
                         url = agent_instance.state.url
 
                     on_step_callback(step_count, action, url)
-                except Exception as e:
+                except Exception as e:  # noqa: BLE001
                     # Don't let callback errors break the agent
                     print(f"Step callback error: {e}")
 
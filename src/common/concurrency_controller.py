@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+try:
+    import psutil
+except ImportError:  # psutil ships with browser-use, but memory signals are optional
+    psutil = None
+
+# Assumed Chromium footprint until a real one has been measured
+DEFAULT_BROWSER_RSS_MB = 400
+
+# 1-minute load average per core above which we shed a browser / below which we may add one
+HIGH_LOAD_PER_CPU = 0.9
+LOW_LOAD_PER_CPU = 0.7
+
+# Seconds of LLM 429s that count against the current concurrency
+RATE_LIMIT_WINDOW = 60
+
+_rate_limit_events: deque = deque()
+
+
+def record_rate_limit():
+    """Note an LLM 429 / rate limit error; the controller backs off while they keep coming."""
+    _rate_limit_events.append(time.monotonic())
+
+
+def recent_rate_limits(window: float = RATE_LIMIT_WINDOW) -> int:
+    cutoff = time.monotonic() - window
+    while _rate_limit_events and _rate_limit_events[0] < cutoff:
+        _rate_limit_events.popleft()
+    return len(_rate_limit_events)
+
+
+def is_rate_limit_error(error: str | None) -> bool:
+    if not error:
+        return False
+    lowered = error.lower()
+    return "429" in lowered or "rate limit" in lowered or "ratelimit" in lowered
+
+
+def _chromium_rss_mb() -> float:
+    """Resident memory of the Chromium processes this process launched."""
+    if psutil is None:
+        return 0.0
+    total = 0
+    try:
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if "chrom" in child.name().lower():
+                    total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except psutil.Error:
+        return 0.0
+    return total / (1024 * 1024)
+
+
+def sample_host_metrics(in_use: int, waiting: int) -> dict:
+    """Collect the signals decide_target works from."""
+    try:
+        load_per_cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        load_per_cpu = 0.0
+
+    available_mb = psutil.virtual_memory().available / (1024 * 1024) if psutil else float("inf")
+
+    return {
+        "load_per_cpu": load_per_cpu,
+        "available_mb": available_mb,
+        "chromium_rss_mb": _chromium_rss_mb(),
+        "rate_limits": recent_rate_limits(),
+        "in_use": in_use,
+        "waiting": waiting,
+    }
+
+
+def decide_target(current: int, metrics: dict, min_workers: int, max_workers: int) -> int:
+    """
+    Move the worker count one step at a time: shed a browser on 429s, CPU saturation
+    or low memory; add one when tasks are waiting and the host has headroom for it.
+    """
+    per_browser_mb = DEFAULT_BROWSER_RSS_MB
+    if metrics["in_use"] and metrics["chromium_rss_mb"]:
+        per_browser_mb = metrics["chromium_rss_mb"] / metrics["in_use"]
+
+    if metrics["rate_limits"] > 0 or metrics["load_per_cpu"] > HIGH_LOAD_PER_CPU or metrics["available_mb"] < per_browser_mb:
+        target = current - 1
+    elif (
+        metrics["waiting"] > 0
+        and metrics["load_per_cpu"] < LOW_LOAD_PER_CPU
+        and metrics["available_mb"] > 2 * per_browser_mb
+    ):
+        target = current + 1
+    else:
+        target = current
+
+    return max(min_workers, min(max_workers, target))
+
+
+class ConcurrencyController:
+    """
+    Periodically re-tunes how many browsers run at once within [min_workers, max_workers].
+
+    `get_load` returns (slots in use, tasks waiting) and `apply` resizes the live
+    scheduler and browser pool; neither is restarted, so running tasks are unaffected.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[int], Awaitable[None]],
+        get_load: Callable[[], tuple[int, int]],
+        initial: int,
+        min_workers: int,
+        max_workers: int,
+        interval: float = 15.0
+    ):
+        self.apply = apply
+        self.get_load = get_load
+        self.min_workers = min_workers
+        self.max_workers = max(min_workers, max_workers)
+        self.interval = interval
+        self.target = max(self.min_workers, min(self.max_workers, initial))
+
+    async def step(self) -> int:
+        in_use, waiting = self.get_load()
+        metrics = await asyncio.to_thread(sample_host_metrics, in_use, waiting)
+        target = decide_target(self.target, metrics, self.min_workers, self.max_workers)
+        if target != self.target:
+            print(
+                f"Browser workers {self.target} -> {target} "
+                f"(load/cpu {metrics['load_per_cpu']:.2f}, free {metrics['available_mb']:.0f} MB, "
+                f"chromium {metrics['chromium_rss_mb']:.0f} MB, 429s {metrics['rate_limits']}, waiting {waiting})"
+            )
+            self.target = target
+            await self.apply(target)
+        return self.target
+
+    async def run(self):
+        """Apply the initial size, then adjust every `interval` seconds until cancelled."""
+        await self.apply(self.target)
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.step()
+            except Exception as e:  # noqa: BLE001
+                print(f"Concurrency controller error: {e}")
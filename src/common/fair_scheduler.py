@@ -0,0 +1,151 @@
+import asyncio
+import itertools
+from collections import deque
+from typing import Any
+
+# Lower rank is served first; unknown priorities are treated as batch
+PRIORITY_RANKS = {"interactive": 0, "batch": 1}
+DEFAULT_PRIORITY = "interactive"
+
+
+class _Waiter:
+    """A task waiting for a slot."""
+
+    def __init__(self, run_id: str, key: Any, seq: int):
+        self.run_id = run_id
+        self.key = key
+        self.seq = seq
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class FairScheduler:
+    """
+    Hands out a fixed number of browser slots across concurrent runs.
+
+    Instead of first come, first served, a free slot goes to the waiting run with
+    the best priority, then the fewest tasks running, then the oldest waiting task.
+    A 3-task interactive run submitted after a 100-task batch run starts right away
+    and every run progresses at an equal share of the slots.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._waiting: dict[str, deque] = {}   # run_id -> waiters in submission order
+        self._running: dict[str, int] = {}     # run_id -> slots held
+        self._priorities: dict[str, int] = {}  # run_id -> priority rank
+        self._seq = itertools.count()
+
+    @property
+    def in_use(self) -> int:
+        return sum(self._running.values())
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def slot(self, run_id: str, key: Any = None, priority: str = DEFAULT_PRIORITY) -> "_Slot":
+        """Async context manager holding one slot for a task of run_id."""
+        return _Slot(self, run_id, key, priority)
+
+    async def acquire(self, run_id: str, key: Any = None, priority: str = DEFAULT_PRIORITY):
+        """Wait until this task is granted a slot."""
+        self._priorities[run_id] = PRIORITY_RANKS.get(priority, PRIORITY_RANKS["batch"])
+        waiter = _Waiter(run_id, key, next(self._seq))
+        self._waiting.setdefault(run_id, deque()).append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled; hand the slot back
+                self.release(run_id)
+            else:
+                self._remove_waiter(waiter)
+            raise
+
+    def release(self, run_id: str):
+        """Return a slot and hand it to the next task in line."""
+        self._running[run_id] = self._running.get(run_id, 1) - 1
+        if self._running[run_id] <= 0:
+            del self._running[run_id]
+        self._forget_if_idle(run_id)
+        self._dispatch()
+
+    def resize(self, capacity: int):
+        """Change the slot count. Extra slots are handed out now; surplus ones are retired as tasks finish."""
+        self.capacity = capacity
+        self._dispatch()
+
+    def queue_positions(self) -> dict[tuple[str, Any], int]:
+        """
+        1-based position of every waiting task in the order slots would be granted
+        if no new work arrived, keyed by (run_id, key).
+        """
+        running = dict(self._running)
+        heads = {run_id: 0 for run_id in self._waiting}
+        positions = {}
+        for position in itertools.count(1):
+            run_id = self._pick(running, heads)
+            if run_id is None:
+                return positions
+            waiter = self._waiting[run_id][heads[run_id]]
+            positions[(run_id, waiter.key)] = position
+            heads[run_id] += 1
+            running[run_id] = running.get(run_id, 0) + 1
+
+    def _pick(self, running: dict[str, int], heads: dict[str, int]) -> str | None:
+        best = None
+        best_order = None
+        for run_id, queue in self._waiting.items():
+            head = heads.get(run_id, 0)
+            if head >= len(queue):
+                continue
+            order = (self._priorities.get(run_id, 0), running.get(run_id, 0), queue[head].seq)
+            if best_order is None or order < best_order:
+                best, best_order = run_id, order
+        return best
+
+    def _dispatch(self):
+        while self.in_use < self.capacity:
+            run_id = self._pick(self._running, {})
+            if run_id is None:
+                return
+            waiter = self._waiting[run_id].popleft()
+            if not self._waiting[run_id]:
+                del self._waiting[run_id]
+            if waiter.future.done():
+                continue
+            self._running[run_id] = self._running.get(run_id, 0) + 1
+            waiter.future.set_result(None)
+
+    def _remove_waiter(self, waiter: _Waiter):
+        queue = self._waiting.get(waiter.run_id)
+        if queue is not None:
+            try:
+                queue.remove(waiter)
+            except ValueError:
+                pass
+            if not queue:
+                del self._waiting[waiter.run_id]
+        self._forget_if_idle(waiter.run_id)
+
+    def _forget_if_idle(self, run_id: str):
+        if run_id not in self._running and run_id not in self._waiting:
+            self._priorities.pop(run_id, None)
+
+
+class _Slot:
+    def __init__(self, scheduler: FairScheduler, run_id: str, key: Any, priority: str):
+        self._scheduler = scheduler
+        self._run_id = run_id
+        self._key = key
+        self._priority = priority
+
+    async def __aenter__(self):
+        await self._scheduler.acquire(self._run_id, self._key, self._priority)
+
+    async def __aexit__(self, *exc_info):
+        self._scheduler.release(self._run_id)
+        return False
+
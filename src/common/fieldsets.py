@@ -0,0 +1,50 @@
+from collections.abc import Sequence
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, load_only
+
+# fields= value selecting a model's summary fieldset
+SUMMARY = "summary"
+
+
+def parse_fields(model, fields: str | None, summary_fields: Sequence[str]) -> list[str] | None:
+    """
+    Column names requested by a fields= query parameter: None (every column)
+    when unset, summary_fields for "summary", else the comma-separated names.
+    The primary key is always included. Raises ValueError for unknown names.
+    """
+    if not fields:
+        return None
+    names = list(summary_fields) if fields == SUMMARY else [name.strip() for name in fields.split(",") if name.strip()]
+    columns = model.__table__.columns
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    primary_key = [column.name for column in model.__table__.primary_key]
+    return primary_key + [name for name in dict.fromkeys(names) if name not in primary_key]
+
+
+def load_fields(query: Query, model, names: list[str] | None) -> Query:
+    """Restrict a query to the given columns; the others are deferred and never read."""
+    if names is None:
+        return query
+    return query.options(load_only(*(getattr(model, name) for name in names), raiseload=True))
+
+
+def to_dicts(rows: Sequence[Any], names: list[str]) -> list[dict[str, Any]]:
+    """Sparse rows for a response, read from the loaded columns only."""
+    return [{name: getattr(row, name) for name in names} for row in rows]
+
+
+def sparse_response(
+    model: type[BaseModel], rows: Sequence[Any], names: list[str], headers: dict[str, str] | None = None
+) -> JSONResponse:
+    """
+    Sparse rows validated by a fields model and serialized without the unset fields.
+    Returned directly, so the route keeps its full response_model for requests without fields=.
+    """
+    items = [model.model_validate(item) for item in to_dicts(rows, names)]
+    return JSONResponse(jsonable_encoder(items, exclude_unset=True), headers=headers)
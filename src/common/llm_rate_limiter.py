@@ -0,0 +1,231 @@
+"""
+Client-side LLM rate limiting per provider and model.
+
+Limits are enforced in memory, so each process gets its own budget. Processes
+that call the same provider split the configured limits: process backend
+workers divide them by the pool size, and `USEFLY_LLM_PROCESSES` divides them
+further when several servers or `usefly worker` processes share one API key.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+
+from src.common.concurrency_controller import is_rate_limit_error, record_rate_limit
+
+# Default per (provider, model) limits; 0 means unlimited
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("USEFLY_LLM_RPM", "0"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("USEFLY_LLM_TPM", "0"))
+
+# Per-model overrides, e.g. '{"openai:gpt-4o": {"rpm": 500, "tpm": 30000}}'
+MODEL_LIMITS: dict[str, dict] = json.loads(os.environ.get("USEFLY_LLM_RATE_LIMITS", "{}"))
+
+# Processes (server plus `usefly worker`s) drawing on the same provider limits
+LLM_PROCESSES = max(1, int(os.environ.get("USEFLY_LLM_PROCESSES", "1")))
+
+# Seconds every caller of a model holds off after one of them gets a 429
+RATE_LIMIT_BACKOFF = 10.0
+
+# Rough token cost of a screenshot, which text-length estimates can't see
+IMAGE_TOKEN_ESTIMATE = 1000
+
+# Called with the seconds an LLM call spent queued; set per task by the runner
+wait_listener: contextvars.ContextVar[Callable[[float], None] | None] = contextvars.ContextVar(
+    "llm_wait_listener", default=None
+)
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute / 60` per second, bursting up to `per_minute`."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` now (the level may go negative) and return how long the caller must wait."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= amount
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min limits for one provider and model, shared by every
+    agent and task generation call in this process.
+
+    Calls reserve their share up front and are told how long to wait, so excess
+    calls queue in arrival order instead of failing with a 429.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and an estimated token count; returns seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            delay = max(0.0, self._blocked_until - now)
+            if self._requests:
+                delay = max(delay, self._requests.reserve(1, now))
+            if self._tokens:
+                delay = max(delay, self._tokens.reserve(tokens, now))
+        return delay
+
+    def settle(self, estimated: int, actual: int | None):
+        """Correct a reservation once the provider reports real token usage."""
+        if actual is None or not self._tokens:
+            return
+        with self._lock:
+            self._tokens.level -= actual - estimated
+
+    def penalize(self, seconds: float = RATE_LIMIT_BACKOFF):
+        """Hold off all callers after the provider rejected a call with a 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+_limiters: dict[tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+_process_share = 1 / LLM_PROCESSES
+
+
+def set_process_share(processes: int):
+    """Limit this process to 1/`processes` of its configured budget (pool workers call this at startup)."""
+    global _process_share
+    with _limiters_lock:
+        _process_share = 1 / (max(1, processes) * LLM_PROCESSES)
+        _limiters.clear()
+
+
+def _share(per_minute: int) -> int:
+    return max(1, int(per_minute * _process_share)) if per_minute > 0 else 0
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """Get the process-wide limiter for a provider and model, sized to this process's share."""
+    key = (provider.lower(), model)
+    with _limiters_lock:
+        if key not in _limiters:
+            limits = MODEL_LIMITS.get(f"{key[0]}:{model}", {})
+            _limiters[key] = RateLimiter(
+                requests_per_minute=_share(limits.get("rpm", DEFAULT_REQUESTS_PER_MINUTE)),
+                tokens_per_minute=_share(limits.get("tpm", DEFAULT_TOKENS_PER_MINUTE)),
+            )
+        return _limiters[key]
+
+
+def estimate_tokens(payload) -> int:
+    """Approximate prompt tokens (~4 characters each, fixed cost per image)."""
+    chars = 0
+    images = 0
+    for item in payload if isinstance(payload, (list, tuple)) else [payload]:
+        content = getattr(item, "content", item)
+        if isinstance(content, list):
+            for part in content:
+                text = part.get("text") if isinstance(part, dict) else getattr(part, "text", None)
+                if text:
+                    chars += len(text)
+                else:
+                    images += 1
+        else:
+            chars += len(str(content))
+    return chars // 4 + images * IMAGE_TOKEN_ESTIMATE
+
+
+def _usage_tokens(result) -> int | None:
+    """Total tokens reported by a browser_use completion or a LangChain message, if any."""
+    usage = getattr(result, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None) is not None:
+        return usage.total_tokens
+    metadata = getattr(result, "usage_metadata", None)
+    if isinstance(metadata, dict):
+        return metadata.get("total_tokens")
+    return None
+
+
+def _report_wait(seconds: float):
+    listener = wait_listener.get()
+    if listener and seconds > 0:
+        try:
+            listener(seconds)
+        except Exception as e:  # noqa: BLE001
+            print(f"LLM wait listener error: {e}")
+
+
+class RateLimitedLLM:
+    """
+    Proxy that puts a RateLimiter in front of an LLM's invoke/ainvoke.
+
+    Everything else is delegated, and isinstance checks still see the wrapped
+    class, so it can be handed to browser_use agents and LangChain code alike.
+    """
+
+    def __init__(self, llm, limiter: RateLimiter):
+        object.__setattr__(self, "_llm", llm)
+        object.__setattr__(self, "_limiter", limiter)
+
+    @property
+    def __class__(self):
+        return type(self._llm)
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+    def __setattr__(self, name, value):
+        # browser_use replaces ainvoke with a usage-tracking wrapper; keep that on the proxy
+        if name == "ainvoke":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._llm, name, value)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        estimated = estimate_tokens(messages)
+        delay = self._limiter.reserve(estimated)
+        if delay > 0:
+            _report_wait(delay)
+            await asyncio.sleep(delay)
+        try:
+            result = await self._llm.ainvoke(messages, *args, **kwargs)
+        except Exception as e:
+            self._on_error(e)
+            raise
+        self._limiter.settle(estimated, _usage_tokens(result))
+        return result
+
+    def invoke(self, input, *args, **kwargs):
+        estimated = estimate_tokens(input)
+        delay = self._limiter.reserve(estimated)
+        if delay > 0:
+            _report_wait(delay)
+            time.sleep(delay)
+        try:
+            result = self._llm.invoke(input, *args, **kwargs)
+        except Exception as e:
+            self._on_error(e)
+            raise
+        self._limiter.settle(estimated, _usage_tokens(result))
+        return result
+
+    def with_structured_output(self, *args, **kwargs):
+        return RateLimitedLLM(self._llm.with_structured_output(*args, **kwargs), self._limiter)
+
+    def _on_error(self, error: Exception):
+        if is_rate_limit_error(str(error)):
+            self._limiter.penalize()
+            record_rate_limit()
+
+
+def rate_limited(llm, provider: str, model: str) -> RateLimitedLLM:
+    """Wrap an LLM client with the shared limiter for its provider and model."""
+    return RateLimitedLLM(llm, get_rate_limiter(provider, model))
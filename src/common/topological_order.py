@@ -0,0 +1,68 @@
+from collections.abc import Hashable
+
+
+class IncrementalTopologicalOrder:
+    """
+    Topological order of a DAG maintained while edges are added (Pearce-Kelly).
+
+    Each node has a position; an edge that already points forward in the order
+    is accepted in O(1). Otherwise only the nodes between the target's and the
+    source's positions are searched: reaching the source means the edge would
+    close a cycle and it is rejected, else the affected nodes are reordered
+    among the positions they already occupied.
+    """
+
+    def __init__(self):
+        self._order: dict[Hashable, int] = {}
+        self._successors: dict[Hashable, list[Hashable]] = {}
+        self._predecessors: dict[Hashable, list[Hashable]] = {}
+
+    def _position(self, node: Hashable) -> int:
+        position = self._order.get(node)
+        if position is None:
+            position = self._order[node] = len(self._order)
+            self._successors[node] = []
+            self._predecessors[node] = []
+        return position
+
+    def add_edge(self, source: Hashable, target: Hashable) -> bool:
+        """Add source -> target unless it would create a cycle; return whether it was added."""
+        if source == target:
+            return False
+        upper = self._position(source)
+        lower = self._position(target)
+
+        if lower < upper:
+            order = self._order
+            # Forward from target through nodes placed before source; reaching source is a cycle
+            forward = {target}
+            stack = [target]
+            while stack:
+                for successor in self._successors[stack.pop()]:
+                    if successor == source:
+                        return False
+                    if successor not in forward and order[successor] < upper:
+                        forward.add(successor)
+                        stack.append(successor)
+            # Backward from source through nodes placed after target
+            backward = {source}
+            stack = [source]
+            while stack:
+                for predecessor in self._predecessors[stack.pop()]:
+                    if predecessor not in backward and order[predecessor] > lower:
+                        backward.add(predecessor)
+                        stack.append(predecessor)
+            self._reorder(backward, forward)
+
+        self._successors[source].append(target)
+        self._predecessors[target].append(source)
+        return True
+
+    def _reorder(self, backward, forward):
+        # Everything that reaches source goes before everything target reaches,
+        # each group keeping its relative order, in the positions they held
+        order = self._order
+        nodes = sorted(backward, key=order.__getitem__) + sorted(forward, key=order.__getitem__)
+        positions = sorted(order[node] for node in nodes)
+        for node, position in zip(nodes, positions):
+            order[node] = position
@@ -2,15 +2,23 @@
 Database configuration and initialization for Usefly.
 """
 
+import time
+from collections.abc import Callable
 from pathlib import Path
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import TypeVar
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+T = TypeVar("T")
 
 # Base class for all models
 Base = declarative_base()
 
 # Database file path - use fixed path in Docker, relative path otherwise
 import os
+
 if os.environ.get("IN_DOCKER"):
     DB_PATH = Path("/app/src/data/usefly.db")
 else:
@@ -19,14 +27,105 @@ else:
 # Create data directory if it doesn't exist
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-# Create engine with SQLite
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+# Create engine - SQLite by default; USEFLY_DATABASE_URL points the server and
+# `usefly worker` processes at a shared database (e.g. Postgres) in distributed mode
+DATABASE_URL = os.environ.get("USEFLY_DATABASE_URL", f"sqlite:///{DB_PATH}")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite storage profiles, applied as pragmas on every new connection.
+# "wal" lets report reads run while runs are being written; "durable" also fsyncs
+# every commit; "legacy" keeps SQLite's defaults (e.g. for network filesystems without WAL support).
+SQLITE_PROFILES = {
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # KiB, i.e. 64 MB of page cache per connection
+        "mmap_size": 268435456,  # 256 MB
+        "busy_timeout": 5000,  # ms to wait for a lock before "database is locked"
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "busy_timeout": 5000,
+    },
+    "legacy": {},
+}
+SQLITE_PROFILE = os.environ.get("USEFLY_SQLITE_PROFILE", "wal")
+
+# Individual pragmas can be overridden, e.g. USEFLY_SQLITE_BUSY_TIMEOUT=10000
+SQLITE_PRAGMAS = {
+    **SQLITE_PROFILES.get(SQLITE_PROFILE, SQLITE_PROFILES["wal"]),
+    **{
+        name: os.environ[f"USEFLY_SQLITE_{name.upper()}"]
+        for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout")
+        if f"USEFLY_SQLITE_{name.upper()}" in os.environ
+    },
+}
+
+# Connection pool: one connection per browser worker (step streaming holds a session
+# per running task) plus headroom for API requests and background loops
+DB_POOL_SIZE = int(os.environ.get(
+    "USEFLY_DB_POOL_SIZE",
+    int(os.environ.get("USEFLY_MAX_BROWSER_WORKERS", os.cpu_count() or 4)) + 5,
+))
+DB_MAX_OVERFLOW = int(os.environ.get("USEFLY_DB_MAX_OVERFLOW", "20"))
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite specific
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},  # SQLite specific
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
     echo=False,  # Set to True for SQL debugging
 )
 
+
+@event.listens_for(engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite storage profile to each new connection."""
+    if not IS_SQLITE:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+# Writes retry this many times when another connection holds the SQLite lock past busy_timeout
+LOCK_RETRY_ATTEMPTS = 5
+
+
+def is_lock_error(error: Exception) -> bool:
+    return isinstance(error, OperationalError) and "database is locked" in str(error)
+
+
+def retry_on_lock(db, func: Callable[..., T], *args, attempts: int = LOCK_RETRY_ATTEMPTS, **kwargs) -> T:  # noqa: UP047
+    """
+    Call func(db, ...), rolling back and retrying with exponential backoff while
+    SQLite reports "database is locked".
+    """
+    for attempt in range(attempts):
+        try:
+            return func(db, *args, **kwargs)
+        except OperationalError as e:
+            if not is_lock_error(e) or attempt == attempts - 1:
+                raise
+            db.rollback()
+            time.sleep(0.05 * 2 ** attempt)
+
+
+def dialect_insert(db, model):
+    """INSERT for the session's database with ON CONFLICT support (SQLite or PostgreSQL)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -44,9 +143,44 @@ def init_db():
     """Initialize the database by creating all tables."""
     # Import models to register them with Base
     from src import models  # noqa: F401
+    _upgrade_schema(engine)
     Base.metadata.create_all(bind=engine)
 
 
+def _upgrade_schema(bind):
+    """
+    Bring tables created by older versions up to the current models: missing
+    nullable columns and indexes are added in place, and derived tables (info "derived",
+    rebuilt from persona runs on startup) whose columns changed are dropped so
+    create_all recreates them.
+    """
+    existing = inspect(bind)
+    tables = set(existing.get_table_names())
+    stale = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            columns = {column["name"] for column in existing.get_columns(table.name)}
+            if table.info.get("derived"):
+                if columns != set(table.columns.keys()):
+                    stale.append(table)
+                continue
+            for column in table.columns:
+                if column.name not in columns and column.nullable:
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}"
+                    ))
+            indexes = {index["name"] for index in existing.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+    if stale:
+        # Drop every derived table: they are only consistent with each other
+        derived = [table for table in Base.metadata.sorted_tables if table.info.get("derived") and table.name in tables]
+        Base.metadata.drop_all(bind=bind, tables=derived)
+
+
 if __name__ == "__main__":
     init_db()
     print(f"Database initialized at {DB_PATH}")
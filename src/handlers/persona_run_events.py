@@ -0,0 +1,162 @@
+"""
+Storage for agent steps streamed while a persona run executes.
+
+Each step is appended to persona_run_events as soon as the agent finishes it, so
+a crashed or timed-out task keeps the steps it got through and the final
+PersonaRun row is assembled from what is already stored.
+"""
+
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import exists
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from src.database import retry_on_lock
+from src.models import PersonaRun, PersonaRunEvent
+
+
+def build_event_rows(
+    persona_run_id: str,
+    events: list[dict],
+    timestamp: datetime | None = None
+) -> list[PersonaRunEvent]:
+    """Rows for a run's events; events without a step number are numbered by position."""
+    timestamp = timestamp or datetime.now()
+    return [
+        PersonaRunEvent(
+            persona_run_id=persona_run_id,
+            step=event.get("step") or position,
+            url=event.get("url"),
+            action_type=event.get("type"),
+            payload=event,
+            timestamp=timestamp,
+        )
+        for position, event in enumerate(events, start=1)
+    ]
+
+
+def append_run_events(db: Session, persona_run_id: str, events: list[dict]):
+    """Store newly finished steps of a running persona run."""
+    if not events:
+        return
+    db.add_all(build_event_rows(persona_run_id, events))
+    db.commit()
+
+
+def delete_run_events(db: Session, persona_run_id: str):
+    """Drop the stored steps of an abandoned attempt that will never get a PersonaRun."""
+    db.query(PersonaRunEvent).filter(PersonaRunEvent.persona_run_id == persona_run_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def discard_run_events(db_session_factory, persona_run_id: str):
+    """Drop an abandoned attempt's steps through a session of its own (called in a thread)."""
+    db = db_session_factory()
+    try:
+        retry_on_lock(db, delete_run_events, persona_run_id)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Could not drop steps of abandoned attempt {persona_run_id}: {e}")
+    finally:
+        db.close()
+
+
+def get_events_for_runs(db: Session, persona_run_ids: list[str]) -> dict[str, list[dict]]:
+    """Get the stored steps of several persona runs in one query, keyed by persona_run_id."""
+    events: dict[str, list[dict]] = {run_id: [] for run_id in persona_run_ids}
+    if not persona_run_ids:
+        return events
+    rows = (
+        db.query(PersonaRunEvent.persona_run_id, PersonaRunEvent.payload)
+        .filter(PersonaRunEvent.persona_run_id.in_(persona_run_ids))
+        .order_by(PersonaRunEvent.persona_run_id, PersonaRunEvent.step, PersonaRunEvent.id)
+        .all()
+    )
+    for row in rows:
+        events[row.persona_run_id].append(row.payload)
+    return events
+
+
+def get_url_steps(db: Session, persona_run_ids: list[str]) -> dict[str, list[dict]]:
+    """
+    Like get_events_for_runs but only {"step", "url"} per event, read from the
+    indexed columns without parsing payloads; enough for journey analytics.
+    """
+    steps: dict[str, list[dict]] = {run_id: [] for run_id in persona_run_ids}
+    if not persona_run_ids:
+        return steps
+    rows = (
+        db.query(PersonaRunEvent.persona_run_id, PersonaRunEvent.step, PersonaRunEvent.url)
+        .filter(PersonaRunEvent.persona_run_id.in_(persona_run_ids))
+        .order_by(PersonaRunEvent.persona_run_id, PersonaRunEvent.step, PersonaRunEvent.id)
+    )
+    for row in rows:
+        steps[row.persona_run_id].append({"step": row.step, "url": row.url})
+    return steps
+
+
+def backfill_run_events(db: Session, batch_size: int = 500) -> int:
+    """
+    Explode PersonaRun.events JSON into persona_run_events for runs stored before
+    every run got event rows. Returns the number of runs backfilled.
+    """
+    missing = db.query(PersonaRun.id, PersonaRun.timestamp, PersonaRun.events).filter(
+        ~exists().where(PersonaRunEvent.persona_run_id == PersonaRun.id)
+    )
+    backfilled = 0
+    for run in missing.yield_per(batch_size):
+        if not run.events:
+            continue
+        db.add_all(build_event_rows(run.id, run.events, run.timestamp))
+        backfilled += 1
+        if backfilled % batch_size == 0:
+            db.flush()
+    db.commit()
+    return backfilled
+
+
+class RunEventSink:
+    """
+    on_events callback for run_task_agent that stores steps off the event loop.
+
+    Each batch is written in a thread through its own session, one batch after the
+    other so steps land in order. Await flush() before recording the run's PersonaRun
+    (or dropping its steps), since both read what the sink has written.
+    """
+
+    def __init__(self, db_session_factory, persona_run_id: str):
+        self.db_session_factory = db_session_factory
+        self.persona_run_id = persona_run_id
+        self._pending: asyncio.Task | None = None
+
+    def __call__(self, events: list[dict]):
+        self._pending = asyncio.ensure_future(self._write_after(self._pending, events))
+
+    async def flush(self):
+        """Wait until every batch handed over so far is stored (or has failed)."""
+        while self._pending is not None and not self._pending.done():
+            # Shielded so cancelling the task that flushes doesn't abandon the write
+            await asyncio.shield(asyncio.wait([self._pending]))
+
+    async def _write_after(self, previous: asyncio.Task | None, events: list[dict]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        await asyncio.to_thread(self._write, events)
+
+    def _write(self, events: list[dict]):
+        db = self.db_session_factory()
+        try:
+            retry_on_lock(db, append_run_events, self.persona_run_id, events)
+        except SQLAlchemyError as e:
+            # A lost step only degrades the report; don't fail the agent over it
+            db.rollback()
+            print(f"Error storing steps for persona run {self.persona_run_id}: {e}")
+        finally:
+            db.close()
+
+
+def make_event_sink(db_session_factory, persona_run_id: str) -> RunEventSink:
+    """Build the on_events callback for run_task_agent, writing through sessions from db_session_factory."""
+    return RunEventSink(db_session_factory, persona_run_id)
@@ -1,26 +1,64 @@
-from pathlib import Path
-import uuid
 import asyncio
+import copy
+import os
+import uuid
 from collections import deque
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable
 from datetime import datetime
-from typing import Dict, Optional, List, Callable
+from pathlib import Path
+
 from browser_use import AgentHistoryList
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+
+from src.common import llm_rate_limiter
+from src.common.browser_pool import get_browser_pool
 from src.common.browser_use_common import run_browser_use_agent_with_hooks
-from src.models import Scenario, SystemConfig, UserJourneyTask, PersonaRunCreate
+from src.common.concurrency_controller import ConcurrencyController
+from src.common.fair_scheduler import DEFAULT_PRIORITY, FairScheduler
+from src.database import retry_on_lock
+from src.handlers import process_backend, reports, run_state, task_queue
+from src.handlers.persona_run_events import discard_run_events, make_event_sink
 from src.handlers.persona_runs import create_persona_run
+from src.handlers.run_writer import get_run_writer
+from src.models import PersonaRunCreate, Scenario, SystemConfig, UserJourneyTask
+
+# Where browser agents execute: "asyncio" (server event loop), "process" (worker process per agent)
+# or "queue" (tasks enqueued in task_jobs and run by separate `usefly worker` processes)
+EXECUTION_BACKEND = os.environ.get("USEFLY_EXECUTION_BACKEND", "asyncio")
 
 # Enhanced structure for tracking active runs with per-task progress
-_active_runs: Dict[str, Dict] = {}
+_active_runs: dict[str, dict] = {}
 
-# Thread pool for parallel browser task execution
-# Will be initialized with max_workers from SystemConfig
-_browser_executor: Optional[ThreadPoolExecutor] = None
+# Global fair-share scheduler for browser slots across all runs on this server
+# Sized from SystemConfig.max_browser_workers and resized in place when it changes
+_scheduler: FairScheduler | None = None
+
+# Let the concurrency controller tune the browser count from host load instead of
+# using max_browser_workers as is; it stays within the min/max bounds below
+AUTOSCALE = os.environ.get("USEFLY_AUTOSCALE", "").lower() in ("1", "true", "yes")
+MIN_BROWSER_WORKERS = int(os.environ.get("USEFLY_MIN_BROWSER_WORKERS", "1"))
+MAX_BROWSER_WORKERS = int(os.environ.get("USEFLY_MAX_BROWSER_WORKERS", str(os.cpu_count() or 4)))
+AUTOSCALE_INTERVAL = float(os.environ.get("USEFLY_AUTOSCALE_INTERVAL", "15"))
+
+# Background asyncio tasks driving each run (kept referenced so they aren't garbage collected)
+_run_tasks: dict[str, asyncio.Task] = {}
 
 # Maximum log entries to keep per run
 MAX_LOG_ENTRIES = 50
 
+# Runs changed since the last checkpoint to the run_states table
+_dirty_runs: set = set()
+
+# Seconds between run state checkpoints
+CHECKPOINT_INTERVAL = float(os.environ.get("USEFLY_CHECKPOINT_INTERVAL", "5"))
+
+# What to do on startup with tasks a previous server process never finished: "fail" or "requeue"
+ORPHANED_TASK_POLICY = os.environ.get("USEFLY_ORPHANED_TASKS", "fail")
+
+# Wall-clock seconds a single agent may run before it is stopped and recorded as failed
+TASK_TIMEOUT = float(os.environ.get("USEFLY_TASK_TIMEOUT", "600"))
+
 
 def init_run_status(
     run_id: str,
@@ -28,8 +66,9 @@ def init_run_status(
     scenario_name: str,
     report_id: str,
     task_count: int,
-    tasks: List[Dict],
-    run_type: str = "persona_run"
+    tasks: list[dict],
+    run_type: str = "persona_run",
+    priority: str = DEFAULT_PRIORITY
 ):
     """Initialize run status with per-task progress tracking."""
     task_progress = []
@@ -43,7 +82,9 @@ def init_run_status(
             "current_action": None,
             "current_url": task.get("starting_url"),
             "started_at": None,
-            "error": None
+            "error": None,
+            "queue_position": None,
+            "llm_wait_seconds": 0.0
         })
 
     _active_runs[run_id] = {
@@ -52,6 +93,7 @@ def init_run_status(
         "scenario_name": scenario_name,
         "report_id": report_id,
         "run_type": run_type,
+        "priority": priority,
         "status": "in_progress",
         "total_tasks": task_count,
         "completed_tasks": 0,
@@ -59,28 +101,36 @@ def init_run_status(
         "agent_run_ids": [],
         "task_progress": task_progress,
         "started_at": datetime.now().isoformat(),
+        "tasks": tasks,
         "logs": deque(maxlen=MAX_LOG_ENTRIES)
     }
     _add_log(run_id, f"Started {run_type} with {task_count} tasks")
 
 
+def _mark_dirty(run_id: str):
+    """Flag a run for the next run state checkpoint."""
+    _dirty_runs.add(run_id)
+
+
 def _add_log(run_id: str, message: str):
     """Add a log entry to the run."""
     if run_id in _active_runs:
         timestamp = datetime.now().strftime("%H:%M:%S")
         _active_runs[run_id]["logs"].append(f"[{timestamp}] {message}")
+        _mark_dirty(run_id)
 
 
 def update_task_progress(
     run_id: str,
     task_index: int,
-    status: Optional[str] = None,
-    current_step: Optional[int] = None,
-    current_action: Optional[str] = None,
-    current_url: Optional[str] = None,
-    error: Optional[str] = None
+    status: str | None = None,
+    current_step: int | None = None,
+    current_action: str | None = None,
+    current_url: str | None = None,
+    error: str | None = None,
+    llm_wait_seconds: float | None = None
 ):
-    """Update progress for a specific task."""
+    """Update progress for a specific task. llm_wait_seconds is the task's total time queued for the LLM."""
     if run_id not in _active_runs:
         return
 
@@ -90,9 +140,12 @@ def update_task_progress(
 
     progress = run["task_progress"][task_index]
     persona = progress["persona"]
+    _mark_dirty(run_id)
 
     if status:
         progress["status"] = status
+        if status != "pending":
+            progress["queue_position"] = None
         if status == "running" and not progress["started_at"]:
             progress["started_at"] = datetime.now().isoformat()
             _add_log(run_id, f"{persona}: Started")
@@ -108,17 +161,21 @@ def update_task_progress(
     if current_url:
         progress["current_url"] = current_url
 
+    if llm_wait_seconds is not None:
+        progress["llm_wait_seconds"] = round(llm_wait_seconds, 1)
+
     if error:
         progress["error"] = error
         _add_log(run_id, f"{persona}: Error - {error[:50]}")
 
 
-def update_run_status(run_id: str, completed: int = 0, failed: int = 0, agent_run_id: Optional[str] = None, task_index: Optional[int] = None):
+def update_run_status(run_id: str, completed: int = 0, failed: int = 0, agent_run_id: str | None = None, task_index: int | None = None):
     """Update overall run status and optionally mark a task complete/failed."""
     if run_id not in _active_runs:
         return
 
     run = _active_runs[run_id]
+    _mark_dirty(run_id)
     run["completed_tasks"] += completed
     run["failed_tasks"] += failed
 
@@ -137,6 +194,9 @@ def update_run_status(run_id: str, completed: int = 0, failed: int = 0, agent_ru
 
     total_done = run["completed_tasks"] + run["failed_tasks"]
 
+    if run["status"] == "cancelled":
+        return
+
     if total_done >= run["total_tasks"]:
         if run["failed_tasks"] == 0:
             run["status"] = "completed"
@@ -150,32 +210,236 @@ def update_run_status(run_id: str, completed: int = 0, failed: int = 0, agent_ru
         run["completed_at"] = datetime.now().isoformat()
 
 
-def get_run_status(run_id: str) -> Optional[Dict]:
-    """Get status for a specific run, converting deque to list for JSON serialization."""
-    run = _active_runs.get(run_id)
-    if not run:
-        return None
-
-    # Convert deque to list for JSON serialization
-    result = {**run}
+def _snapshot(run: dict, positions: dict | None = None) -> dict:
+    """
+    Copy a tracked run for JSON serialization (deque to list, task inputs dropped),
+    filling in where its pending tasks stand in the scheduler queue.
+    """
+    result = {k: v for k, v in run.items() if k != "tasks"}
     result["logs"] = list(run["logs"])
+
+    if positions is None:
+        positions = _scheduler.queue_positions() if _scheduler else {}
+    task_progress = []
+    for progress in run["task_progress"]:
+        position = positions.get((run["run_id"], progress["task_index"])) if progress["status"] == "pending" else None
+        task_progress.append({**progress, "queue_position": position})
+    result["task_progress"] = task_progress
+
+    waiting = [p["queue_position"] for p in task_progress if p["queue_position"] is not None]
+    result["queue_position"] = min(waiting) if waiting else None
     return result
 
 
-def get_all_active_runs() -> List[Dict]:
-    """Get all active runs for the status bar."""
+def get_run_status(run_id: str, db: Session | None = None) -> dict | None:
+    """
+    Get status for a specific run, converting deque to list for JSON serialization.
+    When a db is given, runs not tracked in memory are read from the task queue
+    (`usefly worker` runs) or from the last run state checkpoint.
+    """
+    run = _active_runs.get(run_id)
+    if run:
+        return _snapshot(run)
+
+    if db is None:
+        return None
+    return task_queue.get_queued_run_status(db, run_id) or run_state.get_stored_run_status(db, run_id)
+
+
+def get_all_active_runs(db: Session | None = None) -> list[dict]:
+    """Get all active runs for the status bar, including worker-executed runs when a db is given."""
     active = []
+    positions = _scheduler.queue_positions() if _scheduler else {}
     for run_id, run in _active_runs.items():
         if run["status"] == "in_progress":
-            result = {**run}
-            result["logs"] = list(run["logs"])
-            active.append(result)
+            active.append(_snapshot(run, positions))
+    if db is not None:
+        active.extend(task_queue.get_active_queued_runs(db))
     return active
 
 
-def cleanup_run_status(run_id: str):
-    """Remove a run from active tracking."""
+def cleanup_run_status(run_id: str, db: Session | None = None):
+    """Remove a run from active tracking and, when a db is given, from the run state store."""
     _active_runs.pop(run_id, None)
+    _dirty_runs.discard(run_id)
+    if db is not None:
+        run_state.delete_run_state(db, run_id)
+
+
+def cancel_run(run_id: str, db: Session | None = None) -> bool:
+    """
+    Cancel an in-progress run: running agents are stopped, their browsers closed and
+    their slots freed, and pending tasks never start. Returns False if the run is unknown.
+    """
+    run = _active_runs.get(run_id)
+    if run is None:
+        if db is None:
+            return False
+        # Worker-executed run: workers notice on their next lease renewal
+        return task_queue.cancel_run(db, run_id) > 0 or task_queue.get_queued_run_status(db, run_id) is not None
+
+    if run["status"] != "in_progress":
+        return True
+
+    run["status"] = "cancelled"
+    run["completed_at"] = datetime.now().isoformat()
+    for progress in run["task_progress"]:
+        if progress["status"] in ("pending", "running"):
+            progress["status"] = "cancelled"
+    _add_log(run_id, "Run cancelled")
+
+    run_task = _run_tasks.get(run_id)
+    if run_task is not None:
+        run_task.cancel()
+    return True
+
+
+def _snapshot_dirty_runs() -> tuple[list[str], list[dict]]:
+    """
+    Take the runs changed since the last checkpoint. Deep copies: tasks keep mutating
+    nested state (task_progress entries) while the thread serializes the snapshots.
+    """
+    dirty = [run_id for run_id in _dirty_runs if run_id in _active_runs]
+    _dirty_runs.clear()
+    snapshots = [copy.deepcopy(_active_runs[run_id]) for run_id in dirty]
+    return dirty, snapshots
+
+
+def _save_snapshots(db_session_factory, snapshots: list[dict]) -> bool:
+    """Write run snapshots to the run_states table; safe to call off the event loop."""
+    db = db_session_factory()
+    try:
+        retry_on_lock(db, run_state.save_checkpoint, snapshots)
+        return True
+    except SQLAlchemyError as e:
+        print(f"Run state checkpoint failed: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def checkpoint_runs(db_session_factory):
+    """Persist every run changed since the last checkpoint."""
+    dirty, snapshots = _snapshot_dirty_runs()
+    if snapshots and not _save_snapshots(db_session_factory, snapshots):
+        _dirty_runs.update(dirty)
+
+
+async def _checkpoint_runs_off_loop(db_session_factory):
+    """Like checkpoint_runs, but the database write runs in a thread instead of on the loop."""
+    # Snapshot on the event loop so the tracker isn't read while tasks mutate it
+    dirty, snapshots = _snapshot_dirty_runs()
+    if snapshots and not await asyncio.to_thread(_save_snapshots, db_session_factory, snapshots):
+        _dirty_runs.update(dirty)
+
+
+async def run_checkpoint_loop(db_session_factory, interval: float = CHECKPOINT_INTERVAL):
+    """Checkpoint tracked runs every `interval` seconds until cancelled, then once more."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await _checkpoint_runs_off_loop(db_session_factory)
+    finally:
+        await _checkpoint_runs_off_loop(db_session_factory)
+
+
+def _restore_run(state) -> dict:
+    """Rebuild an in-memory tracker entry from a RunState row."""
+    run = {
+        "run_id": state.run_id,
+        "scenario_id": state.scenario_id,
+        "scenario_name": state.scenario_name,
+        "report_id": state.report_id,
+        "run_type": state.run_type,
+        "priority": DEFAULT_PRIORITY,
+        "status": state.status,
+        "total_tasks": state.total_tasks or 0,
+        "completed_tasks": state.completed_tasks or 0,
+        "failed_tasks": state.failed_tasks or 0,
+        "agent_run_ids": list(state.agent_run_ids or []),
+        "task_progress": [dict(p) for p in state.task_progress or []],
+        "started_at": state.started_at,
+        "tasks": list(state.tasks or []),
+        "logs": deque(state.logs or [], maxlen=MAX_LOG_ENTRIES),
+    }
+    if state.error:
+        run["error"] = state.error
+    return run
+
+
+async def recover_orphaned_runs(db_session_factory, policy: str = ORPHANED_TASK_POLICY):
+    """
+    Handle runs a previous server process left in progress (called on startup).
+
+    With policy "fail", each unfinished task gets an error PersonaRun and the run is
+    finalized. With "requeue", unfinished persona tasks are scheduled again under the
+    same run and report. Scenario analyses can't be resumed and are always failed.
+    """
+    db = db_session_factory()
+    try:
+        orphans = run_state.get_unfinished_runs(db)
+        if not orphans:
+            return
+
+        sys_config = db.query(SystemConfig).filter(SystemConfig.id == 1).first()
+        if sys_config is not None:
+            # Detach before any commit expires it; requeued tasks read it after this session closes
+            db.expunge(sys_config)
+
+        for state in orphans:
+            run = _restore_run(state)
+            run_id = run["run_id"]
+            _active_runs[run_id] = run
+            _add_log(run_id, "Server restarted while this run was in progress")
+
+            unfinished = [
+                p["task_index"] for p in run["task_progress"]
+                if p["status"] not in ("completed", "failed")
+            ]
+
+            if run["run_type"] != "persona_run":
+                run["status"] = "failed"
+                run["error"] = "Server restarted during analysis"
+                run["completed_at"] = datetime.now().isoformat()
+                continue
+
+            scenario = db.query(Scenario).filter(Scenario.id == run["scenario_id"]).first()
+            can_requeue = (
+                policy == "requeue" and scenario is not None and sys_config is not None
+                and len(run["tasks"]) == run["total_tasks"]
+            )
+
+            if can_requeue:
+                for task_index in unfinished:
+                    progress = run["task_progress"][task_index]
+                    progress.update(status="pending", current_step=0, current_action=None, started_at=None, error=None)
+                _add_log(run_id, f"Requeued {len(unfinished)} unfinished tasks")
+                db.expunge(scenario)
+                _schedule_tasks(
+                    db_session_factory, scenario, sys_config, run["report_id"], run_id,
+                    [(task_index, run["tasks"][task_index]) for task_index in unfinished]
+                )
+                continue
+
+            error = RuntimeError("Server restarted before the task finished")
+            for task_index in unfinished:
+                update_task_progress(run_id, task_index, error=str(error))
+                agent_run_id = None
+                if task_index < len(run["tasks"]):
+                    try:
+                        # Keeps whatever steps the task streamed before the restart
+                        persona_run = create_persona_run(db, build_error_run(
+                            run["scenario_id"], run["report_id"], run["tasks"][task_index], error,
+                            run["task_progress"][task_index].get("persona_run_id")
+                        ))
+                        agent_run_id = persona_run.id
+                    except ValueError as e:
+                        print(f"Could not record orphaned task for run {run_id}: {e}")
+                update_run_status(run_id, failed=1, agent_run_id=agent_run_id, task_index=task_index)
+    finally:
+        db.close()
+
+    checkpoint_runs(db_session_factory)
 
 
 def validate_scenario_for_run(scenario: Scenario) -> tuple:
@@ -192,8 +456,8 @@ def validate_scenario_for_run(scenario: Scenario) -> tuple:
     return True, None
 
 
-def extract_agent_events(history: AgentHistoryList) -> list:
-    """Extract ALL agent actions from browser history sequentially."""
+def extract_agent_events(history: AgentHistoryList, start_step: int = 1) -> list:
+    """Extract agent actions from browser history sequentially, from start_step (1-based) on."""
     events = []
 
     # Use model_actions() - official browser_use API for extracting actions
@@ -201,6 +465,9 @@ def extract_agent_events(history: AgentHistoryList) -> list:
     results = history.action_results()
 
     for step_idx, (h, action_dict) in enumerate(zip(history.history, actions), start=1):
+        if step_idx < start_step:
+            continue
+
         # Guard against empty action dicts
         if not action_dict:
             continue
@@ -355,152 +622,389 @@ def extract_agent_events(history: AgentHistoryList) -> list:
     return events
 
 
+def build_task_description(journey_task: UserJourneyTask) -> str:
+    """Render the user journey prompt for a task."""
+    prompt_path = Path(__file__).parent.parent / "prompts" / "user_journey_task.txt"
+    with open(prompt_path, "r") as f:
+        prompt_template = f.read()
+
+    return prompt_template.format(
+        persona=journey_task.persona,
+        starting_url=journey_task.starting_url,
+        goal=journey_task.goal,
+        steps=journey_task.steps
+    )
+
+
+async def run_task_agent(
+    config_id: str,
+    report_id: str,
+    task: dict,
+    system_config: SystemConfig,
+    on_step_callback: Callable[[int, str | None, str | None], None] | None = None,
+    browser_session=None,
+    persona_run_id: str | None = None,
+    on_events: Callable[[list[dict]], None] | None = None
+) -> PersonaRunCreate:
+    """
+    Run the browser agent for one task and build the PersonaRun payload.
+    Has no DB or run-tracking side effects, so it can also run inside a worker process.
+
+    With on_events, each step's events are handed over as soon as the step ends and
+    the payload carries no events; create_persona_run assembles them from storage.
+    """
+    journey_task = UserJourneyTask(**task)
+    start_time = datetime.now()
+    task_description = build_task_description(journey_task)
+    max_steps = system_config.max_steps
+    streamed_steps = 0
+
+    def on_history(history: AgentHistoryList):
+        nonlocal streamed_steps
+        new_events = extract_agent_events(history, start_step=streamed_steps + 1)
+        streamed_steps = len(history.history)
+        if new_events:
+            on_events(new_events)
+
+    history: AgentHistoryList = await run_browser_use_agent_with_hooks(
+        task=task_description,
+        system_config=system_config,
+        max_steps=max_steps,
+        on_step_callback=on_step_callback,
+        browser_session=browser_session,
+        on_history_callback=on_history if on_events else None
+    )
+
+    if on_events:
+        # Flush any step the last hook call didn't see
+        on_history(history)
+        events = []
+    else:
+        events = extract_agent_events(history)
+
+    return PersonaRunCreate(
+        id=persona_run_id,
+        config_id=config_id,
+        report_id=report_id,
+        persona_type=journey_task.persona,
+        is_done=history.is_done(),
+        timestamp=start_time,
+        duration_seconds=history.total_duration_seconds(),
+        platform="web",
+        error_type="",
+        steps_completed=history.number_of_steps(),
+        total_steps=max_steps,
+        final_result=history.final_result(),
+        judgement_data=history.judgement(),
+        task_description=task_description,
+        task_goal=journey_task.goal,
+        task_steps=journey_task.steps,
+        task_url=journey_task.starting_url,
+        events=events
+    )
+
+
+def build_error_run(
+    config_id: str,
+    report_id: str,
+    task: dict,
+    error: Exception,
+    persona_run_id: str | None = None
+) -> PersonaRunCreate:
+    """
+    Build the PersonaRun payload recorded for a task that crashed.
+    With a persona_run_id, the steps streamed before the crash are kept as its events,
+    and steps_completed is counted from them when the run is stored.
+    """
+    # Extract task fields properly from the task dict
+    return PersonaRunCreate(
+        id=persona_run_id,
+        config_id=config_id,
+        report_id=report_id,
+        persona_type=task.get("persona", "UNKNOWN"),
+        is_done=False,
+        timestamp=datetime.now(),
+        duration_seconds=0,
+        platform="web",
+        error_type=str(error),
+        steps_completed=0,
+        total_steps=30,
+        final_result=f"ERROR: {error!s}",
+        judgement_data={},
+        task_description=task.get("goal", "UNKNOWN"),
+        task_goal=task.get("goal"),
+        task_steps=task.get("steps"),
+        task_url=task.get("starting_url"),
+        events=[]
+    )
+
+
 async def execute_single_task(
-    db: Session,
+    db_session_factory,
     scenario: Scenario,
-    task: Dict,
+    task: dict,
     task_index: int,
     report_id: str,
     run_id: str,
-    system_config: SystemConfig
+    system_config: SystemConfig,
+    browser_session=None
 ) -> str:
-    """Execute a single persona task with progress tracking."""
+    """
+    Execute a single persona task with progress tracking.
+    The agent runs on this event loop, or in a worker process when the process backend is enabled,
+    and is stopped and recorded as failed once it exceeds TASK_TIMEOUT. The result goes to the
+    background writer, so the browser slot is freed without waiting on the database.
+    """
     # Mark task as running
     update_task_progress(run_id, task_index, status="running")
 
-    try:
-        journey_task = UserJourneyTask(**task)
-        start_time = datetime.now()
-
-        prompt_path = Path(__file__).parent.parent / "prompts" / "user_journey_task.txt"
-        with open(prompt_path, "r") as f:
-            prompt_template = f.read()
-
-        task_description = prompt_template.format(
-            persona=journey_task.persona,
-            starting_url=journey_task.starting_url,
-            goal=journey_task.goal,
-            steps=journey_task.steps
-        )
-        max_steps = system_config.max_steps
+    # Steps are streamed under this id while the agent runs
+    persona_run_id = str(uuid.uuid4())
+    event_sink = make_event_sink(db_session_factory, persona_run_id)
 
-        # Create progress callback for browser-use hooks
-        def on_step_progress(step: int, action: Optional[str], url: Optional[str]):
-            update_task_progress(
+    # Update max_steps in task progress
+    if run_id in _active_runs and task_index < len(_active_runs[run_id]["task_progress"]):
+        progress = _active_runs[run_id]["task_progress"][task_index]
+        progress["max_steps"] = system_config.max_steps
+        progress["persona_run_id"] = persona_run_id
+
+    try:
+        if EXECUTION_BACKEND == "process":
+            agent_call = process_backend.run_task_in_process(
+                config_id=scenario.id,
+                report_id=report_id,
                 run_id=run_id,
+                task=task,
                 task_index=task_index,
-                current_step=step,
-                current_action=action,
-                current_url=url
+                system_config=system_config,
+                on_progress=_on_process_progress,
+                persona_run_id=persona_run_id,
+                max_workers=_scheduler.capacity if _scheduler else None
+            )
+        else:
+            # Create progress callback for browser-use hooks
+            def on_step_progress(step: int, action: str | None, url: str | None):
+                update_task_progress(
+                    run_id=run_id,
+                    task_index=task_index,
+                    current_step=step,
+                    current_action=action,
+                    current_url=url
+                )
+
+            agent_call = run_task_agent(
+                config_id=scenario.id,
+                report_id=report_id,
+                task=task,
+                system_config=system_config,
+                on_step_callback=on_step_progress,
+                browser_session=browser_session,
+                persona_run_id=persona_run_id,
+                on_events=event_sink
             )
 
-        # Update max_steps in task progress
-        if run_id in _active_runs and task_index < len(_active_runs[run_id]["task_progress"]):
-            _active_runs[run_id]["task_progress"][task_index]["max_steps"] = max_steps
+        llm_wait = 0.0
 
-        history: AgentHistoryList = await run_browser_use_agent_with_hooks(
-            task=task_description,
-            system_config=system_config,
-            max_steps=max_steps,
-            on_step_callback=on_step_progress
-        )
+        def on_llm_wait(seconds: float):
+            nonlocal llm_wait
+            llm_wait += seconds
+            update_task_progress(run_id, task_index, llm_wait_seconds=llm_wait)
 
-        events = extract_agent_events(history)
+        # LLM calls made by this task's agent report their rate limiter queueing here
+        listener_token = llm_rate_limiter.wait_listener.set(on_llm_wait)
+        try:
+            persona_run_data = await asyncio.wait_for(agent_call, timeout=TASK_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Task exceeded the {TASK_TIMEOUT:.0f}s deadline")
+        finally:
+            llm_rate_limiter.wait_listener.reset(listener_token)
 
-        persona_run_data = PersonaRunCreate(
-            config_id=scenario.id,
-            report_id=report_id,
-            persona_type=journey_task.persona,
-            is_done=history.is_done(),
-            timestamp=start_time,
-            duration_seconds=history.total_duration_seconds(),
-            platform="web",
-            error_type="",
-            steps_completed=history.number_of_steps(),
-            total_steps=max_steps,
-            final_result=history.final_result(),
-            judgement_data=history.judgement(),
-            task_description=task_description,
-            task_goal=journey_task.goal,
-            task_steps=journey_task.steps,
-            task_url=journey_task.starting_url,
-            events=events
-        )
+    except asyncio.CancelledError:
+        # The task or its run was cancelled: no PersonaRun will be recorded, so drop its steps
+        await event_sink.flush()
+        await asyncio.to_thread(discard_run_events, db_session_factory, persona_run_id)
+        raise
+    except Exception as e:
+        # Update task with error
+        update_task_progress(run_id, task_index, error=str(e))
+        await event_sink.flush()
+        return await _submit_result(build_error_run(scenario.id, report_id, task, e, persona_run_id), run_id, task_index, failed=True)
 
-        persona_run = create_persona_run(db, persona_run_data)
+    # The PersonaRun is assembled from the stored steps, so they must all be written first
+    await event_sink.flush()
+    return await _submit_result(persona_run_data, run_id, task_index)
 
-        update_run_status(run_id, completed=1, agent_run_id=persona_run.id, task_index=task_index)
 
-        return persona_run.id
+async def _submit_result(persona_run_data: PersonaRunCreate, run_id: str, task_index: int, failed: bool = False) -> str:
+    """
+    Hand a task's PersonaRun to the background writer without waiting for the database.
+    The task is counted as completed or failed once its row is committed.
+    """
+    def on_written(persona_run_id: str | None):
+        if persona_run_id is None:
+            update_task_progress(run_id, task_index, error="Could not save the run result")
+            update_run_status(run_id, failed=1, task_index=task_index)
+        elif failed:
+            update_run_status(run_id, failed=1, agent_run_id=persona_run_id, task_index=task_index)
+        else:
+            update_run_status(run_id, completed=1, agent_run_id=persona_run_id, task_index=task_index)
 
-    except Exception as e:
-        # Update task with error
-        update_task_progress(run_id, task_index, error=str(e))
+    return await get_run_writer().submit(persona_run_data, on_written)
 
-        # Extract task fields properly from the task dict
-        persona_run_data = PersonaRunCreate(
-            config_id=scenario.id,
-            report_id=report_id,
-            persona_type=task.get("persona", "UNKNOWN"),
-            is_done=False,
-            timestamp=datetime.now(),
-            duration_seconds=0,
-            platform="web",
-            error_type=str(e),
-            steps_completed=0,
-            total_steps=30,
-            final_result=f"ERROR: {str(e)}",
-            judgement_data={},
-            task_description=task.get("goal", "UNKNOWN"),
-            task_goal=task.get("goal"),
-            task_steps=task.get("steps"),
-            task_url=task.get("starting_url"),
-            events=[]
-        )
 
-        persona_run = create_persona_run(db, persona_run_data)
-        update_run_status(run_id, failed=1, agent_run_id=persona_run.id, task_index=task_index)
-        return persona_run.id
+def _on_process_progress(
+    run_id: str,
+    task_index: int,
+    step: int | None,
+    action: str | None,
+    url: str | None,
+    llm_wait_seconds: float | None = None
+):
+    """Apply a step or LLM queue wait update relayed from a worker process."""
+    update_task_progress(
+        run_id=run_id,
+        task_index=task_index,
+        current_step=step,
+        current_action=action,
+        current_url=url,
+        llm_wait_seconds=llm_wait_seconds
+    )
+
+
+def _get_scheduler(max_workers: int) -> FairScheduler:
+    """
+    Get the shared scheduler, resizing it in place when max_browser_workers changes.
+    With autoscaling on, the controller owns its size and max_workers is only the initial value.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler(max_workers)
+    elif _scheduler.capacity != max_workers and not AUTOSCALE:
+        _scheduler.resize(max_workers)
+    return _scheduler
 
 
-def _run_task_in_thread(db_session_factory, scenario_id: str, task: Dict, task_index: int, report_id: str, run_id: str):
+async def set_browser_workers(count: int):
     """
-    Run a single task in a thread with its own event loop and DB session.
-    This allows parallel execution of browser tasks.
+    Resize browser concurrency live. Extra slots are granted to waiting tasks at once;
+    when shrinking, running tasks finish and their browsers are closed instead of reused.
     """
-    db = db_session_factory()
-    try:
-        scenario = db.query(Scenario).filter(Scenario.id == scenario_id).first()
-        if not scenario:
-            raise ValueError(f"Scenario {scenario_id} not found")
+    scheduler = _get_scheduler(count)
+    scheduler.resize(count)
+    if EXECUTION_BACKEND == "asyncio":
+        await get_browser_pool(count)
 
-        # Recreate SystemConfig from dict (can't pass SQLAlchemy objects across threads)
-        sys_config = db.query(SystemConfig).filter(SystemConfig.id == 1).first()
-        if not sys_config:
-            raise ValueError("System configuration not found")
 
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+def start_concurrency_controller(initial: int) -> asyncio.Task | None:
+    """Start auto-tuning browser concurrency when USEFLY_AUTOSCALE is set (called on startup)."""
+    if not AUTOSCALE:
+        return None
+
+    scheduler = _get_scheduler(initial)
+    controller = ConcurrencyController(
+        apply=set_browser_workers,
+        get_load=lambda: (scheduler.in_use, scheduler.waiting),
+        initial=initial,
+        min_workers=MIN_BROWSER_WORKERS,
+        max_workers=MAX_BROWSER_WORKERS,
+        interval=AUTOSCALE_INTERVAL
+    )
+    return asyncio.create_task(controller.run())
+
+
+async def _run_task_with_slot(
+    db_session_factory,
+    scheduler: FairScheduler,
+    scenario: Scenario,
+    task: dict,
+    task_index: int,
+    report_id: str,
+    run_id: str,
+    system_config: SystemConfig,
+    priority: str = DEFAULT_PRIORITY
+):
+    """
+    Run a single task once the scheduler grants it a browser slot.
+    Runs on the server's event loop, using a warm browser from the shared pool when one can be provided. If the run
+    is cancelled the slot is released at once and the browser is closed, not reused.
+    """
+    async with scheduler.slot(run_id, task_index, priority):
+        # Worker processes keep their own browsers, so only the in-loop backend uses the shared pool
+        pool = None
+        browser_session = None
+        if EXECUTION_BACKEND != "process":
+            pool = await get_browser_pool(scheduler.capacity)
+            try:
+                browser_session = await pool.acquire()
+            except Exception as e:
+                # Fall back to a browser launched by the agent itself
+                print(f"Browser pool unavailable, launching a dedicated browser: {e}")
+
+        cancelled = False
         try:
-            loop.run_until_complete(execute_single_task(db, scenario, task, task_index, report_id, run_id, sys_config))
+            await execute_single_task(
+                db_session_factory, scenario, task, task_index, report_id, run_id, system_config, browser_session
+            )
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            print(f"Error in browser task: {e}")
+            update_run_status(run_id, failed=1, task_index=task_index)
         finally:
-            loop.close()
+            if browser_session is not None:
+                await pool.release(browser_session, discard=cancelled)
+
+
+async def run_persona_tasks(
+    db_session_factory,
+    scenario_id: str,
+    report_id: str,
+    run_id: str,
+    priority: str = DEFAULT_PRIORITY
+):
+    """
+    Run persona tasks as asyncio tasks on the current event loop.
+    Parallelism is bounded by the shared fair-share scheduler sized from
+    SystemConfig.max_browser_workers (default: 3); "interactive" runs are served
+    before "batch" runs and concurrent runs of the same priority share slots evenly.
+    Scenario and SystemConfig are loaded once, in a thread, and shared by every task of the run.
+    """
+    try:
+        prepared = await asyncio.to_thread(_prepare_run, db_session_factory, scenario_id, report_id, run_id)
+        if prepared is None:
+            return
+        scenario, sys_config, tasks_to_run = prepared
+
+        # Initialize with full task list for per-task progress tracking
+        init_run_status(
+            run_id=run_id,
+            scenario_id=scenario_id,
+            scenario_name=scenario.name,
+            report_id=report_id,
+            task_count=len(tasks_to_run),
+            tasks=tasks_to_run,
+            run_type="persona_run",
+            priority=priority
+        )
+
+        _schedule_tasks(db_session_factory, scenario, sys_config, report_id, run_id, list(enumerate(tasks_to_run)))
+
     except Exception as e:
-        print(f"Error in browser task thread: {e}")
-        update_run_status(run_id, failed=1, task_index=task_index)
-    finally:
-        db.close()
+        print(f"Fatal error in run_scenario_tasks: {e}")
+        if run_id in _active_runs:
+            _active_runs[run_id]["status"] = "failed"
+            _active_runs[run_id]["error"] = str(e)
+            _add_log(run_id, f"Fatal error: {e!s}")
 
 
-async def run_persona_tasks(db_session_factory, scenario_id: str, report_id: str, run_id: str):
+def _prepare_run(db_session_factory, scenario_id: str, report_id: str, run_id: str) -> tuple | None:
     """
-    Run persona tasks using ThreadPoolExecutor for controlled parallelism.
-    max_workers is controlled by SystemConfig.max_browser_workers (default: 3).
+    Load a run's scenario, SystemConfig and selected tasks, detached from their session
+    (called in a thread). With the queue backend the tasks are enqueued for workers
+    instead, and None is returned.
     """
-    global _browser_executor
     db = db_session_factory()
-
     try:
         scenario = db.query(Scenario).filter(Scenario.id == scenario_id).first()
         if not scenario:
@@ -510,13 +1014,6 @@ async def run_persona_tasks(db_session_factory, scenario_id: str, report_id: str
         if not sys_config:
             raise ValueError("System configuration not found")
 
-        # Initialize or recreate thread pool with current config
-        max_workers = sys_config.max_browser_workers
-        if _browser_executor is None or _browser_executor._max_workers != max_workers:
-            if _browser_executor is not None:
-                _browser_executor.shutdown(wait=False)
-            _browser_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="browser_task")
-
         all_tasks = scenario.tasks or []
         selected_indices = scenario.selected_task_indices or list(range(len(all_tasks)))
 
@@ -529,59 +1026,80 @@ async def run_persona_tasks(db_session_factory, scenario_id: str, report_id: str
         if not tasks_to_run:
             raise ValueError("No tasks to run")
 
-        # Initialize with full task list for per-task progress tracking
-        init_run_status(
-            run_id=run_id,
-            scenario_id=scenario_id,
-            scenario_name=scenario.name,
-            report_id=report_id,
-            task_count=len(tasks_to_run),
-            tasks=tasks_to_run,
-            run_type="persona_run"
+        if EXECUTION_BACKEND == "queue":
+            # Workers pick these up; status is served from the task_jobs rows
+            task_queue.enqueue_run_tasks(db, scenario, tasks_to_run, report_id, run_id, sys_config.max_steps)
+            return None
+
+        # Detach loaded rows so tasks can read them after this session closes
+        db.expunge(scenario)
+        db.expunge(sys_config)
+        return scenario, sys_config, tasks_to_run
+    finally:
+        db.close()
+
+
+def _schedule_tasks(
+    db_session_factory,
+    scenario: Scenario,
+    sys_config: SystemConfig,
+    report_id: str,
+    run_id: str,
+    indexed_tasks: list[tuple]
+):
+    """Start the background task that runs (task_index, task) pairs of a tracked run."""
+    scheduler = _get_scheduler(sys_config.max_browser_workers)
+    get_run_writer(db_session_factory)
+    priority = _active_runs[run_id].get("priority", DEFAULT_PRIORITY) if run_id in _active_runs else DEFAULT_PRIORITY
+    task_coros = [
+        _run_task_with_slot(
+            db_session_factory,
+            scheduler,
+            scenario,
+            task,
+            task_index,
+            report_id,
+            run_id,
+            sys_config,
+            priority
         )
+        for task_index, task in indexed_tasks
+    ]
 
-        loop = asyncio.get_event_loop()
-        futures = []
-        for task_index, task in enumerate(tasks_to_run):
-            future = loop.run_in_executor(
-                _browser_executor,
-                _run_task_in_thread,
-                db_session_factory,
-                scenario.id,
-                task,
-                task_index,
-                report_id,
-                run_id
-            )
-            futures.append(future)
+    run_task = asyncio.create_task(_wait_for_completion(task_coros, run_id, db_session_factory))
+    _run_tasks[run_id] = run_task
+    run_task.add_done_callback(lambda _: _run_tasks.pop(run_id, None))
 
-        asyncio.create_task(_wait_for_completion(futures, run_id))
 
-    except Exception as e:
-        print(f"Fatal error in run_scenario_tasks: {e}")
-        if run_id in _active_runs:
-            _active_runs[run_id]["status"] = "failed"
-            _active_runs[run_id]["error"] = str(e)
-            _add_log(run_id, f"Fatal error: {str(e)}")
+def _warm_report_cache(db_session_factory, report_id: str):
+    """Precompute the finished report so the dashboard opens without recomputing it (runs in a thread)."""
+    db = db_session_factory()
+    try:
+        reports.warm_report_cache(db, report_id)
+    except Exception as e:  # noqa: BLE001
+        print(f"Error warming report cache for {report_id}: {e}")
     finally:
         db.close()
 
 
-async def _wait_for_completion(futures, run_id: str):
-    """Wait for all futures to complete and update final status."""
+async def _wait_for_completion(task_coros, run_id: str, db_session_factory=None):
+    """
+    Wait for all tasks to complete and their results to be written, then warm the
+    report cache for the finished report. Each task enforces its own deadline;
+    cancelling this coroutine (see cancel_run) cancels every task of the run.
+    """
     try:
-        await asyncio.wait_for(
-            asyncio.gather(*futures, return_exceptions=True),
-            timeout=600  # 10 minutes
-        )
-    except asyncio.TimeoutError:
-        print(f"Timeout (10 min) for run: {run_id}")
-        if run_id in _active_runs:
-            _active_runs[run_id]["status"] = "failed"
-            _active_runs[run_id]["error"] = "Timeout: 10 minutes exceeded"
-    except Exception as e:
+        await asyncio.gather(*task_coros, return_exceptions=True)
+        await get_run_writer().flush()
+        if db_session_factory is not None and run_id in _active_runs:
+            await asyncio.to_thread(_warm_report_cache, db_session_factory, _active_runs[run_id]["report_id"])
+    except asyncio.CancelledError:
+        print(f"Cancelled run: {run_id}")
+        _mark_dirty(run_id)
+        raise
+    except Exception as e:  # noqa: BLE001
         print(f"Error waiting for tasks: {e}")
         if run_id in _active_runs:
             _active_runs[run_id]["status"] = "failed"
             _active_runs[run_id]["error"] = str(e)
-
+            _mark_dirty(run_id)
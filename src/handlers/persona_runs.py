@@ -1,26 +1,41 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+import base64
+import json
 import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, desc, or_
+from sqlalchemy.orm import Session
+
+from src.common.fieldsets import load_fields
+from src.handlers.persona_run_events import build_event_rows, get_events_for_runs
+from src.handlers.report_aggregates import apply_runs
+from src.handlers.reports import _apply_run_filters
+from src.models import PersonaRun, PersonaRunCreate, PersonaRunEvent, Scenario
 
-from src.models import PersonaRun, Scenario, PersonaRunCreate
-from src.handlers.reports import _query_persona_runs
 
 def list_persona_runs(
     db: Session,
-    config_id: Optional[str] = None,
-    persona_type: Optional[str] = None,
-    report_id: Optional[str] = None,
-    status: Optional[str] = None,
-    platform: Optional[str] = None,
+    config_id: str | None = None,
+    persona_type: str | None = None,
+    report_id: str | None = None,
+    status: str | None = None,
+    platform: str | None = None,
     limit: int = 50,
     offset: int = 0,
-) -> List[PersonaRun]:
+    cursor: str | None = None,
+    fields: list[str] | None = None,
+) -> list[PersonaRun]:
     """
-    List persona runs with optional filters.
-    Uses _query_persona_runs for consistent filtering logic across the app.
+    List persona runs with optional filters, newest first.
+    Uses _apply_run_filters for consistent filtering logic across the app.
+
+    Ordering and paging run in SQL on (timestamp, id), backed by the
+    ix_persona_runs_*_timestamp_id indexes. Pass the cursor of the last run
+    of a page (see run_cursor) to get the next one; it stays stable while new
+    runs are inserted, unlike offset. With fields (see parse_fields) only those
+    columns and the timestamp are read.
     """
-    # Build filters dict for _query_persona_runs
+    # Build filters dict for _apply_run_filters
     filters = {}
     if persona_type:
         filters["persona_type"] = persona_type
@@ -29,27 +44,95 @@ def list_persona_runs(
     if platform:
         filters["platform"] = platform
 
-    # Use _query_persona_runs for consistent filtering (SINGLE SOURCE OF TRUTH)
-    runs = _query_persona_runs(
-        db,
+    # Use _apply_run_filters for consistent filtering (SINGLE SOURCE OF TRUTH)
+    query = _apply_run_filters(
+        load_fields(db.query(PersonaRun), PersonaRun, fields and fields + ["timestamp"]),
         report_id=report_id,
         config_id=config_id,
         filters=filters if filters else None
     )
 
-    # Sort by timestamp descending
-    runs = sorted(runs, key=lambda r: r.timestamp, reverse=True)
+    if cursor:
+        timestamp, run_id = decode_run_cursor(cursor)
+        query = query.filter(or_(
+            PersonaRun.timestamp < timestamp,
+            and_(PersonaRun.timestamp == timestamp, PersonaRun.id < run_id),
+        ))
+
+    query = query.order_by(desc(PersonaRun.timestamp), desc(PersonaRun.id))
+    if offset:
+        query = query.offset(offset)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def run_cursor(run: PersonaRun) -> str:
+    """Opaque list_persona_runs cursor pointing after the given run."""
+    payload = json.dumps([run.timestamp.isoformat(), run.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_run_cursor(cursor: str) -> tuple[datetime, str]:
+    """(timestamp, id) of a run_cursor; raises ValueError for a malformed cursor."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, run_id = json.loads(payload)
+        return datetime.fromisoformat(timestamp), str(run_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
-    # Apply limit and offset
-    return runs[offset:offset + limit] if limit else runs[offset:]
 
 def create_persona_run(db: Session, run: PersonaRunCreate) -> PersonaRun:
-    scenario = db.query(Scenario).filter(Scenario.id == run.config_id).first()
-    if not scenario:
+    db_run = insert_persona_runs(db, [run])[0]
+    if db_run is None:
         raise ValueError("Scenario not found")
+    db.refresh(db_run)
+    return db_run
+
 
-    db_run = PersonaRun(
-        id=str(uuid.uuid4()),
+def insert_persona_runs(db: Session, runs: list[PersonaRunCreate]) -> list[PersonaRun | None]:
+    """
+    Insert several persona runs in one transaction, together with their report
+    aggregate updates. Runs whose scenario no longer exists (deleted while the
+    task ran) are dropped with their streamed steps and come back as None.
+    """
+    config_ids = {run.config_id for run in runs}
+    existing = {row.id for row in db.query(Scenario.id).filter(Scenario.id.in_(config_ids))}
+    orphaned = [run.id for run in runs if run.config_id not in existing and run.id]
+    if orphaned:
+        print(f"Dropping {len(orphaned)} persona run(s) of deleted scenarios")
+        db.query(PersonaRunEvent).filter(PersonaRunEvent.persona_run_id.in_(orphaned)).delete(synchronize_session=False)
+    kept = [run for run in runs if run.config_id in existing]
+
+    # Runs whose steps were streamed while the agent ran get their events from storage
+    streamed = get_events_for_runs(db, [run.id for run in kept if run.id and not run.events])
+
+    db_runs = [_build_persona_run(run, streamed.get(run.id) or run.events) for run in kept]
+    # Error runs are built without their steps; count what the agent got through
+    for db_run in db_runs:
+        if streamed.get(db_run.id):
+            db_run.steps_completed = max(db_run.steps_completed or 0, _step_count(streamed[db_run.id]))
+    db.add_all(db_runs)
+    # Every run's steps end up in persona_run_events; streamed runs already have theirs
+    for run, db_run in zip(kept, db_runs):
+        if not streamed.get(run.id) and db_run.events:
+            db.add_all(build_event_rows(db_run.id, db_run.events, db_run.timestamp))
+    # Report aggregates are updated in the same transaction as the runs
+    apply_runs(db, db_runs)
+    db.commit()
+
+    inserted = iter(db_runs)
+    return [next(inserted) if run.config_id in existing else None for run in runs]
+
+
+def _step_count(events: list[dict]) -> int:
+    return len({event.get("step") for event in events if event.get("step") is not None})
+
+
+def _build_persona_run(run: PersonaRunCreate, events: list[dict]) -> PersonaRun:
+    return PersonaRun(
+        id=run.id or str(uuid.uuid4()),
         config_id=run.config_id,
         report_id=run.report_id,
         persona_type=run.persona_type,
@@ -63,16 +146,12 @@ def create_persona_run(db: Session, run: PersonaRunCreate) -> PersonaRun:
         final_result=run.final_result,
         judgement_data=run.judgement_data,
         task_description=run.task_description,
-        events=run.events,
+        events=events,
         task_goal = run.task_goal,
         task_steps = run.task_steps,
         task_url = run.task_url
     )
-    db.add(db_run)
-    db.commit()
-    db.refresh(db_run)
-    return db_run
 
-def get_persona_run(db: Session, run_id: str) -> Optional[PersonaRun]:
+def get_persona_run(db: Session, run_id: str) -> PersonaRun | None:
     """Get a specific persona run."""
     return db.query(PersonaRun).filter(PersonaRun.id == run_id).first()
@@ -0,0 +1,254 @@
+"""
+Process-pool execution backend for persona tasks.
+
+Each browser agent runs in a spawned worker process, so event extraction and
+pydantic validation don't share the API server's GIL and a crashing agent only
+takes down its worker. Step progress is relayed back through a multiprocessing
+queue and applied to the run tracker on the server's event loop. Cancelling the
+awaiting coroutine sets a shared flag that makes the worker stop its agent and
+close its browser.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import util as mp_util
+
+from src.models import PersonaRunCreate, SystemConfig
+
+# SystemConfig columns a worker needs to rebuild the config outside of a DB session
+_SYSTEM_CONFIG_FIELDS = ("provider", "model_name", "api_key", "use_thinking", "max_steps", "max_browser_workers")
+
+_executor: ProcessPoolExecutor | None = None
+_executor_size: int = 0
+_progress_queue = None
+_progress_pump: asyncio.Task | None = None
+
+# Shared dict of "run_id:task_index" keys the server wants stopped
+_cancel_manager = None
+_cancel_flags = None
+
+# Seconds between worker checks of the cancel flags
+CANCEL_POLL_INTERVAL = 1.0
+
+# Worker-process state, set up by _init_worker
+_worker_queue = None
+_worker_cancel_flags = None
+_worker_loop: asyncio.AbstractEventLoop | None = None
+_worker_browsers = None
+
+
+def _get_executor(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Get the worker pool, recreating it when more workers are needed or a worker crashed.
+    It never shrinks: the scheduler already limits how many tasks are submitted at once.
+    """
+    global _executor, _executor_size, _progress_queue, _cancel_manager, _cancel_flags
+    ctx = multiprocessing.get_context("spawn")
+    if _progress_queue is None:
+        _progress_queue = ctx.Queue()
+    if _cancel_manager is None:
+        _cancel_manager = ctx.Manager()
+        _cancel_flags = _cancel_manager.dict()
+
+    if _executor is None or max_workers > _executor_size:
+        if _executor is not None:
+            # In-flight tasks keep running in the old workers and still resolve their futures
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(_progress_queue, _cancel_flags, max_workers)
+        )
+        _executor_size = max_workers
+    return _executor
+
+
+def _ensure_progress_pump(on_progress: Callable):
+    """Start the coroutine that drains worker progress into the run tracker."""
+    global _progress_pump
+    if _progress_pump is None or _progress_pump.done():
+        _progress_pump = asyncio.create_task(_pump_progress(on_progress))
+
+
+async def _pump_progress(on_progress: Callable):
+    while True:
+        try:
+            # Short timeout so the helper thread never outlives a shutdown
+            item = await asyncio.to_thread(_progress_queue.get, True, 0.5)
+        except queue.Empty:
+            continue
+        try:
+            on_progress(*item)
+        except Exception as e:  # noqa: BLE001
+            print(f"Error applying worker progress: {e}")
+
+
+async def run_task_in_process(
+    config_id: str,
+    report_id: str,
+    run_id: str,
+    task: dict,
+    task_index: int,
+    system_config: SystemConfig,
+    on_progress: Callable,
+    max_workers: int | None = None,
+    persona_run_id: str | None = None
+) -> PersonaRunCreate:
+    """Run one persona task in a worker process and return its PersonaRun payload."""
+    global _executor
+    executor = _get_executor(max_workers or system_config.max_browser_workers)
+    _ensure_progress_pump(on_progress)
+
+    payload = {
+        "config_id": config_id,
+        "report_id": report_id,
+        "run_id": run_id,
+        "task": task,
+        "task_index": task_index,
+        "persona_run_id": persona_run_id,
+        "system_config": {field: getattr(system_config, field) for field in _SYSTEM_CONFIG_FIELDS},
+    }
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, _run_task, payload)
+    except asyncio.CancelledError:
+        # The executor can't interrupt a running worker, so ask the worker to stop its agent
+        _cancel_flags[_task_key(run_id, task_index)] = True
+        raise
+    except BrokenProcessPool:
+        # A worker died (e.g. Chromium took it down); start a fresh pool for the next task
+        if _executor is executor:
+            _executor = None
+        raise RuntimeError("Agent worker process crashed")
+
+
+async def shutdown_process_backend():
+    """Stop the progress pump and the worker pool (called on server shutdown)."""
+    global _executor, _progress_pump, _cancel_manager, _cancel_flags
+    if _progress_pump is not None:
+        _progress_pump.cancel()
+        _progress_pump = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _cancel_manager is not None:
+        _cancel_manager.shutdown()
+        _cancel_manager = None
+        _cancel_flags = None
+
+
+def _task_key(run_id: str, task_index: int) -> str:
+    return f"{run_id}:{task_index}"
+
+
+# =============================================================================
+# Worker process side
+# =============================================================================
+
+def _init_worker(progress_queue, cancel_flags, pool_size):
+    """
+    Give each worker a persistent event loop so its browser can be reused across
+    tasks, and its share of the LLM rate limits.
+    """
+    global _worker_queue, _worker_cancel_flags, _worker_loop
+    from src.common import llm_rate_limiter
+    os.environ.setdefault('ANONYMIZED_TELEMETRY', 'false')
+    _worker_queue = progress_queue
+    _worker_cancel_flags = cancel_flags
+    llm_rate_limiter.set_process_share(pool_size)
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    # Close this worker's browser when the pool retires the process, so Chromium isn't orphaned
+    mp_util.Finalize(None, _close_worker_browsers, exitpriority=10)
+
+
+def _close_worker_browsers():
+    if _worker_browsers is not None:
+        try:
+            _worker_loop.run_until_complete(_worker_browsers.close())
+        except Exception as e:  # noqa: BLE001
+            print(f"Error closing worker browsers: {e}")
+
+
+def _run_task(payload: dict) -> PersonaRunCreate:
+    return _worker_loop.run_until_complete(_run_task_async(payload))
+
+
+async def _run_task_async(payload: dict) -> PersonaRunCreate:
+    global _worker_browsers
+    from src.common import llm_rate_limiter
+    from src.common.browser_pool import BrowserPool
+    from src.database import SessionLocal
+    from src.handlers.persona_run_events import make_event_sink
+    from src.handlers.persona_runner import run_task_agent
+
+    if _worker_browsers is None:
+        _worker_browsers = BrowserPool(size=1)
+
+    try:
+        browser_session = await _worker_browsers.acquire()
+    except Exception as e:  # noqa: BLE001
+        print(f"Worker browser pool unavailable, launching a dedicated browser: {e}")
+        browser_session = None
+
+    run_id = payload["run_id"]
+    task_index = payload["task_index"]
+
+    def on_step(step: int, action: str | None, url: str | None):
+        _worker_queue.put((run_id, task_index, step, action, url))
+
+    llm_wait = 0.0
+
+    def on_llm_wait(seconds: float):
+        nonlocal llm_wait
+        llm_wait += seconds
+        _worker_queue.put((run_id, task_index, None, None, None, llm_wait))
+
+    # Set before creating the agent task so its LLM calls inherit the listener
+    llm_rate_limiter.wait_listener.set(on_llm_wait)
+
+    # Steps go straight to the shared database from here
+    persona_run_id = payload.get("persona_run_id")
+    event_sink = make_event_sink(SessionLocal, persona_run_id) if persona_run_id else None
+    agent_task = asyncio.create_task(run_task_agent(
+        config_id=payload["config_id"],
+        report_id=payload["report_id"],
+        task=payload["task"],
+        system_config=SystemConfig(**payload["system_config"]),
+        on_step_callback=on_step,
+        browser_session=browser_session,
+        persona_run_id=persona_run_id,
+        on_events=event_sink
+    ))
+    watcher = asyncio.create_task(_watch_cancel_flag(_task_key(run_id, task_index), agent_task))
+
+    cancelled = False
+    try:
+        return await agent_task
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        watcher.cancel()
+        # The server records the PersonaRun from the stored steps once this returns
+        if event_sink is not None:
+            await event_sink.flush()
+        _worker_cancel_flags.pop(_task_key(run_id, task_index), None)
+        if browser_session is not None:
+            await _worker_browsers.release(browser_session, discard=cancelled)
+
+
+async def _watch_cancel_flag(key: str, agent_task: asyncio.Task):
+    """Cancel the agent once the server flags this task."""
+    while not agent_task.done():
+        await asyncio.sleep(CANCEL_POLL_INTERVAL)
+        if _worker_cancel_flags.get(key):
+            agent_task.cancel()
+            return
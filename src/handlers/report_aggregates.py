@@ -0,0 +1,293 @@
+"""
+Maintenance of the materialized report aggregate tables.
+
+Each inserted PersonaRun adds its status, duration, steps, URL visits,
+transitions and friction to the rows of its segment (report, scenario, persona,
+platform, status), in the same transaction as the run itself. Counters are
+incremented in SQL, so concurrent writers add up instead of losing updates.
+Report reads in src.handlers.reports then sum segment rows instead of replaying
+every run's events.
+"""
+
+from sqlalchemy import case
+from sqlalchemy.orm import Session, defer
+
+from src.database import dialect_insert
+from src.handlers.persona_run_events import get_url_steps
+from src.handlers.reports import (
+    UNKNOWN_LOCATION,
+    _run_status,
+    aggregate_transitions,
+    break_sequence_on_cycles,
+    calculate_node_metrics,
+    extract_url_sequence_from_events,
+    friction_location_and_reason,
+    version_scopes,
+)
+from src.handlers.url_dictionary import intern_urls
+from src.handlers.url_templates import rules_fingerprint
+from src.models import (
+    PersonaRun,
+    ReportAggregateInfo,
+    ReportFriction,
+    ReportLink,
+    ReportNode,
+    ReportSegment,
+    ReportVersion,
+)
+
+# Steps kept by the step-based ("full") Sankey
+STEP_SANKEY_MAX_STEPS = 10
+
+# Runs replayed per query while backfilling
+BACKFILL_BATCH_SIZE = 500
+
+# ReportAggregateInfo key of the URL templating rules the rows were built with
+URL_RULES_KEY = "url_rules"
+
+
+# Columns identifying a segment, in _segment_key order
+SEGMENT_KEY_COLUMNS = ("report_id", "config_id", "persona_type", "platform", "status")
+
+# Failed runs kept as examples per friction row
+FRICTION_EXAMPLES = 3
+
+
+def _segment_key(run: PersonaRun) -> tuple[str, str, str, str, str]:
+    return (
+        run.report_id or "",
+        run.config_id,
+        run.persona_type,
+        run.platform or "",
+        _run_status(run.is_done, run.judgement_data) or "",
+    )
+
+
+def _least(current, new):
+    """SQL min of a nullable column and the incoming value, ignoring NULLs."""
+    return case((new.is_(None), current), (current.is_(None), new), (new < current, new), else_=current)
+
+
+def _greatest(current, new):
+    """SQL max of a nullable column and the incoming value, ignoring NULLs."""
+    return case((new.is_(None), current), (current.is_(None), new), (new > current, new), else_=current)
+
+
+class _AggregateDeltas:
+    """
+    What a batch of runs adds to the aggregate rows, summed in memory and then
+    applied with upserts that increment in SQL (count = count + n), so writers
+    in other sessions or processes never overwrite each other's counts.
+    """
+
+    def __init__(self):
+        self.segments: dict[tuple, dict] = {}
+        self.nodes: dict[tuple, list[int]] = {}  # (segment key, mode, step, url_id) -> [visits, event_count]
+        self.links: dict[tuple, int] = {}  # (segment key, mode, step, source, target) -> count
+        self.friction: dict[tuple, list] = {}  # (report_id, config_id, url_id, reason) -> [count, run ids]
+
+    def add_run(self, db: Session, run: PersonaRun, events: list[dict]):
+        key = _segment_key(run)
+        segment = self.segments.setdefault(key, {
+            "run_count": 0, "duration_sum": 0.0, "duration_count": 0, "min_duration": None,
+            "max_duration": None, "steps_sum": 0, "steps_count": 0, "max_steps": None,
+        })
+        segment["run_count"] += 1
+        if run.duration_seconds is not None:
+            segment["duration_sum"] += run.duration_seconds
+            segment["duration_count"] += 1
+            duration = run.duration_seconds
+            segment["min_duration"] = duration if segment["min_duration"] is None else min(segment["min_duration"], duration)
+            segment["max_duration"] = duration if segment["max_duration"] is None else max(segment["max_duration"], duration)
+        if run.steps_completed is not None:
+            segment["steps_sum"] += run.steps_completed
+            segment["steps_count"] += 1
+            steps = run.steps_completed
+            segment["max_steps"] = steps if segment["max_steps"] is None else max(segment["max_steps"], steps)
+
+        if key[4] == "failed":
+            self._add_friction(db, run, events)
+        if not events:
+            return
+        # Journeys are computed on interned ids; strings are resolved when reports are read
+        urls = extract_url_sequence_from_events(events)
+        url_ids = intern_urls(db, set(urls))
+        url_sequence = [url_ids[url] for url in urls]
+
+        # Compact Sankey: cycle-broken sequences, one node per URL
+        sequences = break_sequence_on_cycles(url_sequence)
+        for url, metrics in calculate_node_metrics(sequences).items():
+            self._add_node(key, "compact", 0, url, metrics["visits"], metrics["event_count"])
+        for (source, target), count in aggregate_transitions(sequences).items():
+            self._add_link(key, "compact", 0, source, target, count)
+
+        # Step-based Sankey: one node per (step, url) over the first steps
+        for i, url in enumerate(url_sequence[:STEP_SANKEY_MAX_STEPS]):
+            self._add_node(key, "full", i, url, 1, 1)
+            if i > 0:
+                self._add_link(key, "full", i, url_sequence[i - 1], url, 1)
+
+    def _add_node(self, key: tuple, mode: str, step: int, url_id: int, visits: int, event_count: int):
+        node = self.nodes.setdefault((key, mode, step, url_id), [0, 0])
+        node[0] += visits
+        node[1] += event_count
+
+    def _add_link(self, key: tuple, mode: str, step: int, source: int, target: int, count: int):
+        link_key = (key, mode, step, source, target)
+        self.links[link_key] = self.links.get(link_key, 0) + count
+
+    def _add_friction(self, db: Session, run: PersonaRun, events: list[dict]):
+        location, reason = friction_location_and_reason(run, events)
+        location_url_id = 0 if location == UNKNOWN_LOCATION else intern_urls(db, [location])[location]
+        row = self.friction.setdefault((run.report_id or "", run.config_id, location_url_id, reason), [0, []])
+        row[0] += 1
+        row[1].append(run.id)
+
+    def apply(self, db: Session):
+        segment_ids = {key: _upsert_segment(db, key, delta) for key, delta in self.segments.items()}
+
+        if self.nodes:
+            stmt = dialect_insert(db, ReportNode)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["segment_id", "mode", "step", "url_id"],
+                set_={
+                    "visits": ReportNode.visits + stmt.excluded.visits,
+                    "event_count": ReportNode.event_count + stmt.excluded.event_count,
+                },
+            ), [
+                {"segment_id": segment_ids[key], "mode": mode, "step": step, "url_id": url_id,
+                 "visits": visits, "event_count": event_count}
+                for (key, mode, step, url_id), (visits, event_count) in self.nodes.items()
+            ])
+
+        if self.links:
+            stmt = dialect_insert(db, ReportLink)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["segment_id", "mode", "step", "source_url_id", "target_url_id"],
+                set_={"count": ReportLink.count + stmt.excluded.count},
+            ), [
+                {"segment_id": segment_ids[key], "mode": mode, "step": step,
+                 "source_url_id": source, "target_url_id": target, "count": count}
+                for (key, mode, step, source, target), count in self.links.items()
+            ])
+
+        for key, (count, run_ids) in self.friction.items():
+            _upsert_friction(db, key, count, run_ids)
+
+
+def _upsert_segment(db: Session, key: tuple, delta: dict) -> int:
+    """Add a segment's deltas in one statement and return the segment id."""
+    stmt = dialect_insert(db, ReportSegment).values(**dict(zip(SEGMENT_KEY_COLUMNS, key)), **delta)
+    new = stmt.excluded
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=list(SEGMENT_KEY_COLUMNS),
+        set_={
+            "run_count": ReportSegment.run_count + new.run_count,
+            "duration_sum": ReportSegment.duration_sum + new.duration_sum,
+            "duration_count": ReportSegment.duration_count + new.duration_count,
+            "min_duration": _least(ReportSegment.min_duration, new.min_duration),
+            "max_duration": _greatest(ReportSegment.max_duration, new.max_duration),
+            "steps_sum": ReportSegment.steps_sum + new.steps_sum,
+            "steps_count": ReportSegment.steps_count + new.steps_count,
+            "max_steps": _greatest(ReportSegment.max_steps, new.max_steps),
+        },
+    ))
+    return db.query(ReportSegment.id).filter(
+        *(getattr(ReportSegment, column) == value for column, value in zip(SEGMENT_KEY_COLUMNS, key))
+    ).scalar()
+
+
+def _upsert_friction(db: Session, key: tuple, count: int, run_ids: list[str]):
+    report_id, config_id, location_url_id, reason = key
+    stmt = dialect_insert(db, ReportFriction).values(
+        report_id=report_id, config_id=config_id, location_url_id=location_url_id, reason=reason,
+        count=count, example_run_ids=run_ids[:FRICTION_EXAMPLES],
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["report_id", "config_id", "location_url_id", "reason"],
+        set_={"count": ReportFriction.count + stmt.excluded.count},
+    ))
+
+    # The upsert holds the row's write lock until commit, so topping up its
+    # examples here can't race another writer
+    row = db.query(ReportFriction.id, ReportFriction.example_run_ids).filter(
+        ReportFriction.report_id == report_id,
+        ReportFriction.config_id == config_id,
+        ReportFriction.location_url_id == location_url_id,
+        ReportFriction.reason == reason,
+    ).one()
+    examples = list(row.example_run_ids or [])
+    if len(examples) < FRICTION_EXAMPLES:
+        examples += [run_id for run_id in run_ids if run_id not in examples]
+        db.query(ReportFriction).filter(ReportFriction.id == row.id).update(
+            {ReportFriction.example_run_ids: examples[:FRICTION_EXAMPLES]}, synchronize_session=False
+        )
+
+
+def apply_runs(db: Session, runs: list[PersonaRun], events_by_run: dict[str, list[dict]] | None = None):
+    """
+    Add new runs to the aggregate tables. Called before the inserting transaction commits.
+    Events come from events_by_run when given (e.g. url steps from persona_run_events), else run.events.
+    """
+    deltas = _AggregateDeltas()
+    for run in runs:
+        deltas.add_run(db, run, events_by_run.get(run.id, []) if events_by_run is not None else run.events)
+    deltas.apply(db)
+    bump_report_versions(db, {scope for run in runs for scope in version_scopes(run.report_id, run.config_id)})
+
+
+def bump_report_versions(db: Session, scopes: set[str]):
+    """Invalidate cached reads of the given scopes (and of "all"), in the caller's transaction."""
+    stmt = dialect_insert(db, ReportVersion)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["scope"], set_={"version": ReportVersion.version + 1}
+    ), [{"scope": scope, "version": 1} for scope in sorted(scopes | {"all"})])
+
+
+def delete_scenario_aggregates(db: Session, scenario_id: str):
+    """Drop aggregate rows of a deleted scenario (the caller commits)."""
+    scopes = set(version_scopes(None, scenario_id))
+    for row in db.query(ReportSegment.report_id).filter(ReportSegment.config_id == scenario_id).distinct():
+        scopes.update(version_scopes(row.report_id, None))
+    bump_report_versions(db, scopes)
+    segment_ids = db.query(ReportSegment.id).filter(ReportSegment.config_id == scenario_id)
+    db.query(ReportNode).filter(ReportNode.segment_id.in_(segment_ids)).delete(synchronize_session=False)
+    db.query(ReportLink).filter(ReportLink.segment_id.in_(segment_ids)).delete(synchronize_session=False)
+    db.query(ReportSegment).filter(ReportSegment.config_id == scenario_id).delete(synchronize_session=False)
+    db.query(ReportFriction).filter(ReportFriction.config_id == scenario_id).delete(synchronize_session=False)
+
+
+def backfill_report_aggregates(db: Session, rebuild: bool = False) -> int:
+    """
+    Build the aggregate tables from existing persona runs when they are empty
+    (first start after upgrading) or were built with other URL templating rules.
+    With rebuild they are rebuilt regardless: the repair for tables that drifted
+    from the runs (`usefly rebuild-reports`). Run backfill_run_events first.
+    Returns the number of runs replayed.
+    """
+    rules = db.get(ReportAggregateInfo, URL_RULES_KEY)
+    if rebuild or db.query(ReportSegment.id).first() is not None:
+        if not rebuild and rules is not None and rules.value == rules_fingerprint():
+            return 0
+        for model in (ReportNode, ReportLink, ReportSegment, ReportFriction):
+            db.query(model).delete(synchronize_session=False)
+        # Every cached read was built from the old rows
+        db.query(ReportVersion).update({ReportVersion.version: ReportVersion.version + 1}, synchronize_session=False)
+    db.merge(ReportAggregateInfo(key=URL_RULES_KEY, value=rules_fingerprint()))
+
+    # Replayed in the same (storage) order report scans read runs in. Journeys come
+    # from the indexed persona_run_events columns rather than the events JSON.
+    replayed = 0
+    batch: list[PersonaRun] = []
+    for run in db.query(PersonaRun).options(defer(PersonaRun.events)).yield_per(BACKFILL_BATCH_SIZE):
+        batch.append(run)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            apply_runs(db, batch, get_url_steps(db, [run.id for run in batch]))
+            db.flush()
+            replayed += len(batch)
+            batch = []
+    if batch:
+        apply_runs(db, batch, get_url_steps(db, [run.id for run in batch]))
+        replayed += len(batch)
+    db.commit()
+    return replayed
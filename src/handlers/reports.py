@@ -1,12 +1,39 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional, Dict
-from datetime import datetime
-
-from src.models import PersonaRun, Scenario
-
-
-def list_report_summaries(db: Session) -> List[Dict]:
+import os
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Query, Session
+
+from src.common.fieldsets import load_fields
+from src.common.lru_cache import LRUCache
+from src.common.single_flight import SingleFlight
+from src.common.topological_order import IncrementalTopologicalOrder
+from src.handlers.url_dictionary import resolve_urls
+from src.handlers.url_templates import journey_url
+from src.models import (
+    PersonaRun,
+    ReportFriction,
+    ReportLink,
+    ReportNode,
+    ReportSegment,
+    ReportVersion,
+    Scenario,
+)
+
+# Aggregate and friction results kept in memory; an entry is reused until its
+# report or scenario's version changes (see _report_version)
+REPORT_CACHE_SIZE = int(os.environ.get("USEFLY_REPORT_CACHE_SIZE", "256"))
+_report_cache = LRUCache(REPORT_CACHE_SIZE)
+
+# Identical report requests in flight at the same time share one computation
+_report_flights = SingleFlight()
+
+# Pages a Sankey keeps by default on /api/reports/aggregate before the rest fold
+# into an "Other" node, so payloads stay renderable however large the site is
+SANKEY_TOP_K = int(os.environ.get("USEFLY_SANKEY_TOP_K", "50"))
+OTHER_NODE = "Other"
+
+
+def list_report_summaries(db: Session) -> list[dict]:
     """
     List all unique report_ids with metadata.
 
@@ -44,19 +71,33 @@ def list_report_summaries(db: Session) -> List[Dict]:
     return summaries
 
 
-def _query_persona_runs(
-    db: Session,
-    report_id: Optional[str] = None,
-    config_id: Optional[str] = None,
-    filters: Optional[Dict[str, str]] = None
-) -> List[PersonaRun]:
+def _status_condition(status: str):
     """
-    Query PersonaRun records with optional filters applied at the database level.
+    SQL condition for a run status, matching the frontend definition:
+    - success: is_done=True AND judgement_data.verdict=True
+    - failed (Goal Not Met): is_done=True AND judgement_data.verdict != True
+    - error: is_done=False (crashed/timeout)
+    """
+    verdict = func.json_extract(PersonaRun.judgement_data, '$.verdict')
+    if status == "success":
+        return and_(PersonaRun.is_done == True, verdict == True)
+    if status == "failed":
+        return and_(PersonaRun.is_done == True, verdict != True)
+    if status == "error":
+        return PersonaRun.is_done == False
+    return None
+
+
+def _apply_run_filters(
+    query: Query,
+    report_id: str | None = None,
+    config_id: str | None = None,
+    filters: dict[str, str] | None = None
+) -> Query:
+    """
+    Apply report, scenario and UI filters to a PersonaRun query.
     This is the SINGLE SOURCE OF TRUTH for filtering persona runs.
-    Used by both reports and general persona run queries.
     """
-    query = db.query(PersonaRun)
-
     # Report filter
     if report_id:
         query = query.filter(PersonaRun.report_id == report_id)
@@ -72,143 +113,151 @@ def _query_persona_runs(
 
         # Status filter - SINGLE SOURCE OF TRUTH
         if filters.get("status") and filters["status"] != "all":
-            status = filters["status"]
-
-            # Logic matches frontend definition of status:
-            # - success: is_done=True AND judgement_data.verdict=True
-            # - failed (Goal Not Met): is_done=True AND judgement_data.verdict != True
-            # - error: is_done=False (crashed/timeout)
-
-            if status == "success":
-                query = query.filter(
-                    PersonaRun.is_done == True,
-                    func.json_extract(PersonaRun.judgement_data, '$.verdict') == True
-                )
-            elif status == "failed":
-                # Goal Not Met: is_done but verdict is not true
-                query = query.filter(
-                    PersonaRun.is_done == True,
-                    func.json_extract(PersonaRun.judgement_data, '$.verdict') != True
-                )
-            elif status == "error":
-                query = query.filter(PersonaRun.is_done == False)
+            condition = _status_condition(filters["status"])
+            if condition is not None:
+                query = query.filter(condition)
 
         # Platform filter
         if filters.get("platform") and filters["platform"] != "all":
             query = query.filter(PersonaRun.platform == filters["platform"])
 
-    return query.all()
+    return query
 
 
 def get_report_aggregate(
     db: Session,
-    report_id: str = None,
-    config_id: str = None,
+    report_id: str | None = None,
+    config_id: str | None = None,
     sankey_mode: str = "compact",
-    filters: Optional[Dict[str, str]] = None
-) -> Optional[Dict]:
+    filters: dict[str, str] | None = None,
+    top_k: int | None = None,
+    min_link_value: int = 0,
+    other: bool = True
+) -> dict | None:
     """
     Get aggregated data for a specific report_id or scenario with optional filtering.
 
-    Returns metrics summary and journey Sankey diagram data.
+    Returns metrics summary and journey Sankey diagram data, pruned by
+    prune_sankey when top_k or min_link_value is set. Results are cached
+    per (report, scenario, mode, filters) until the report's version changes.
+    Callers must not mutate the returned dict.
     """
-    # Get all runs for this report_id and/or config_id with filters applied
-    runs = _query_persona_runs(db, report_id=report_id, config_id=config_id, filters=filters)
-
-    if not runs:
-        # If filtered runs is empty but report exists (unfiltered check), return empty structure
-        # This handles the case where filters match nothing but the report is valid
-        if not _query_persona_runs(db, report_id=report_id):
-             return None
-             
-        # Get scenario info from unfiltered 
-        first_run = db.query(PersonaRun).filter(PersonaRun.report_id == report_id).first()
-        scenario = db.query(Scenario).filter(Scenario.id == first_run.config_id).first() if first_run else None
-        scenario_name = scenario.name if scenario else "Unknown Scenario"
-        scenario_id = scenario.id if scenario else "unknown"
+    key = ("aggregate", report_id, config_id, sankey_mode, _cache_filters(filters))
+    version = _report_version(db, report_id, config_id)
+    found, result = _report_cache.get(key, version)
+    if not found:
+        result = _report_flights.do(
+            key + (version,), lambda: _read_report_aggregate(db, report_id, config_id, sankey_mode, filters)
+        )
+        _report_cache.put(key, version, result)
+    if result and (top_k or min_link_value):
+        # Pruned per request on a copy; the cached entry keeps the full graph
+        result = {**result, "journey_sankey": prune_sankey(result["journey_sankey"], top_k, min_link_value, other)}
+    return result
 
-        return {
-            "report_id": report_id,
-            "scenario_id": scenario_id,
-            "scenario_name": scenario_name,
-            "run_count": 0,
-            "metrics_summary": {
-                "total_runs": 0,
-                "completed_runs": 0,
-                "failed_runs": 0,
-                "success_rate": 0.0,
-                "avg_duration_seconds": 0.0,
-                "avg_steps": 0.0,
-            },
-            "journey_sankey": {"nodes": [], "links": []},
-        }
 
-    # Get scenario info from first run
-    scenario = db.query(Scenario).filter(Scenario.id == runs[0].config_id).first()
-    scenario_name = scenario.name if scenario else "Unknown Scenario"
+def get_report_runs(
+    db: Session,
+    report_id: str,
+    filters: dict[str, str] | None = None,
+    fields: list[str] | None = None
+) -> list[PersonaRun]:
+    """
+    Filtered runs of a report; concurrent identical requests share one query.
+    With fields (see parse_fields) only those columns are read.
+    """
+    key = ("runs", report_id, _cache_filters(filters), tuple(fields or ()))
+    return _report_flights.do(key, lambda: _apply_run_filters(
+        load_fields(db.query(PersonaRun), PersonaRun, fields), report_id=report_id, filters=filters
+    ).all())
 
-    # Calculate metrics summary
-    metrics_summary = _calculate_metrics_summary(db, report_id, config_id, filters)
 
-    # Get friction hotspots for Sankey diagram annotation
-    friction_hotspots = get_friction_hotspots(db, report_id=report_id, config_id=config_id)
+def warm_report_cache(db: Session, report_id: str):
+    """Precompute the default dashboard views of a report (called when a run finishes)."""
+    get_report_aggregate(db, report_id)
+    get_friction_hotspots(db, report_id=report_id)
 
-    # Generate Sankey diagram data with friction metadata
-    journey_sankey = _generate_sankey_data(runs, mode=sankey_mode, friction_data=friction_hotspots)
 
-    return {
-        "report_id": report_id,
-        "scenario_id": runs[0].config_id,
-        "scenario_name": scenario_name,
-        "run_count": len(runs),
-        "metrics_summary": metrics_summary,
-        "journey_sankey": journey_sankey,
-    }
+def _cache_filters(filters: dict[str, str] | None) -> tuple:
+    """Normalized filters for cache keys: unset and "all" filters are dropped."""
+    if not filters:
+        return ()
+    return tuple(sorted((key, value) for key, value in filters.items() if value and value != "all"))
+
 
+def version_scopes(report_id: str | None, config_id: str | None) -> list[str]:
+    """ReportVersion scopes a report read depends on: its report and/or scenario, else "all"."""
+    scopes = []
+    if report_id:
+        scopes.append(f"report:{report_id}")
+    if config_id:
+        scopes.append(f"scenario:{config_id}")
+    return scopes or ["all"]
 
 
-def _calculate_metrics_summary(
+def _report_version(db: Session, report_id: str | None, config_id: str | None) -> tuple:
+    """
+    Version of a report or scenario's data. Every inserted run and every deleted
+    scenario bumps the counters of the scopes it touches, whichever process wrote
+    it, so a cached result is never reused after its data changed.
+    """
+    scopes = version_scopes(report_id, config_id)
+    versions = dict(db.query(ReportVersion.scope, ReportVersion.version).filter(ReportVersion.scope.in_(scopes)).all())
+    return tuple(versions.get(scope, 0) for scope in scopes)
+
+
+def _read_report_aggregate(
     db: Session,
-    report_id: str = None,
-    config_id: str = None,
-    filters: Optional[Dict[str, str]] = None
-) -> dict:
-    """Calculate aggregated metrics using _query_persona_runs (single source of truth)."""
-    base_filters = filters.copy() if filters else {}
+    report_id: str | None = None,
+    config_id: str | None = None,
+    sankey_mode: str = "compact",
+    filters: dict[str, str] | None = None
+) -> dict | None:
+    """
+    get_report_aggregate read from the materialized aggregate tables (see
+    report_aggregates), so the cost scales with URLs and transitions rather than runs.
+    """
+    segments = _filter_segments(db.query(ReportSegment), report_id, config_id).order_by(ReportSegment.id).all()
+    if not segments:
+        return None
+
+    # Filters that match nothing still return an empty structure for a valid report
+    matching = [segment for segment in segments if _segment_matches(segment, filters)]
+    first_config_id = (matching or segments)[0].config_id
 
-    # Query each status type separately using _query_persona_runs
-    # This ensures we use the single source of truth for status logic
-    success_runs = _query_persona_runs(db, report_id=report_id, config_id=config_id, filters={**base_filters, "status": "success"})
-    failed_runs = _query_persona_runs(db, report_id=report_id, config_id=config_id, filters={**base_filters, "status": "failed"})
-    error_runs = _query_persona_runs(db, report_id=report_id, config_id=config_id, filters={**base_filters, "status": "error"})
+    scenario = db.query(Scenario).filter(Scenario.id == first_config_id).first()
+    scenario_name = scenario.name if scenario else "Unknown Scenario"
+    if matching:
+        scenario_id = first_config_id
+    else:
+        scenario_id = scenario.id if scenario else "unknown"
 
-    success_count = len(success_runs)
-    failed_count = len(failed_runs)
-    error_count = len(error_runs)
-    total_count = success_count + failed_count + error_count
+    if matching:
+        friction_hotspots = get_friction_hotspots(db, report_id=report_id, config_id=config_id) if sankey_mode != "full" else None
+        journey_sankey = _read_sankey(db, [segment.id for segment in matching], sankey_mode, friction_hotspots)
+    else:
+        journey_sankey = {"nodes": [], "links": []}
 
     return {
-        "total_runs": total_count,
-        "sucessfull_runs": success_count,
-        "failed_runs": failed_count,
-        "error_runs": error_count,
-        "success_rate": success_count / total_count if total_count > 0 else 0,
-        "avg_duration_seconds": 0.0,
-        "avg_steps": 0.0,
+        "report_id": report_id,
+        "scenario_id": scenario_id,
+        "scenario_name": scenario_name,
+        "run_count": sum(segment.run_count for segment in matching),
+        "metrics_summary": _segments_metrics_summary(matching),
+        "journey_sankey": journey_sankey,
     }
 
 
-def extract_url_sequence_from_events(events: List[dict]) -> List[str]:
+def extract_url_sequence_from_events(events: list[dict]) -> list[str]:
     urls = []
     for event in events:
         url = event.get('url')
         if url:
-            normalized_url = url.rstrip('/')
-            urls.append(normalized_url)
+            urls.append(journey_url(url))
     return urls
 
 
-def break_sequence_on_cycles(url_sequence: List[str]) -> List[List[str]]:
+def break_sequence_on_cycles(url_sequence: list[str]) -> list[list[str]]:
     if not url_sequence:
         return []
 
@@ -236,19 +285,8 @@ def break_sequence_on_cycles(url_sequence: List[str]) -> List[List[str]]:
     return sequences
 
 
-def extract_sequences_from_runs(agent_runs: List[PersonaRun]) -> List[List[str]]:
-    all_sequences = []
-    for run in agent_runs:
-        if not run.events:
-            continue
-        url_sequence = extract_url_sequence_from_events(run.events)
-        broken_sequences = break_sequence_on_cycles(url_sequence)
-        all_sequences.extend(broken_sequences)
-    return all_sequences
-
-
-def aggregate_transitions(sequences: List[List[str]]) -> Dict[tuple, int]:
-    transitions = {}
+def aggregate_transitions(sequences: list[list[str]], transitions: dict[tuple, int] | None = None) -> dict[tuple, int]:
+    transitions = {} if transitions is None else transitions
     for sequence in sequences:
         for i in range(len(sequence) - 1):
             source = sequence[i]
@@ -259,8 +297,11 @@ def aggregate_transitions(sequences: List[List[str]]) -> Dict[tuple, int]:
     return transitions
 
 
-def calculate_node_metrics(sequences: List[List[str]]) -> Dict[str, Dict[str, int]]:
-    metrics = {}
+def calculate_node_metrics(
+    sequences: list[list[str]],
+    metrics: dict[str, dict[str, int]] | None = None
+) -> dict[str, dict[str, int]]:
+    metrics = {} if metrics is None else metrics
 
     for sequence in sequences:
         prev_url = None
@@ -279,9 +320,9 @@ def calculate_node_metrics(sequences: List[List[str]]) -> Dict[str, Dict[str, in
 
 
 def build_sankey_structure(
-    node_metrics: Dict[str, Dict[str, int]],
-    transitions: Dict[tuple, int],
-    friction_data: Optional[List[Dict]] = None
+    node_metrics: dict[str, dict[str, int]],
+    transitions: dict[tuple, int],
+    friction_data: list[dict] | None = None
 ) -> dict:
     """
     Build Sankey structure with optional friction metadata per node.
@@ -344,198 +385,291 @@ def build_sankey_structure(
     return {"nodes": nodes, "links": links}
 
 
-def remove_back_edges(transitions: Dict[tuple, int]) -> Dict[tuple, int]:
+def prune_sankey(
+    sankey: dict,
+    top_k: int | None = None,
+    min_link_value: int = 0,
+    other: bool = True
+) -> dict:
+    """
+    Bound Sankey data for rendering. Keeps the top_k nodes by visits (all when
+    top_k is None or 0) and folds the rest into an "Other" node, one per step
+    in full mode, or drops them when other is False. Links are re-aggregated
+    between the remaining nodes, cycles the folding creates are removed, and
+    links below min_link_value are dropped. Returns new data; the input is not
+    modified.
+    """
+    nodes = sankey["nodes"]
+    kept = set(range(len(nodes)))
+    if top_k and len(nodes) > top_k:
+        ranked = sorted(range(len(nodes)), key=lambda i: nodes[i]["visits"], reverse=True)
+        kept = set(ranked[:top_k])
+
+    pruned_nodes = []
+    node_index = {}
+    other_index = {}  # step (None in compact mode) -> index of its "Other" node
+    for i, node in enumerate(nodes):
+        if i in kept:
+            node_index[i] = len(pruned_nodes)
+            pruned_nodes.append(node)
+        elif other:
+            step = node.get("step")
+            if step not in other_index:
+                other_index[step] = len(pruned_nodes)
+                bucket = {"name": OTHER_NODE, "visits": 0, "event_count": 0, "other_count": 0}
+                if step is not None:
+                    bucket["step"] = step
+                pruned_nodes.append(bucket)
+            bucket = pruned_nodes[other_index[step]]
+            bucket["visits"] += node["visits"]
+            bucket["event_count"] += node.get("event_count", 0)
+            bucket["other_count"] += 1
+            node_index[i] = other_index[step]
+
+    transitions = {}
+    for link in sankey["links"]:
+        source, target = node_index.get(link["source"]), node_index.get(link["target"])
+        if source is not None and target is not None:
+            transitions[(source, target)] = transitions.get((source, target), 0) + link["value"]
+    if other_index:
+        transitions = remove_back_edges(transitions)
+
+    links = [
+        {"source": source, "target": target, "value": value}
+        for (source, target), value in transitions.items()
+        if value >= min_link_value
+    ]
+    return {"nodes": pruned_nodes, "links": links}
+
+
+def remove_back_edges(transitions: dict[tuple, int]) -> dict[tuple, int]:
     """
     Remove transitions that create cycles.
     Keeps highest-count edges, drops edges that would close a loop.
+    Cycle checks use an incrementally maintained topological order, so only the
+    region an edge reorders is searched instead of a full DFS per edge.
     """
     sorted_edges = sorted(transitions.items(), key=lambda x: x[1], reverse=True)
-    
-    graph = {}
-    acyclic = {}
-
-    def creates_cycle(source, target):
-        # Check if there's already a path from target back to source
-        visited = set()
-        stack = [target]
-        while stack:
-            node = stack.pop()
-            if node == source:
-                return True
-            if node not in visited:
-                visited.add(node)
-                stack.extend(graph.get(node, []))
-        return False
 
+    order = IncrementalTopologicalOrder()
+    acyclic = {}
     for (source, target), count in sorted_edges:
-        if not creates_cycle(source, target):
+        if order.add_edge(source, target):
             acyclic[(source, target)] = count
-            graph.setdefault(source, []).append(target)
 
     return acyclic
 
 
-# =============================================================================
-# Step-Based Sankey (Full Mode)
-# =============================================================================
-
-def extract_raw_sequences_from_runs(agent_runs: List[PersonaRun]) -> List[List[str]]:
-    """Extract URL sequences without breaking on cycles (for step-based mode)."""
-    all_sequences = []
-    for run in agent_runs:
-        if not run.events:
-            continue
-        url_sequence = extract_url_sequence_from_events(run.events)
-        if url_sequence:
-            all_sequences.append(url_sequence)
-    return all_sequences
-
+def _run_status(is_done: bool, judgement_data: dict | None) -> str | None:
+    """Python twin of _status_condition; None for done runs without a verdict (matches no status)."""
+    if not is_done:
+        return "error"
+    verdict = judgement_data.get("verdict") if isinstance(judgement_data, dict) else None
+    if verdict is None:
+        return None
+    return "success" if verdict == True else "failed"
+
+
+# Friction location of failed runs that never reached a URL
+UNKNOWN_LOCATION = "Unknown Location"
+
+
+def friction_location_and_reason(run, events: list[dict] | None = None):
+    """Where a failed run stopped (last URL) and why, as grouped by friction hotspots."""
+    events = run.events if events is None else events
+
+    # Determine Location (Last URL)
+    last_url = UNKNOWN_LOCATION
+    if events:
+        # Find last event with a URL
+        for event in reversed(events):
+            if event.get("url"):
+                last_url = journey_url(event.get("url"))
+                break
+
+    # Determine Reason
+    reason = "Unknown Error"
+    if run.error_type:
+        reason = run.error_type
+    elif run.judgement_data and run.judgement_data.get("failure_reason"):
+        reason = run.judgement_data.get("failure_reason")
+
+    return last_url, reason
+
+
+class FrictionAccumulator:
+    """Group "goal not met" runs by (last URL, failure reason), one run at a time."""
+
+    def __init__(self):
+        self.hotspots = {}
+        self.total_failures = 0
+
+    def add(self, run):
+        self.add_group(*friction_location_and_reason(run), count=1, run_ids=[run.id])
+
+    def add_group(self, location: str, reason: str, count: int, run_ids: list[str]):
+        key = (location, reason)
+        if key not in self.hotspots:
+            self.hotspots[key] = {"count": 0, "runs": []}
+        self.hotspots[key]["count"] += count
+        self.hotspots[key]["runs"].extend(run_ids)
+        self.total_failures += count
+
+    def build(self) -> list[dict]:
+        result = []
+        for (location, reason), data in self.hotspots.items():
+            result.append({
+                "location": location,
+                "reason": reason,
+                "count": data["count"],
+                "impact_percentage": (data["count"] / self.total_failures) if self.total_failures > 0 else 0,
+                "example_run_ids": data["runs"][:3]  # Return top 3 example IDs
+            })
 
-def build_step_based_sankey(sequences: List[List[str]], max_steps: int = 10) -> dict:
-    """
-    Build Sankey data using step-based approach.
-    Each node is (step_index, url) - guarantees no cycles.
-    """
-    node_map = {}  # (step, url) -> node_index
-    nodes = []
-    links_map = {}  # (source_idx, target_idx) -> count
+        # Sort by count descending
+        result.sort(key=lambda x: x["count"], reverse=True)
+        return result
 
-    for sequence in sequences:
-        seq_len = min(len(sequence), max_steps)
-        
-        for i in range(seq_len):
-            url = sequence[i]
-            node_key = (i, url)
-            
-            # Create node if needed
-            if node_key not in node_map:
-                node_map[node_key] = len(nodes)
-                nodes.append({
-                    "name": url,
-                    "step": i,
-                    "visits": 0,
-                    "event_count": 0,
-                })
-            
-            node_idx = node_map[node_key]
-            nodes[node_idx]["visits"] += 1
-            nodes[node_idx]["event_count"] += 1
-            
-            # Create link from previous step
-            if i > 0:
-                prev_url = sequence[i - 1]
-                prev_key = (i - 1, prev_url)
-                if prev_key in node_map:
-                    prev_idx = node_map[prev_key]
-                    link_key = (prev_idx, node_idx)
-                    links_map[link_key] = links_map.get(link_key, 0) + 1
 
-    links = [
-        {"source": src, "target": tgt, "value": val}
-        for (src, tgt), val in links_map.items()
-    ]
+# =============================================================================
+# Materialized Aggregate Reads
+# =============================================================================
 
-    return {"nodes": nodes, "links": links}
+def _filter_segments(
+    query: Query,
+    report_id: str | None = None,
+    config_id: str | None = None
+) -> Query:
+    if report_id:
+        query = query.filter(ReportSegment.report_id == report_id)
+    if config_id:
+        query = query.filter(ReportSegment.config_id == config_id)
+    return query
+
+
+def _segment_matches(segment: ReportSegment, filters: dict[str, str] | None) -> bool:
+    """Segment twin of the UI filters in _apply_run_filters."""
+    if not filters:
+        return True
+    for key in ("persona_type", "platform"):
+        if filters.get(key) and filters[key] != "all" and getattr(segment, key) != filters[key]:
+            return False
+    status = filters.get("status")
+    if status and status != "all" and status in ("success", "failed", "error"):
+        return segment.status == status
+    return True
+
+
+def _segments_metrics_summary(segments: list[ReportSegment]) -> dict:
+    """Report metrics summed from segment rows: status counts plus duration and step statistics."""
+    status_counts = {"success": 0, "failed": 0, "error": 0}
+    for segment in segments:
+        if segment.status in status_counts:
+            status_counts[segment.status] += segment.run_count
+
+    success_count = status_counts["success"]
+    total_count = sum(status_counts.values())
+    duration_count = sum(segment.duration_count for segment in segments)
+    steps_count = sum(segment.steps_count for segment in segments)
+    min_durations = [segment.min_duration for segment in segments if segment.min_duration is not None]
+    max_durations = [segment.max_duration for segment in segments if segment.max_duration is not None]
+    max_steps = [segment.max_steps for segment in segments if segment.max_steps is not None]
 
+    return {
+        "total_runs": total_count,
+        "sucessfull_runs": success_count,
+        "failed_runs": status_counts["failed"],
+        "error_runs": status_counts["error"],
+        "success_rate": success_count / total_count if total_count > 0 else 0,
+        "avg_duration_seconds": sum(segment.duration_sum for segment in segments) / duration_count if duration_count else 0.0,
+        "min_duration_seconds": float(min(min_durations, default=0.0)),
+        "max_duration_seconds": float(max(max_durations, default=0.0)),
+        "avg_steps": sum(segment.steps_sum for segment in segments) / steps_count if steps_count else 0.0,
+        "max_steps": max(max_steps, default=0),
+    }
 
-# =============================================================================
-# Main Entry Point
-# =============================================================================
 
-def _generate_sankey_data(
-    agent_runs: List[PersonaRun],
+def _read_sankey(
+    db: Session,
+    segment_ids: list[int],
     mode: str = "compact",
-    friction_data: Optional[List[Dict]] = None
+    friction_data: list[dict] | None = None
 ) -> dict:
-    """
-    Generate Sankey diagram data with optional friction metadata.
+    """Sankey data summed from the node and link rows of the given segments, in first-seen order."""
+    nodes = db.query(
+        ReportNode.step,
+        ReportNode.url_id,
+        func.sum(ReportNode.visits).label("visits"),
+        func.sum(ReportNode.event_count).label("event_count"),
+    ).filter(
+        ReportNode.segment_id.in_(segment_ids), ReportNode.mode == mode
+    ).group_by(ReportNode.step, ReportNode.url_id).order_by(func.min(ReportNode.id)).all()
+
+    links = db.query(
+        ReportLink.step,
+        ReportLink.source_url_id,
+        ReportLink.target_url_id,
+        func.sum(ReportLink.count).label("count"),
+    ).filter(
+        ReportLink.segment_id.in_(segment_ids), ReportLink.mode == mode
+    ).group_by(
+        ReportLink.step, ReportLink.source_url_id, ReportLink.target_url_id
+    ).order_by(func.min(ReportLink.id)).all()
 
-    Args:
-        agent_runs: List of persona runs to analyze
-        mode: "compact" (fewer nodes, drops back-edges) or "full" (step-based, no data loss)
-        friction_data: Optional friction hotspot data from get_friction_hotspots()
-    """
-    if not agent_runs:
-        return {"nodes": [], "links": []}
+    # Rows hold interned url ids; strings are only needed for the payload
+    urls = resolve_urls(db, {row.url_id for row in nodes})
 
     if mode == "full":
-        # Step-based: wider diagram, no data loss
-        # Note: Friction data less useful in step-based mode since nodes are duplicated per step
-        sequences = extract_raw_sequences_from_runs(agent_runs)
-        return build_step_based_sankey(sequences)
-
-    # Compact mode (default): fewer nodes, drops cycle-causing edges
-    all_sequences = extract_sequences_from_runs(agent_runs)
-    transitions = aggregate_transitions(all_sequences)
-    acyclic_transitions = remove_back_edges(transitions)
-    node_metrics = calculate_node_metrics(all_sequences)
-
-    return build_sankey_structure(node_metrics, acyclic_transitions, friction_data)
-
+        full_nodes = []
+        node_index = {}
+        for row in nodes:
+            node_index[(row.step, row.url_id)] = len(full_nodes)
+            full_nodes.append({"name": urls[row.url_id], "step": row.step, "visits": row.visits, "event_count": row.event_count})
+        full_links = [
+            {"source": node_index[(row.step - 1, row.source_url_id)], "target": node_index[(row.step, row.target_url_id)], "value": row.count}
+            for row in links
+        ]
+        return {"nodes": full_nodes, "links": full_links}
+
+    node_metrics = {urls[row.url_id]: {"visits": row.visits, "event_count": row.event_count} for row in nodes}
+    transitions = {(urls[row.source_url_id], urls[row.target_url_id]): row.count for row in links}
+    return build_sankey_structure(node_metrics, remove_back_edges(transitions), friction_data)
 
 
 def get_friction_hotspots(
     db: Session,
-    report_id: str = None,
-    config_id: str = None
-) -> List[Dict]:
+    report_id: str | None = None,
+    config_id: str | None = None
+) -> list[dict]:
     """
     Identify common failure patterns (friction hotspots).
     Groups failed runs by failure reason and location (last URL).
     Only includes "goal not met" runs (is_done=True but verdict!=True).
     Excludes error runs (is_done=False - crashed/timeout).
     """
-    # Get only "failed" runs (goal not met) - excludes error runs
-    # Use _query_persona_runs with status="failed" filter for consistency
-    failed_runs = _query_persona_runs(db, report_id=report_id, config_id=config_id, filters={"status": "failed"})
+    key = ("friction", report_id, config_id)
+    version = _report_version(db, report_id, config_id)
+    found, result = _report_cache.get(key, version)
+    if found:
+        return result
+
+    result = _report_flights.do(key + (version,), lambda: _read_friction_hotspots(db, report_id, config_id))
+    _report_cache.put(key, version, result)
+    return result
 
-    if not failed_runs:
-        return []
 
-    # Aggregate by (Location, Reason)
-    hotspots = {}
-
-    for run in failed_runs:
-        # Determine Location (Last URL)
-        last_url = "Unknown Location"
-        if run.events:
-            # Find last event with a URL
-            for event in reversed(run.events):
-                if event.get("url"):
-                    last_url = event.get("url").rstrip('/')
-                    break
-        
-        # Determine Reason
-        reason = "Unknown Error"
-        if run.error_type:
-            reason = run.error_type
-        elif run.judgement_data and run.judgement_data.get("failure_reason"):
-             reason = run.judgement_data.get("failure_reason")
-        
-        # Create unique key
-        key = (last_url, reason)
-        
-        if key not in hotspots:
-            hotspots[key] = {"count": 0, "runs": []}
-        
-        hotspots[key]["count"] += 1
-        hotspots[key]["runs"].append(run.id)
-
-    # Convert to list and sort by impact (count)
-    result = []
-    total_failures = len(failed_runs)
-
-    for (location, reason), data in hotspots.items():
-        result.append({
-            "location": location,
-            "reason": reason,
-            "count": data["count"],
-            "impact_percentage": (data["count"] / total_failures) if total_failures > 0 else 0,
-            "example_run_ids": data["runs"][:3] # Return top 3 example IDs
-        })
-    
-    # Sort by count descending
-    result.sort(key=lambda x: x["count"], reverse=True)
-    
-    return result
+def _read_friction_hotspots(db: Session, report_id: str | None, config_id: str | None) -> list[dict]:
+    query = db.query(ReportFriction)
+    if report_id:
+        query = query.filter(ReportFriction.report_id == report_id)
+    if config_id:
+        query = query.filter(ReportFriction.config_id == config_id)
+
+    rows = query.order_by(ReportFriction.id).all()
+    urls = resolve_urls(db, {row.location_url_id for row in rows if row.location_url_id})
+    urls[0] = UNKNOWN_LOCATION
 
+    friction = FrictionAccumulator()
+    for row in rows:
+        friction.add_group(urls[row.location_url_id], row.reason, row.count, row.example_run_ids or [])
+    return friction.build()
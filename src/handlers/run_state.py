@@ -0,0 +1,54 @@
+"""
+Persistence for run progress tracked in persona_runner._active_runs.
+
+The in-memory tracker stays the live source for polling; these helpers write
+periodic checkpoints to the run_states table and read them back for status
+requests and restart recovery.
+"""
+
+from collections.abc import Iterable
+
+from sqlalchemy.orm import Session
+
+from src.models import RunState
+
+# Tracker keys persisted as RunState columns
+_RUN_FIELDS = (
+    "run_id", "scenario_id", "scenario_name", "report_id", "run_type", "status",
+    "total_tasks", "completed_tasks", "failed_tasks", "agent_run_ids", "task_progress",
+    "tasks", "error", "started_at", "completed_at",
+)
+
+
+def save_checkpoint(db: Session, runs: Iterable[dict]):
+    """Upsert snapshots of tracked runs in one transaction."""
+    for run in runs:
+        values = {field: run.get(field) for field in _RUN_FIELDS}
+        values["logs"] = list(run.get("logs") or [])
+        db.merge(RunState(**values))
+    db.commit()
+
+
+def _to_status(state: RunState) -> dict:
+    """Convert a RunState row to the tracker dict shape returned by the status endpoints."""
+    result = {field: getattr(state, field) for field in _RUN_FIELDS if field != "tasks"}
+    result["agent_run_ids"] = state.agent_run_ids or []
+    result["task_progress"] = state.task_progress or []
+    result["logs"] = state.logs or []
+    return result
+
+
+def get_stored_run_status(db: Session, run_id: str) -> dict | None:
+    """Get the last checkpointed status for a run, or None if it was never persisted."""
+    state = db.query(RunState).filter(RunState.run_id == run_id).first()
+    return _to_status(state) if state else None
+
+
+def get_unfinished_runs(db: Session) -> list[RunState]:
+    """Runs whose last checkpoint was still in progress."""
+    return db.query(RunState).filter(RunState.status == "in_progress").all()
+
+
+def delete_run_state(db: Session, run_id: str):
+    db.query(RunState).filter(RunState.run_id == run_id).delete()
+    db.commit()
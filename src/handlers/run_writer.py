@@ -0,0 +1,138 @@
+"""
+Single background writer for PersonaRun results.
+
+Tasks hand their finished PersonaRun payload to the writer and move on; the
+writer groups whatever has queued up into one transaction, so concurrent tasks
+never contend for the SQLite write lock. Each batch is committed in a thread,
+lock retries included, so the event loop never waits on the database; the
+on_written callbacks run back on the loop. The queue is bounded: when the
+database falls behind, submit() waits instead of letting results pile up.
+"""
+
+import asyncio
+import os
+import uuid
+from collections.abc import Callable
+
+from src.database import SessionLocal, retry_on_lock
+from src.handlers.persona_runs import insert_persona_runs
+from src.models import PersonaRunCreate
+
+# Results that may wait for the writer before submit() applies backpressure
+WRITER_QUEUE_SIZE = int(os.environ.get("USEFLY_WRITER_QUEUE_SIZE", "256"))
+
+# Most rows written per transaction, and how long to wait for a batch to fill
+WRITER_BATCH_SIZE = 50
+WRITER_BATCH_DELAY = 0.05
+
+# Called on the event loop once the row is committed, with its id (None if the write
+# failed or the run's scenario was deleted in the meantime)
+OnWritten = Callable[[str | None], None]
+
+
+class PersonaRunWriter:
+    """Batches PersonaRun inserts from every running task into grouped transactions."""
+
+    def __init__(
+        self,
+        db_session_factory,
+        queue_size: int = WRITER_QUEUE_SIZE,
+        batch_size: int = WRITER_BATCH_SIZE,
+        batch_delay: float = WRITER_BATCH_DELAY
+    ):
+        self.db_session_factory = db_session_factory
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, run: PersonaRunCreate, on_written: OnWritten | None = None) -> str:
+        """Queue a PersonaRun for writing and return its id without waiting for the database."""
+        if not run.id:
+            run = run.model_copy(update={"id": str(uuid.uuid4())})
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await self._queue.put((run, on_written))
+        return run.id
+
+    async def flush(self):
+        """Wait until everything submitted so far is committed and its callbacks have run."""
+        await self._queue.join()
+
+    async def close(self):
+        """Flush pending results and stop the writer (called on shutdown)."""
+        if self._task is not None and not self._task.done():
+            await self.flush()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except TimeoutError:
+                    break
+
+            try:
+                written_ids = await asyncio.to_thread(self._write, [run for run, _ in batch])
+                for (_, on_written), written_id in zip(batch, written_ids):
+                    if on_written:
+                        try:
+                            on_written(written_id)
+                        except Exception as e:  # noqa: BLE001
+                            print(f"Error in persona run write callback: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, runs: list[PersonaRunCreate]) -> list[str | None]:
+        """Write a batch in one transaction, falling back to row by row to isolate a bad row."""
+        db = self.db_session_factory()
+        try:
+            try:
+                inserted = retry_on_lock(db, insert_persona_runs, runs)
+                return [run.id if db_run is not None else None for run, db_run in zip(runs, inserted)]
+            except Exception as e:  # noqa: BLE001
+                db.rollback()
+                print(f"Batched persona run write failed, retrying rows individually: {e}")
+
+            written: list[str | None] = []
+            for run in runs:
+                try:
+                    inserted = retry_on_lock(db, insert_persona_runs, [run])
+                    written.append(run.id if inserted[0] is not None else None)
+                except Exception as e:  # noqa: BLE001
+                    db.rollback()
+                    print(f"Error writing persona run {run.id}: {e}")
+                    written.append(None)
+            return written
+        finally:
+            db.close()
+
+
+_writer: PersonaRunWriter | None = None
+
+
+def get_run_writer(db_session_factory=SessionLocal) -> PersonaRunWriter:
+    """Get the process-wide writer, creating it with db_session_factory on first use."""
+    global _writer
+    if _writer is None:
+        _writer = PersonaRunWriter(db_session_factory)
+    return _writer
+
+
+async def close_run_writer():
+    """Flush and stop the process-wide writer (called on server and worker shutdown)."""
+    global _writer
+    if _writer is not None:
+        await _writer.close()
+        _writer = None
+
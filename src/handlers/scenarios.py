@@ -1,32 +1,30 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Callable
 import uuid
 from collections import deque
 from datetime import datetime
-from urllib.parse import urlparse, unquote
+from urllib.parse import unquote
+
 from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session
 
-from src.models import (
-    Scenario, SystemConfig, ScenarioCreate,
-    CrawlerRun, TaskList
-)
 from src.common.browser_use_common import run_browser_use_agent_with_hooks
+from src.common.fieldsets import load_fields
+
+# Shared tracking for scenario analysis runs (reuses persona_runner's pattern)
+from src.handlers import persona_runner
 from src.handlers.task_generation import (
+    calculate_auto_selected_tasks,
     generate_tasks,
     renumber_tasks,
     update_generation_metadata,
-    calculate_auto_selected_tasks
 )
-
-# Shared tracking for scenario analysis runs (reuses persona_runner's pattern)
-from src.handlers import persona_runner
+from src.models import CrawlerRun, Scenario, ScenarioCreate, SystemConfig
 
 MAX_LOG_ENTRIES = 50
 
 
-def list_scenarios(db: Session) -> List[Scenario]:
-    """List all test scenarios."""
-    return db.query(Scenario).order_by(Scenario.created_at.desc()).all()
+def list_scenarios(db: Session, fields: list[str] | None = None) -> list[Scenario]:
+    """List all test scenarios; with fields (see parse_fields) only those columns are read."""
+    return load_fields(db.query(Scenario), Scenario, fields).order_by(Scenario.created_at.desc()).all()
 
 def create_scenario(db: Session, scenario: ScenarioCreate) -> Scenario:
     """Create a new test scenario."""
@@ -50,21 +48,27 @@ def create_scenario(db: Session, scenario: ScenarioCreate) -> Scenario:
     db.refresh(db_scenario)
     return db_scenario
 
-def get_scenario(db: Session, scenario_id: str) -> Optional[Scenario]:
+def get_scenario(db: Session, scenario_id: str) -> Scenario | None:
     """Get a specific test scenario."""
     return db.query(Scenario).filter(Scenario.id == scenario_id).first()
 
 def delete_scenario(db: Session, scenario_id: str) -> bool:
     """Delete a test scenario and all related records."""
-    from src.models import PersonaRun, CrawlerRun
+    from src.handlers.report_aggregates import delete_scenario_aggregates
+    from src.models import CrawlerRun, PersonaRun, PersonaRunEvent, TaskJob
 
     scenario = db.query(Scenario).filter(Scenario.id == scenario_id).first()
     if not scenario:
         return False
 
     # Delete related records first to avoid foreign key constraint violations
+    run_ids = db.query(PersonaRun.id).filter(PersonaRun.config_id == scenario_id)
+    db.query(PersonaRunEvent).filter(PersonaRunEvent.persona_run_id.in_(run_ids)).delete(synchronize_session=False)
     db.query(PersonaRun).filter(PersonaRun.config_id == scenario_id).delete()
+    delete_scenario_aggregates(db, scenario_id)
     db.query(CrawlerRun).filter(CrawlerRun.scenario_id == scenario_id).delete()
+    # Queued jobs never start; a worker holding a lease loses it at the next renewal and stops
+    db.query(TaskJob).filter(TaskJob.scenario_id == scenario_id).delete(synchronize_session=False)
 
     # Now delete the scenario
     db.delete(scenario)
@@ -76,7 +80,7 @@ def decode_url(url: str) -> str:
     return unquote(url)
 
 
-def process_urls(urls: List[str]) -> List[Dict[str, str]]:
+def process_urls(urls: list[str]) -> list[dict[str, str]]:
     """
     Process URLs to store both encoded and decoded versions.
     Removes duplicates based on encoded URL.
@@ -142,14 +146,15 @@ def _add_analysis_log(run_id: str, message: str):
     if run_id in persona_runner._active_runs:
         timestamp = datetime.now().strftime("%H:%M:%S")
         persona_runner._active_runs[run_id]["logs"].append(f"[{timestamp}] {message}")
+        persona_runner._mark_dirty(run_id)
 
 
 def update_analysis_phase(
     run_id: str,
     phase: str,
-    current_step: Optional[int] = None,
-    current_action: Optional[str] = None,
-    current_url: Optional[str] = None
+    current_step: int | None = None,
+    current_action: str | None = None,
+    current_url: str | None = None
 ):
     """Update the current phase of the analysis."""
     if run_id not in persona_runner._active_runs:
@@ -169,7 +174,7 @@ def update_analysis_phase(
     _add_analysis_log(run_id, f"Phase: {phase}")
 
 
-def complete_analysis(run_id: str, success: bool, error: Optional[str] = None):
+def complete_analysis(run_id: str, success: bool, error: str | None = None):
     """Mark the analysis as completed or failed."""
     if run_id not in persona_runner._active_runs:
         return
@@ -215,7 +220,7 @@ async def analyze_website_async(db_session_factory, request, run_id: str, scenar
             task = task.replace('{description}', request.description or "")
 
         # Create progress callback for crawler
-        def on_step_progress(step: int, action: Optional[str], url: Optional[str]):
+        def on_step_progress(step: int, action: str | None, url: str | None):
             update_analysis_phase(
                 run_id=run_id,
                 phase="crawling",
@@ -331,7 +336,7 @@ async def analyze_website_async(db_session_factory, request, run_id: str, scenar
         db.close()
 
 
-def start_async_analysis(db_session_factory, request, background_tasks: BackgroundTasks) -> Dict:
+def start_async_analysis(db_session_factory, request, background_tasks: BackgroundTasks) -> dict:
     """
     Start async website analysis on an EXISTING scenario.
     The scenario must already exist in the database.
@@ -432,7 +437,7 @@ def update_scenario_tasks_full(db: Session, scenario_id: str, request) -> Scenar
     return scenario
 
 
-def generate_more_tasks(db: Session, scenario_id: str, request) -> Dict:
+def generate_more_tasks(db: Session, scenario_id: str, request) -> dict:
     """
     Generate additional tasks for an existing scenario.
 
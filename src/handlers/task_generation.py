@@ -6,23 +6,26 @@ from langchain_anthropic import ChatAnthropic
 from browser_use import ChatGoogle, ChatGroq
 
 from src.models import TaskList, SystemConfig
+from src.common.llm_rate_limiter import rate_limited
 
 
 def _get_llm_for_task_generation(system_config: SystemConfig):
-    """Initialize LLM based on provider configuration for task generation."""
+    """Initialize LLM based on provider configuration for task generation, sharing the agents' rate limiter."""
     provider = system_config.provider.lower()
 
     if provider == "openai":
-        return LangchainChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
+        llm = LangchainChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
     elif provider == "claude":
-        return ChatAnthropic(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatAnthropic(model=system_config.model_name, api_key=system_config.api_key)
     elif provider == "groq":
-        return ChatGroq(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatGroq(model=system_config.model_name, api_key=system_config.api_key)
     elif provider == "google":
-        return ChatGoogle(model=system_config.model_name, api_key=system_config.api_key)
+        llm = ChatGoogle(model=system_config.model_name, api_key=system_config.api_key)
     else:
         # Default to OpenAI if provider unknown
-        return LangchainChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
+        llm = LangchainChatOpenAI(model=system_config.model_name, api_key=system_config.api_key)
+
+    return rate_limited(llm, provider, system_config.model_name)
 
 
 def load_prompt_template(num_tasks: int, custom_prompt: Optional[str] = None) -> str:
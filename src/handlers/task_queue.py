@@ -0,0 +1,267 @@
+"""
+DB-backed persona task queue for distributed worker mode.
+
+The API server only enqueues one TaskJob row per selected task. `usefly worker`
+processes lease jobs, renew the lease while the agent runs and write the
+PersonaRun back. A job whose lease expires (crashed or partitioned worker) is
+picked up again by another worker until it runs out of attempts.
+"""
+
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from src.models import Scenario, TaskJob
+
+# Default lease length; workers renew well before it runs out
+DEFAULT_LEASE_SECONDS = 60
+
+# A job is failed instead of re-leased once this many leases have expired on it
+MAX_ATTEMPTS = 3
+
+
+def _utcnow() -> datetime:
+    """Naive UTC timestamp so lease times compare correctly across worker hosts."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def enqueue_run_tasks(
+    db: Session,
+    scenario: Scenario,
+    tasks: list[dict],
+    report_id: str,
+    run_id: str,
+    max_steps: int = 30
+) -> int:
+    """Insert one queued job per task of the run."""
+    for task_index, task in enumerate(tasks):
+        db.add(TaskJob(
+            id=str(uuid.uuid4()),
+            run_id=run_id,
+            report_id=report_id,
+            scenario_id=scenario.id,
+            scenario_name=scenario.name,
+            task_index=task_index,
+            task=task,
+            persona=task.get("persona", "unknown"),
+            status="queued",
+            attempts=0,
+            max_steps=max_steps,
+            current_url=task.get("starting_url"),
+        ))
+    db.commit()
+    return len(tasks)
+
+
+def _leasable():
+    """Jobs that are queued, or whose lease expired with attempts left."""
+    return or_(
+        TaskJob.status == "queued",
+        and_(
+            TaskJob.status == "leased",
+            TaskJob.lease_expires_at < _utcnow(),
+            TaskJob.attempts < MAX_ATTEMPTS
+        )
+    )
+
+
+def lease_next_task(db: Session, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> TaskJob | None:
+    """
+    Atomically lease the oldest available job for this worker.
+    Uses a conditional UPDATE per candidate so concurrent workers never lease the same job.
+    """
+    candidates = (
+        db.query(TaskJob.id)
+        .filter(_leasable())
+        .order_by(TaskJob.created_at, TaskJob.task_index)
+        .limit(10)
+        .all()
+    )
+
+    for (job_id,) in candidates:
+        now = _utcnow()
+        updated = (
+            db.query(TaskJob)
+            .filter(TaskJob.id == job_id, _leasable())
+            .update({
+                TaskJob.status: "leased",
+                TaskJob.lease_owner: worker_id,
+                TaskJob.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                TaskJob.attempts: TaskJob.attempts + 1,
+                TaskJob.started_at: now,
+                TaskJob.current_step: 0,
+                TaskJob.error: None,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if updated == 1:
+            return db.query(TaskJob).filter(TaskJob.id == job_id).first()
+
+    return None
+
+
+def renew_lease(
+    db: Session,
+    job_id: str,
+    worker_id: str,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS,
+    current_step: int | None = None,
+    current_action: str | None = None,
+    current_url: str | None = None
+) -> bool:
+    """
+    Extend the lease and record progress. Returns False when the worker no longer
+    owns the job (lease expired and was taken over), so it should stop the agent.
+    """
+    values = {TaskJob.lease_expires_at: _utcnow() + timedelta(seconds=lease_seconds)}
+    if current_step is not None:
+        values[TaskJob.current_step] = current_step
+    if current_action:
+        values[TaskJob.current_action] = current_action
+    if current_url:
+        values[TaskJob.current_url] = current_url
+
+    updated = (
+        db.query(TaskJob)
+        .filter(TaskJob.id == job_id, TaskJob.lease_owner == worker_id, TaskJob.status == "leased")
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
+
+
+def complete_task(
+    db: Session,
+    job_id: str,
+    worker_id: str,
+    persona_run_id: str | None,
+    failed: bool = False,
+    error: str | None = None
+) -> bool:
+    """Mark a leased job finished. Returns False if the lease was lost in the meantime."""
+    updated = (
+        db.query(TaskJob)
+        .filter(TaskJob.id == job_id, TaskJob.lease_owner == worker_id, TaskJob.status == "leased")
+        .update({
+            TaskJob.status: "failed" if failed else "completed",
+            TaskJob.persona_run_id: persona_run_id,
+            TaskJob.error: error,
+            TaskJob.lease_expires_at: None,
+        }, synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
+
+
+def fail_exhausted_tasks(db: Session) -> list[TaskJob]:
+    """Fail jobs whose lease expired on their last attempt and return them so an error run can be recorded."""
+    jobs = (
+        db.query(TaskJob)
+        .filter(
+            TaskJob.status == "leased",
+            TaskJob.lease_expires_at < _utcnow(),
+            TaskJob.attempts >= MAX_ATTEMPTS
+        )
+        .all()
+    )
+    for job in jobs:
+        job.status = "failed"
+        job.error = f"Lease expired after {job.attempts} attempts"
+        job.lease_expires_at = None
+    db.commit()
+    return jobs
+
+
+def cancel_run(db: Session, run_id: str) -> int:
+    """
+    Cancel a run's unfinished jobs. Queued jobs are never leased; workers running a
+    leased one fail their next lease renewal and stop the agent. Returns jobs cancelled.
+    """
+    updated = (
+        db.query(TaskJob)
+        .filter(TaskJob.run_id == run_id, TaskJob.status.in_(["queued", "leased"]))
+        .update({
+            TaskJob.status: "cancelled",
+            TaskJob.lease_expires_at: None,
+        }, synchronize_session=False)
+    )
+    db.commit()
+    return updated
+
+
+def _job_progress(job: TaskJob) -> dict:
+    status = {"queued": "pending", "leased": "running"}.get(job.status, job.status)
+    return {
+        "task_index": job.task_index,
+        "persona": job.persona or "unknown",
+        "status": status,
+        "current_step": job.current_step or 0,
+        "max_steps": job.max_steps or 30,
+        "current_action": job.current_action,
+        "current_url": job.current_url,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "error": job.error,
+    }
+
+
+def _build_run_status(run_id: str, jobs: list[TaskJob]) -> dict:
+    """Build a RunStatusResponse-shaped dict from a run's job rows."""
+    jobs = sorted(jobs, key=lambda j: j.task_index)
+    completed = sum(1 for j in jobs if j.status == "completed")
+    failed = sum(1 for j in jobs if j.status == "failed")
+    cancelled = sum(1 for j in jobs if j.status == "cancelled")
+    total = len(jobs)
+
+    if completed + failed + cancelled < total:
+        status = "in_progress"
+    elif cancelled:
+        status = "cancelled"
+    elif failed == 0:
+        status = "completed"
+    elif failed == total:
+        status = "failed"
+    else:
+        status = "partial_failure"
+
+    created = [j.created_at for j in jobs if j.created_at]
+    first = jobs[0]
+    return {
+        "run_id": run_id,
+        "scenario_id": first.scenario_id,
+        "scenario_name": first.scenario_name,
+        "report_id": first.report_id,
+        "run_type": "persona_run",
+        "status": status,
+        "total_tasks": total,
+        "completed_tasks": completed,
+        "failed_tasks": failed,
+        "agent_run_ids": [j.persona_run_id for j in jobs if j.persona_run_id],
+        "task_progress": [_job_progress(j) for j in jobs],
+        "started_at": min(created).isoformat() if created else None,
+        "logs": [],
+    }
+
+
+def get_queued_run_status(db: Session, run_id: str) -> dict | None:
+    """Get status for a run executed by workers, or None if it was never enqueued."""
+    jobs = db.query(TaskJob).filter(TaskJob.run_id == run_id).all()
+    if not jobs:
+        return None
+    return _build_run_status(run_id, jobs)
+
+
+def get_active_queued_runs(db: Session) -> list[dict]:
+    """Get status for every worker-executed run that still has unfinished jobs."""
+    run_ids = [
+        row.run_id for row in
+        db.query(TaskJob.run_id).filter(TaskJob.status.in_(["queued", "leased"])).distinct().all()
+    ]
+    if not run_ids:
+        return []
+
+    jobs_by_run: dict[str, list[TaskJob]] = {}
+    for job in db.query(TaskJob).filter(TaskJob.run_id.in_(run_ids)).all():
+        jobs_by_run.setdefault(job.run_id, []).append(job)
+    return [_build_run_status(run_id, jobs) for run_id, jobs in jobs_by_run.items()]
@@ -0,0 +1,120 @@
+"""
+URL interning for journey analytics.
+
+URLs are normalized once at ingest and mapped to integer ids stored in the
+urls table; report aggregate rows reference those ids, and journey
+computations hash ints instead of long strings. Strings are only resolved for
+the final report payload. An in-process map caches both directions.
+"""
+
+import threading
+from collections.abc import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.database import dialect_insert
+from src.models import Url
+
+
+def normalize_url(url: str) -> str:
+    """The URL form journeys compare: trailing slashes stripped."""
+    return url.rstrip('/')
+
+
+class UrlDictionary:
+    """
+    In-process map between normalized URLs and their ids in the urls table.
+
+    Ids assigned inside a transaction are only shared with other sessions once it
+    commits, so a rolled-back insert never leaves a dangling id in the map.
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._urls: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def intern_many(self, db: Session, urls: Iterable[str]) -> dict[str, int]:
+        """Ids of already normalized URLs, adding the ones never seen before."""
+        pending: dict[str, int] = db.info.setdefault("interned_urls", {})
+        result: dict[str, int] = {}
+        missing = set()
+        with self._lock:
+            for url in urls:
+                url_id = self._ids.get(url) or pending.get(url)
+                if url_id is None:
+                    missing.add(url)
+                else:
+                    result[url] = url_id
+        if not missing:
+            return result
+
+        found = {row.url: row.id for row in db.query(Url.id, Url.url).filter(Url.url.in_(missing))}
+        self._store(found)
+        result.update(found)
+
+        new_urls = missing - found.keys()
+        if new_urls:
+            # Another session may insert the same URL concurrently: whoever loses
+            # skips the insert and both read back the one committed id
+            db.execute(
+                dialect_insert(db, Url).on_conflict_do_nothing(index_elements=["url"]),
+                [{"url": url} for url in sorted(new_urls)],
+            )
+            inserted = {row.url: row.id for row in db.query(Url.id, Url.url).filter(Url.url.in_(new_urls))}
+            pending.update(inserted)
+            result.update(inserted)
+        return result
+
+    def resolve(self, db: Session, url_ids: Iterable[int]) -> dict[int, str]:
+        """Normalized URLs of ids, for building the final payload."""
+        result: dict[int, str] = {}
+        missing = set()
+        with self._lock:
+            for url_id in url_ids:
+                url = self._urls.get(url_id)
+                if url is None:
+                    missing.add(url_id)
+                else:
+                    result[url_id] = url
+        if missing:
+            found = {row.url: row.id for row in db.query(Url.id, Url.url).filter(Url.id.in_(missing))}
+            self._store(found)
+            result.update({url_id: url for url, url_id in found.items()})
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._urls.clear()
+
+    def _store(self, ids: dict[str, int]):
+        with self._lock:
+            for url, url_id in ids.items():
+                self._ids[url] = url_id
+                self._urls[url_id] = url
+
+
+_dictionary = UrlDictionary()
+
+
+def intern_urls(db: Session, urls: Iterable[str]) -> dict[str, int]:
+    """Ids of normalized URLs from the process-wide dictionary."""
+    return _dictionary.intern_many(db, urls)
+
+
+def resolve_urls(db: Session, url_ids: Iterable[int]) -> dict[int, str]:
+    return _dictionary.resolve(db, url_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _share_committed_urls(session: Session):
+    committed = session.info.pop("interned_urls", None)
+    if committed:
+        _dictionary._store(committed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_urls(session: Session):
+    session.info.pop("interned_urls", None)
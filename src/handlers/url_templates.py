@@ -0,0 +1,124 @@
+"""
+URL templating for journey analytics.
+
+Journeys group pages by route rather than by exact URL: /product/123 and
+/product/456 both become /product/{id}. A URL is mapped by, in order:
+
+- dropping ignorable query parameters (tracking params by default),
+- the first configured route template whose path matches, e.g. /product/{sku},
+- otherwise replacing ID-like path segments (numbers, UUIDs, hashes, opaque
+  tokens) with {id} when auto-detection is on.
+
+Configured with USEFLY_URL_TEMPLATES (comma-separated route templates),
+USEFLY_URL_IGNORE_PARAMS (comma-separated names, fnmatch patterns allowed) and
+USEFLY_URL_AUTO_TEMPLATES. Report aggregates are rebuilt on startup when these
+change (see report_aggregates.backfill_report_aggregates).
+"""
+
+import json
+import os
+import re
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src.handlers.url_dictionary import normalize_url
+
+DEFAULT_IGNORE_PARAMS = "utm_*,fbclid,gclid,msclkid,mc_cid,mc_eid,_ga,_gl,ref"
+
+# Bump when the built-in detection changes so aggregates built with the old rules are rebuilt
+RULES_VERSION = 1
+
+ID_PLACEHOLDER = "{id}"
+
+_ID_SEGMENT = re.compile(
+    r"\d+"                                                                  # 123
+    r"|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"        # UUID
+    r"|[0-9a-f]{16,}"                                                       # hashes, object ids
+    r"|(?=[a-z]*\d)[a-z0-9]{10,}",                                          # opaque tokens, e.g. B07XJ8C8F5
+    re.IGNORECASE,
+)
+_TEMPLATE_PARAM = re.compile(r"\{[^/{}]+\}")
+
+
+def _split_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class UrlTemplater:
+    """Maps URLs to route templates; see the module docstring for the rules."""
+
+    def __init__(
+        self,
+        templates: list[str] | None = None,
+        ignore_params: list[str] | None = None,
+        auto_detect: bool = True
+    ):
+        self.templates = [normalize_url(template) for template in templates or []]
+        self.ignore_params = list(ignore_params or [])
+        self.auto_detect = auto_detect
+        self._patterns = [(self._compile(template), template) for template in self.templates]
+
+    @classmethod
+    def from_env(cls) -> "UrlTemplater":
+        return cls(
+            templates=_split_list(os.environ.get("USEFLY_URL_TEMPLATES", "")),
+            ignore_params=_split_list(os.environ.get("USEFLY_URL_IGNORE_PARAMS", DEFAULT_IGNORE_PARAMS)),
+            auto_detect=os.environ.get("USEFLY_URL_AUTO_TEMPLATES", "true").lower() in ("1", "true", "yes"),
+        )
+
+    @staticmethod
+    def _compile(template: str):
+        # {name} matches exactly one path segment, everything else literally
+        parts = _TEMPLATE_PARAM.split(template)
+        return re.compile("[^/]+".join(re.escape(part) for part in parts))
+
+    def fingerprint(self) -> str:
+        """Identifies the rules, so data built with other rules can be detected."""
+        return json.dumps({
+            "version": RULES_VERSION,
+            "templates": self.templates,
+            "ignore_params": self.ignore_params,
+            "auto_detect": self.auto_detect,
+        }, sort_keys=True)
+
+    def apply(self, url: str) -> str:
+        """Route template of a normalized URL."""
+        parts = urlsplit(url)
+
+        query = parts.query
+        if query and self.ignore_params:
+            params = parse_qsl(query, keep_blank_values=True)
+            kept = [
+                (name, value) for name, value in params
+                if not any(fnmatchcase(name, pattern) for pattern in self.ignore_params)
+            ]
+            if len(kept) != len(params):
+                query = urlencode(kept)
+
+        path = normalize_url(parts.path)
+        for pattern, template in self._patterns:
+            if pattern.fullmatch(path):
+                path = template
+                break
+        else:
+            if self.auto_detect:
+                path = "/".join(
+                    ID_PLACEHOLDER if _ID_SEGMENT.fullmatch(segment) else segment
+                    for segment in path.split("/")
+                )
+
+        return normalize_url(urlunsplit((parts.scheme, parts.netloc, path, query, parts.fragment)))
+
+
+_templater = UrlTemplater.from_env()
+
+
+@lru_cache(maxsize=65536)
+def journey_url(url: str) -> str:
+    """The node a raw URL is counted under in journeys and friction hotspots."""
+    return _templater.apply(normalize_url(url))
+
+
+def rules_fingerprint() -> str:
+    return _templater.fingerprint()
@@ -9,6 +9,8 @@ from src.models.scenario import (
     Scenario,
     ScenarioCreate,
     ScenarioResponse,
+    ScenarioFieldsResponse,
+    SCENARIO_SUMMARY_FIELDS,
 )
 
 # Agent/Persona run models
@@ -16,6 +18,8 @@ from src.models.persona_run import (
     PersonaRun,
     PersonaRunCreate,
     PersonaRunResponse,
+    PersonaRunFieldsResponse,
+    PERSONA_RUN_SUMMARY_FIELDS,
     PersonaExecutionResponse,
     RunStatusResponse,
     TaskProgressStatus,
@@ -36,6 +40,28 @@ from src.models.system_config import (
     SystemConfigResponse,
 )
 
+# Streamed agent step models
+from src.models.persona_run_event import PersonaRunEvent
+
+# URL dictionary models
+from src.models.url import Url
+
+# Task queue models
+from src.models.task_job import TaskJob
+
+# Run state models
+from src.models.run_state import RunState
+
+# Materialized report aggregate models
+from src.models.report_aggregate import (
+    ReportSegment,
+    ReportNode,
+    ReportLink,
+    ReportFriction,
+    ReportAggregateInfo,
+    ReportVersion,
+)
+
 # Common models
 from src.models.common import (
     FrictionPoint,
@@ -60,14 +86,22 @@ __all__ = [
     "Scenario",
     "ScenarioCreate",
     "ScenarioResponse",
+    "ScenarioFieldsResponse",
+    "SCENARIO_SUMMARY_FIELDS",
     # Agent/Persona run
     "PersonaRun",
     "PersonaRunCreate",
     "PersonaRunResponse",
+    "PersonaRunFieldsResponse",
+    "PERSONA_RUN_SUMMARY_FIELDS",
     "PersonaExecutionResponse",
     "RunStatusResponse",
     "TaskProgressStatus",
     "ActiveExecutionsResponse",
+    # Streamed agent steps
+    "PersonaRunEvent",
+    # URL dictionary
+    "Url",
     # Crawler run
     "CrawlerRun",
     "CrawlerRunCreate",
@@ -76,6 +110,17 @@ __all__ = [
     "SystemConfig",
     "SystemConfigCreate",
     "SystemConfigResponse",
+    # Task queue
+    "TaskJob",
+    # Run state
+    "RunState",
+    # Report aggregates
+    "ReportSegment",
+    "ReportNode",
+    "ReportLink",
+    "ReportFriction",
+    "ReportAggregateInfo",
+    "ReportVersion",
     # Common
     "FrictionPoint",
     "MetricsData",
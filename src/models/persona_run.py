@@ -3,10 +3,20 @@ Agent/Persona run models for execution records.
 """
 
 from datetime import datetime
-from typing import Optional, List
-from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+
 from pydantic import BaseModel
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
+from sqlalchemy.orm import relationship
+
 from src.database import Base
 
 
@@ -36,9 +46,17 @@ class PersonaRun(Base):
     # Relationships
     config = relationship("Scenario", backref="persona_runs")
 
+    # Keyset pagination of run listings, newest first (see list_persona_runs)
+    __table_args__ = (
+        Index("ix_persona_runs_timestamp_id", "timestamp", "id"),
+        Index("ix_persona_runs_config_timestamp_id", "config_id", "timestamp", "id"),
+        Index("ix_persona_runs_report_timestamp_id", "report_id", "timestamp", "id"),
+    )
+
 
 class PersonaRunCreate(BaseModel):
     """Schema for creating a new persona run."""
+    id: str | None = None  # Pre-generated when steps were streamed to persona_run_events
     config_id: str
     task_description: str
     task_goal: str
@@ -46,40 +64,72 @@ class PersonaRunCreate(BaseModel):
     task_url: str
     final_result: str
     persona_type: str
-    report_id: Optional[str] = None
+    report_id: str | None = None
     is_done: bool = False
     timestamp: datetime
-    duration_seconds: Optional[float] = None
+    duration_seconds: float | None = None
     platform: str = "web"
-    error_type: Optional[str] = None
+    error_type: str | None = None
     steps_completed: int = 0
     total_steps: int = 0
     
     judgement_data: dict = {}
   
-    events: List[dict] = []
+    events: list[dict] = []
 
 
 class PersonaRunResponse(BaseModel):
     """Schema for returning persona run data."""
     id: str
     config_id: str
-    report_id: Optional[str]
+    report_id: str | None
     persona_type: str
     is_done: bool
     timestamp: datetime
-    duration_seconds: Optional[float]
+    duration_seconds: float | None
     platform: str
-    error_type: Optional[str]
+    error_type: str | None
     steps_completed: int
     total_steps: int
-    final_result: Optional[str]
+    final_result: str | None
     judgement_data: dict
-    task_description: Optional[str]
-    task_goal: Optional[str]
-    task_steps: Optional[str]
-    task_url: Optional[str]
-    events: List[dict]
+    task_description: str | None
+    task_goal: str | None
+    task_steps: str | None
+    task_url: str | None
+    events: list[dict]
+
+    class Config:
+        from_attributes = True
+
+
+# Columns of run listings with fields=summary: everything but events, the judgement and long texts
+PERSONA_RUN_SUMMARY_FIELDS = [
+    "id", "config_id", "report_id", "persona_type", "is_done", "timestamp", "duration_seconds",
+    "platform", "error_type", "steps_completed", "total_steps", "task_goal", "task_url",
+]
+
+
+class PersonaRunFieldsResponse(BaseModel):
+    """Any subset of PersonaRunResponse fields, for list requests with fields= (unset fields are omitted)."""
+    id: str
+    config_id: str | None = None
+    report_id: str | None = None
+    persona_type: str | None = None
+    is_done: bool | None = None
+    timestamp: datetime | None = None
+    duration_seconds: float | None = None
+    platform: str | None = None
+    error_type: str | None = None
+    steps_completed: int | None = None
+    total_steps: int | None = None
+    final_result: str | None = None
+    judgement_data: dict | None = None
+    task_description: str | None = None
+    task_goal: str | None = None
+    task_steps: str | None = None
+    task_url: str | None = None
+    events: list[dict] | None = None
 
     class Config:
         from_attributes = True
@@ -98,32 +148,36 @@ class TaskProgressStatus(BaseModel):
     """Progress status for a single task within a run."""
     task_index: int
     persona: str
-    status: str  # "pending" | "running" | "completed" | "failed"
+    status: str  # "pending" | "running" | "completed" | "failed" | "cancelled"
     current_step: int = 0
     max_steps: int = 30
-    current_action: Optional[str] = None  # e.g., "click_element", "input", "navigate"
-    current_url: Optional[str] = None
-    started_at: Optional[str] = None
-    error: Optional[str] = None
+    current_action: str | None = None  # e.g., "click_element", "input", "navigate"
+    current_url: str | None = None
+    started_at: str | None = None
+    error: str | None = None
+    queue_position: int | None = None  # Place in the scheduler queue while pending
+    llm_wait_seconds: float = 0.0  # Time this task's LLM calls spent queued by the rate limiter
 
 
 class RunStatusResponse(BaseModel):
     """Enhanced run status with per-task progress."""
     run_id: str
     scenario_id: str
-    scenario_name: Optional[str] = None
+    scenario_name: str | None = None
     run_type: str = "persona_run"  # "persona_run" | "scenario_analysis"
-    status: str  # "in_progress" | "completed" | "partial_failure" | "failed"
+    priority: str = "interactive"  # "interactive" | "batch"
+    status: str  # "in_progress" | "completed" | "partial_failure" | "failed" | "cancelled"
     total_tasks: int
     completed_tasks: int
     failed_tasks: int
-    agent_run_ids: List[str]
-    task_progress: List[TaskProgressStatus] = []
-    started_at: Optional[str] = None
-    logs: List[str] = []  # Recent log entries
+    agent_run_ids: list[str]
+    task_progress: list[TaskProgressStatus] = []
+    started_at: str | None = None
+    queue_position: int | None = None  # Position of the run's next task in the scheduler queue
+    logs: list[str] = []  # Recent log entries
 
 
 class ActiveExecutionsResponse(BaseModel):
     """Response containing all active executions."""
-    executions: List[RunStatusResponse]
+    executions: list[RunStatusResponse]
     total_count: int
@@ -0,0 +1,26 @@
+"""
+Per-step agent event models. Steps are written while a persona run is still
+executing; runs inserted with inline events get their rows at insert time.
+"""
+
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String
+
+from src.database import Base
+
+
+class PersonaRunEvent(Base):
+    """One agent step of a persona run, appended from the on_step_end hook."""
+    __tablename__ = "persona_run_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    persona_run_id = Column(String, nullable=False)  # Pre-generated id of the PersonaRun written at the end
+    step = Column(Integer, nullable=False)
+    url = Column(String)
+    action_type = Column(String)
+    payload = Column(JSON, default={})  # Full event dict as produced by extract_agent_events
+    timestamp = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_persona_run_events_run_step", "persona_run_id", "step"),
+        Index("ix_persona_run_events_action_type", "action_type"),
+    )
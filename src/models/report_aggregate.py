@@ -0,0 +1,123 @@
+"""
+Materialized report aggregate models, updated as persona runs are inserted.
+
+Rows are keyed by a segment: report, scenario, persona, platform and run status
+(success / failed / error, or "" for a finished run without a verdict), so
+every report filter can be answered by summing segment rows. Runs without a
+report_id are stored under report_id "". URLs are ids in the urls dictionary.
+
+These tables only hold data derived from persona runs: when their columns change
+they are dropped and rebuilt on startup instead of migrated (info "derived").
+"""
+
+from sqlalchemy import JSON, Column, Float, Index, Integer, String, UniqueConstraint
+
+from src.database import Base
+
+
+class ReportSegment(Base):
+    """Run counts, duration and step statistics for one segment."""
+    __tablename__ = "report_segments"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Insertion order = first seen
+    report_id = Column(String, nullable=False)
+    config_id = Column(String, nullable=False)
+    persona_type = Column(String, nullable=False)
+    platform = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    run_count = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(Float, nullable=False, default=0.0)
+    duration_count = Column(Integer, nullable=False, default=0)
+    min_duration = Column(Float)
+    max_duration = Column(Float)
+    steps_sum = Column(Integer, nullable=False, default=0)
+    steps_count = Column(Integer, nullable=False, default=0)
+    max_steps = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint("report_id", "config_id", "persona_type", "platform", "status", name="uq_report_segments"),
+        Index("ix_report_segments_config", "config_id"),
+        {"info": {"derived": True}},
+    )
+
+
+class ReportNode(Base):
+    """
+    URL visit counts for one segment. mode "compact" has one row per URL (step 0);
+    mode "full" has one row per (step, url) of the step-based Sankey.
+    """
+    __tablename__ = "report_nodes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    segment_id = Column(Integer, nullable=False)
+    mode = Column(String, nullable=False)
+    step = Column(Integer, nullable=False, default=0)
+    url_id = Column(Integer, nullable=False)
+    visits = Column(Integer, nullable=False, default=0)
+    event_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("segment_id", "mode", "step", "url_id", name="uq_report_nodes"),
+        {"info": {"derived": True}},
+    )
+
+
+class ReportLink(Base):
+    """URL transition counts for one segment; step is the target's step in "full" mode."""
+    __tablename__ = "report_links"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    segment_id = Column(Integer, nullable=False)
+    mode = Column(String, nullable=False)
+    step = Column(Integer, nullable=False, default=0)
+    source_url_id = Column(Integer, nullable=False)
+    target_url_id = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("segment_id", "mode", "step", "source_url_id", "target_url_id", name="uq_report_links"),
+        {"info": {"derived": True}},
+    )
+
+
+class ReportFriction(Base):
+    """Failed ("goal not met") runs of a report grouped by last URL and failure reason."""
+    __tablename__ = "report_friction"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    report_id = Column(String, nullable=False)
+    config_id = Column(String, nullable=False)
+    location_url_id = Column(Integer, nullable=False)  # Last URL; 0 when the run has none
+    reason = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    example_run_ids = Column(JSON, default=[])  # First 3 runs
+
+    __table_args__ = (
+        UniqueConstraint("report_id", "config_id", "location_url_id", "reason", name="uq_report_friction"),
+        Index("ix_report_friction_config", "config_id"),
+        {"info": {"derived": True}},
+    )
+
+
+class ReportAggregateInfo(Base):
+    """Settings the aggregate rows were built with, e.g. the URL templating rules."""
+    __tablename__ = "report_aggregate_info"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+
+    __table_args__ = (
+        {"info": {"derived": True}},
+    )
+
+
+class ReportVersion(Base):
+    """
+    Monotonic change counter per scope ("report:<id>", "scenario:<id>" or "all"),
+    bumped in the same transaction as every aggregate insert or delete. Report
+    caches are keyed on it. Not derived: it is never reset, so a version is never reused.
+    """
+    __tablename__ = "report_versions"
+
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,31 @@
+"""
+Run state models for persisting in-flight run progress across server restarts.
+"""
+
+from sqlalchemy import JSON, Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from src.database import Base
+
+
+class RunState(Base):
+    """Checkpoint of a persona run or scenario analysis tracked by the server."""
+    __tablename__ = "run_states"
+
+    run_id = Column(String, primary_key=True)
+    scenario_id = Column(String, index=True)
+    scenario_name = Column(String)
+    report_id = Column(String)
+    run_type = Column(String, nullable=False, default="persona_run")  # persona_run, scenario_analysis
+    status = Column(String, nullable=False, index=True)  # in_progress, completed, partial_failure, failed, cancelled
+    total_tasks = Column(Integer, default=0)
+    completed_tasks = Column(Integer, default=0)
+    failed_tasks = Column(Integer, default=0)
+    agent_run_ids = Column(JSON, default=[])
+    task_progress = Column(JSON, default=[])
+    tasks = Column(JSON, default=[])  # Task dicts, so unfinished tasks can be requeued after a restart
+    logs = Column(JSON, default=[])
+    error = Column(String)
+    started_at = Column(String)  # ISO strings, same as the in-memory tracker
+    completed_at = Column(String)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
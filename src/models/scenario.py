@@ -3,11 +3,11 @@ Scenario models for test configuration and execution.
 """
 
 from datetime import datetime
-from typing import List
-from sqlalchemy import Column, String, JSON, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+
 from pydantic import BaseModel
+from sqlalchemy import JSON, Column, DateTime, String
+from sqlalchemy.sql import func
+
 from src.database import Base
 
 
@@ -40,14 +40,14 @@ class ScenarioCreate(BaseModel):
     """Schema for creating a new scenario."""
     name: str  # Required - frontend must generate if empty
     website_url: str
-    personas: List[str] = []
+    personas: list[str] = []
     description: str = ""
-    metrics: List[str] = []
+    metrics: list[str] = []
     email: str = ""
-    tasks: List[dict] = []
-    selected_task_indices: List[int] = []
+    tasks: list[dict] = []
+    selected_task_indices: list[int] = []
     tasks_metadata: dict = {}
-    discovered_urls: List[dict] = []
+    discovered_urls: list[dict] = []
     crawler_final_result: str = ""
     crawler_extracted_content: str = ""
 
@@ -57,18 +57,47 @@ class ScenarioResponse(BaseModel):
     id: str
     name: str
     website_url: str
-    personas: List[str]
+    personas: list[str]
     created_at: datetime
     updated_at: datetime
     description: str = ""
-    discovered_urls: List[dict] = []
+    discovered_urls: list[dict] = []
     crawler_final_result: str = ""
     crawler_extracted_content: str = ""
-    metrics: List[str] = []
+    metrics: list[str] = []
     email: str = ""
-    tasks: List[dict] = []
+    tasks: list[dict] = []
     tasks_metadata: dict = {}
-    selected_task_indices: List[int] = []
+    selected_task_indices: list[int] = []
+
+    class Config:
+        from_attributes = True
+
+
+# Columns of GET /api/scenarios?fields=summary: everything but the task lists and crawler output
+SCENARIO_SUMMARY_FIELDS = [
+    "id", "name", "website_url", "personas", "created_at", "updated_at",
+    "description", "metrics", "email", "selected_task_indices",
+]
+
+
+class ScenarioFieldsResponse(BaseModel):
+    """Any subset of ScenarioResponse fields, for list requests with fields= (unset fields are omitted)."""
+    id: str
+    name: str | None = None
+    website_url: str | None = None
+    personas: list[str] | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+    description: str | None = None
+    discovered_urls: list[dict] | None = None
+    crawler_final_result: str | None = None
+    crawler_extracted_content: str | None = None
+    metrics: list[str] | None = None
+    email: str | None = None
+    tasks: list[dict] | None = None
+    tasks_metadata: dict | None = None
+    selected_task_indices: list[int] | None = None
 
     class Config:
         from_attributes = True
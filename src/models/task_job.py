@@ -0,0 +1,44 @@
+"""
+Task job models for the DB-backed persona task queue (distributed worker mode).
+"""
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.sql import func
+
+from src.database import Base
+
+
+class TaskJob(Base):
+    """A persona task waiting for, or leased by, a `usefly worker` process."""
+    __tablename__ = "task_jobs"
+
+    id = Column(String, primary_key=True)
+    run_id = Column(String, nullable=False, index=True)
+    report_id = Column(String, nullable=False)
+    scenario_id = Column(String, ForeignKey("scenarios.id"), nullable=False)
+    scenario_name = Column(String)
+    task_index = Column(Integer, nullable=False)
+    task = Column(JSON, nullable=False)  # UserJourneyTask dict
+    persona = Column(String)
+    status = Column(String, nullable=False, default="queued")  # queued, leased, completed, failed
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # Lease held by a worker; an expired lease makes the job available again
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime)
+
+    # Progress reported by the worker with each lease renewal
+    current_step = Column(Integer, default=0)
+    max_steps = Column(Integer, default=30)
+    current_action = Column(String)
+    current_url = Column(String)
+    started_at = Column(DateTime)
+
+    persona_run_id = Column(String)
+    error = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_task_jobs_status_lease", "status", "lease_expires_at"),
+    )
@@ -0,0 +1,15 @@
+"""
+URL dictionary models: every normalized URL seen in a journey gets a compact integer id.
+"""
+
+from sqlalchemy import Column, Integer, String
+
+from src.database import Base
+
+
+class Url(Base):
+    """A normalized URL (trailing slash stripped), referenced by id from step and report rows."""
+    __tablename__ = "urls"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    url = Column(String, nullable=False, unique=True)
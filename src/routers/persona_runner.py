@@ -1,17 +1,30 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from src.database import get_db, SessionLocal
-from src.models import Scenario, PersonaExecutionResponse, RunStatusResponse, ActiveExecutionsResponse
-from src.handlers import persona_runner
+from src.models import PersonaExecutionResponse, RunStatusResponse, ActiveExecutionsResponse
+from src.handlers import persona_runner, run_state, task_queue
+from src.handlers import scenarios as scenarios_handler
+from src.common.fair_scheduler import PRIORITY_RANKS
 
 router = APIRouter(prefix="/api", tags=["Persona Execution"])
 
 
 @router.post("/persona/run/{scenario_id}", response_model=PersonaExecutionResponse)
-async def run_persona(scenario_id: str, db: Session = Depends(get_db)):
-    """Start running persona tasks for a scenario."""
-    scenario = db.query(Scenario).filter(Scenario.id == scenario_id).first()
+async def run_persona(
+    scenario_id: str,
+    priority: str = Query("interactive", description="Scheduling priority: interactive or batch"),
+    db: Session = Depends(get_db)
+):
+    """
+    Start running persona tasks for a scenario.
+    Interactive runs get browser slots ahead of batch runs (e.g. nightly reports).
+    """
+    if priority not in PRIORITY_RANKS:
+        raise HTTPException(status_code=400, detail=f"Invalid priority: {priority}")
+
+    scenario = await run_in_threadpool(scenarios_handler.get_scenario, db, scenario_id)
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
 
@@ -28,7 +41,8 @@ async def run_persona(scenario_id: str, db: Session = Depends(get_db)):
         db_session_factory=SessionLocal,
         scenario_id=scenario_id,
         report_id=report_id,
-        run_id=run_id
+        run_id=run_id,
+        priority=priority
     )
 
     return PersonaExecutionResponse(
@@ -42,9 +56,13 @@ async def run_persona(scenario_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/persona/run/{run_id}/status", response_model=RunStatusResponse)
-async def get_run_status(run_id: str):
+async def get_run_status(run_id: str, db: Session = Depends(get_db)):
     """Get status of a specific run."""
+    # In-memory runs are read on the event loop; finished and worker-executed runs
+    # come from the database in the threadpool so polling never waits on a query
     status = persona_runner.get_run_status(run_id)
+    if not status:
+        status = await run_in_threadpool(persona_runner.get_run_status, run_id, db)
 
     if not status:
         raise HTTPException(
@@ -55,20 +73,39 @@ async def get_run_status(run_id: str):
     return RunStatusResponse(**status)
 
 
+@router.post("/persona/run/{run_id}/cancel", response_model=RunStatusResponse)
+async def cancel_run(run_id: str, db: Session = Depends(get_db)):
+    """Cancel a run, stopping its running agents and skipping its pending tasks."""
+    # In-memory runs are cancelled on the event loop, which owns their tasks;
+    # worker-executed runs are cancelled in the database from the threadpool
+    cancelled = persona_runner.cancel_run(run_id) or await run_in_threadpool(persona_runner.cancel_run, run_id, db)
+    if not cancelled:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    status = persona_runner.get_run_status(run_id)
+    if not status:
+        status = await run_in_threadpool(persona_runner.get_run_status, run_id, db)
+    return RunStatusResponse(**status)
+
+
 @router.delete("/persona/run/{run_id}")
-async def acknowledge_run_completion(run_id: str):
-    """Acknowledge run completion and cleanup status."""
+async def acknowledge_run_completion(run_id: str, db: Session = Depends(get_db)):
+    """Acknowledge run completion and cleanup status. A run still in progress is cancelled first."""
+    if not persona_runner.cancel_run(run_id):
+        await run_in_threadpool(persona_runner.cancel_run, run_id, db)
     persona_runner.cleanup_run_status(run_id)
+    await run_in_threadpool(run_state.delete_run_state, db, run_id)
     return {"message": "Run status cleaned up"}
 
 
 @router.get("/executions/active", response_model=ActiveExecutionsResponse)
-async def get_active_executions():
+async def get_active_executions(db: Session = Depends(get_db)):
     """
     Get all active executions (persona runs and scenario analyses).
     Used by the status bar to restore state after page refresh.
     """
     active_runs = persona_runner.get_all_active_runs()
+    active_runs += await run_in_threadpool(task_queue.get_active_queued_runs, db)
     return ActiveExecutionsResponse(
         executions=[RunStatusResponse(**run) for run in active_runs],
         total_count=len(active_runs)
@@ -1,28 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
 
+from src.common.fieldsets import parse_fields, sparse_response
 from src.database import get_db
-from src.models import PersonaRunResponse, PersonaRunCreate
 from src.handlers import persona_runs as persona_runs_handler
+from src.models import (
+    PERSONA_RUN_SUMMARY_FIELDS,
+    PersonaRun,
+    PersonaRunCreate,
+    PersonaRunFieldsResponse,
+    PersonaRunResponse,
+)
 
 router = APIRouter(prefix="/api/persona-runs", tags=["Persona Runs"])
 
-@router.get("", response_model=List[PersonaRunResponse])
+@router.get("", response_model=list[PersonaRunResponse])
 def list_persona_runs(
-    config_id: str = None,
-    persona_type: str = None,
-    report_id: str = None,
-    status: str = None,
-    platform: str = None,
+    response: Response,
+    config_id: str | None = None,
+    persona_type: str | None = None,
+    report_id: str | None = None,
+    status: str | None = None,
+    platform: str | None = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
+    fields: str = Query(None, description="'summary', or comma-separated fields to return (default: all)"),
     db: Session = Depends(get_db),
 ):
-    """List persona runs with optional filters."""
-    return persona_runs_handler.list_persona_runs(
-        db, config_id, persona_type, report_id, status, platform, limit, offset
-    )
+    """
+    List persona runs with optional filters, newest first.
+    When a full page is returned, the X-Next-Cursor header holds the cursor of the next page.
+    """
+    try:
+        names = parse_fields(PersonaRun, fields, PERSONA_RUN_SUMMARY_FIELDS)
+        runs = persona_runs_handler.list_persona_runs(
+            db, config_id, persona_type, report_id, status, platform, limit, offset, cursor, names
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {}
+    if limit and len(runs) == limit:
+        headers["X-Next-Cursor"] = persona_runs_handler.run_cursor(runs[-1])
+    if names:
+        return sparse_response(PersonaRunFieldsResponse, runs, names, headers)
+    response.headers.update(headers)
+    return runs
 
 @router.post("", response_model=PersonaRunResponse)
 def create_persona_run(run: PersonaRunCreate, db: Session = Depends(get_db)):
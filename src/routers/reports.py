@@ -1,25 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from src.common.fieldsets import parse_fields, to_dicts
 from src.database import get_db
 from src.handlers import reports
+from src.models import PersonaRun, PERSONA_RUN_SUMMARY_FIELDS
 
 router = APIRouter(prefix="/api/reports", tags=["Reports"])
 
 
 @router.get("/list")
-async def list_reports(db: Session = Depends(get_db)):
+def list_reports(db: Session = Depends(get_db)):
     """List all unique report_ids with metadata."""
     return reports.list_report_summaries(db)
 
 
 @router.get("/aggregate")
-async def get_report_aggregate(
+def get_report_aggregate(
     report_id: str = Query(None, description="Filter by report ID (None for all reports)"),
     config_id: str = Query(None, description="Filter by scenario/config ID"),
     mode: str = Query("compact", description="Sankey mode: 'compact' or 'full'"),
     persona: str = Query(None, description="Filter by persona type"),
     status: str = Query(None, description="Filter by status ('completed' or 'failed')"),
     platform: str = Query(None, description="Filter by platform"),
+    top_k: int = Query(reports.SANKEY_TOP_K, ge=0, description="Keep the K most visited pages, folding the rest into 'Other' (0 keeps all)"),
+    min_link_value: int = Query(0, ge=0, description="Drop transitions taken fewer times than this"),
+    other: bool = Query(True, description="Fold pruned pages into an 'Other' node instead of dropping them"),
     db: Session = Depends(get_db)
 ):
     """Get aggregated data for a specific report_id or scenario."""
@@ -28,18 +33,22 @@ async def get_report_aggregate(
     if status: filters["status"] = status
     if platform: filters["platform"] = platform
 
-    result = reports.get_report_aggregate(db, report_id, config_id=config_id, sankey_mode=mode, filters=filters)
+    result = reports.get_report_aggregate(
+        db, report_id, config_id=config_id, sankey_mode=mode, filters=filters,
+        top_k=top_k, min_link_value=min_link_value, other=other,
+    )
     if not result:
         raise HTTPException(status_code=404, detail="Report not found")
     return result
 
 
 @router.get("/{report_id}/runs")
-async def get_report_runs(
+def get_report_runs(
     report_id: str,
     persona: str = Query(None, description="Filter by persona type"),
     status: str = Query(None, description="Filter by status ('success', 'failed', or 'error')"),
     platform: str = Query(None, description="Filter by platform"),
+    fields: str = Query(None, description="'summary', or comma-separated fields to return (default: all)"),
     db: Session = Depends(get_db)
 ):
     """Get filtered runs for a specific report_id."""
@@ -48,13 +57,17 @@ async def get_report_runs(
     if status: filters["status"] = status
     if platform: filters["platform"] = platform
 
-    runs = reports._query_persona_runs(db, report_id=report_id, filters=filters)
-    return runs
+    try:
+        names = parse_fields(PersonaRun, fields, PERSONA_RUN_SUMMARY_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    runs = reports.get_report_runs(db, report_id, filters=filters, fields=names)
+    return to_dicts(runs, names) if names else runs
 
 
 
 @router.get("/friction")
-async def get_report_friction(
+def get_report_friction(
     report_id: str = Query(None, description="Filter by report ID"),
     config_id: str = Query(None, description="Filter by scenario/config ID"),
     db: Session = Depends(get_db)
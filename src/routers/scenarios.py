@@ -1,28 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
 
-from src.database import get_db, SessionLocal
+from src.common.fieldsets import parse_fields, sparse_response
+from src.database import SessionLocal, get_db
+from src.handlers import scenarios as scenarios_handler
 from src.models import (
-    ScenarioResponse,
-    ScenarioCreate,
-    CrawlerAnalysisRequest,
+    SCENARIO_SUMMARY_FIELDS,
     AsyncAnalysisResponse,
-    UpdateScenarioTasksRequest,
-    UpdateScenarioTasksFullRequest,
+    CrawlerAnalysisRequest,
     GenerateMoreTasksRequest,
     GenerateMoreTasksResponse,
+    Scenario,
+    ScenarioCreate,
+    ScenarioFieldsResponse,
+    ScenarioResponse,
     SystemConfig,
+    UpdateScenarioTasksFullRequest,
+    UpdateScenarioTasksRequest,
 )
-from src.handlers import scenarios as scenarios_handler
 
 router = APIRouter(prefix="/api/scenario", tags=["Scenario"])
 
 
-@router.get("s", response_model=List[ScenarioResponse])
-def list_scenarios(db: Session = Depends(get_db)):
+@router.get("s", response_model=list[ScenarioResponse])
+def list_scenarios(
+    fields: str = Query(None, description="'summary', or comma-separated fields to return (default: all)"),
+    db: Session = Depends(get_db)
+):
     """List all test scenarios."""
-    return scenarios_handler.list_scenarios(db)
+    try:
+        names = parse_fields(Scenario, fields, SCENARIO_SUMMARY_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    scenarios = scenarios_handler.list_scenarios(db, names)
+    return sparse_response(ScenarioFieldsResponse, scenarios, names) if names else scenarios
 
 
 @router.post("s", response_model=ScenarioResponse)
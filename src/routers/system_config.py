@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from src.database import get_db
 from src.models import SystemConfigResponse, SystemConfigCreate
 from src.handlers import system_config as system_config_handler
+from src.handlers import persona_runner
 
 router = APIRouter(prefix="/api/system-config", tags=["System Config"])
 
@@ -16,9 +18,12 @@ def get_system_config(db: Session = Depends(get_db)):
     return config
 
 @router.put("", response_model=SystemConfigResponse)
-def update_system_config(config_data: SystemConfigCreate, db: Session = Depends(get_db)):
-    """Create or update system configuration."""
-    return system_config_handler.update_system_config(db, config_data)
+async def update_system_config(config_data: SystemConfigCreate, db: Session = Depends(get_db)):
+    """Create or update system configuration. A new max_browser_workers applies to running work immediately."""
+    config = await run_in_threadpool(system_config_handler.update_system_config, db, config_data)
+    if not persona_runner.AUTOSCALE:
+        await persona_runner.set_browser_workers(config.max_browser_workers)
+    return config
 
 
 @router.get("/status")
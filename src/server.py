@@ -4,22 +4,86 @@ Usefly FastAPI Server
 Serves the static Next.js export and provides API endpoints for agent runs and reports.
 """
 
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
+
 from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
-from src.database import init_db
+from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.staticfiles import StaticFiles
+
+from src.common.browser_pool import close_browser_pool, get_browser_pool
+from src.database import SessionLocal, init_db
+from src.handlers.persona_run_events import backfill_run_events
+from src.handlers.persona_runner import (
+    EXECUTION_BACKEND,
+    recover_orphaned_runs,
+    run_checkpoint_loop,
+    start_concurrency_controller,
+)
+from src.handlers.process_backend import shutdown_process_backend
+from src.handlers.report_aggregates import backfill_report_aggregates
+from src.handlers.run_writer import close_run_writer
+from src.models import SystemConfig
+from src.routers.persona_runner import router as persona_runner_router
 from src.routers.persona_runs import router as persona_runs_router
 from src.routers.reports import router as reports_router
-from src.routers.system_config import router as system_config_router
 from src.routers.scenarios import router as scenario_router
-from src.routers.persona_runner import router as persona_runner_router
+from src.routers.system_config import router as system_config_router
 
 # Initialize database
 init_db()
 
-app = FastAPI(title="Usefly", description="Agentic UX Analytics")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    On startup: backfill step rows and report aggregates after upgrading, recover runs
+    a previous process left unfinished, start run state checkpointing, warm the
+    browser pool and, with USEFLY_AUTOSCALE, start the concurrency controller. On shutdown: flush pending run results, write a final
+    checkpoint and close pooled browsers and worker processes.
+    """
+    db = SessionLocal()
+    try:
+        backfilled = backfill_run_events(db)
+        if backfilled:
+            print(f"Stored steps of {backfilled} existing persona runs in persona_run_events")
+        backfilled = backfill_report_aggregates(db)
+        if backfilled:
+            print(f"Built report aggregates from {backfilled} existing persona runs")
+    finally:
+        db.close()
+
+    await recover_orphaned_runs(SessionLocal)
+    checkpointer = asyncio.create_task(run_checkpoint_loop(SessionLocal))
+
+    db = SessionLocal()
+    try:
+        sys_config = db.query(SystemConfig).filter(SystemConfig.id == 1).first()
+        max_workers = sys_config.max_browser_workers if sys_config else None
+    finally:
+        db.close()
+
+    # Only the in-loop backend drives browsers from the server process
+    if max_workers and EXECUTION_BACKEND == "asyncio":
+        pool = await get_browser_pool(max_workers)
+        asyncio.create_task(pool.warm())
+
+    controller = start_concurrency_controller(max_workers or 3)
+
+    yield
+
+    await close_run_writer()
+    background = [task for task in (checkpointer, controller) if task is not None]
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await close_browser_pool()
+    await shutdown_process_backend()
+
+
+app = FastAPI(title="Usefly", description="Agentic UX Analytics", lifespan=lifespan)
 
 # Add CORS middleware for frontend requests
 app.add_middleware(
@@ -28,6 +92,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Get the static directory path
@@ -0,0 +1,188 @@
+"""
+Usefly task worker
+
+Leases persona tasks from the shared task_jobs table, runs the browser agents
+and writes PersonaRun rows back. Start one or more with `usefly worker`, on this
+host or others pointed at the same USEFLY_DATABASE_URL.
+"""
+
+import asyncio
+import socket
+import uuid
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.common.browser_pool import close_browser_pool, get_browser_pool
+from src.database import SessionLocal, init_db
+from src.handlers import task_queue
+from src.handlers.persona_run_events import discard_run_events, make_event_sink
+from src.handlers.persona_runner import TASK_TIMEOUT, build_error_run, run_task_agent
+from src.handlers.persona_runs import create_persona_run
+from src.handlers.run_writer import close_run_writer, get_run_writer
+from src.models import SystemConfig, TaskJob
+
+
+async def _renew_until_done(job_id: str, worker_id: str, lease_seconds: int, progress: dict, agent_task: asyncio.Task):
+    """Renew the lease periodically; stop the agent if the job was taken over or cancelled."""
+    while not agent_task.done():
+        await asyncio.sleep(lease_seconds / 3)
+        db = SessionLocal()
+        try:
+            owned = task_queue.renew_lease(db, job_id, worker_id, lease_seconds, **progress)
+        except SQLAlchemyError as e:
+            print(f"Lease renewal failed for job {job_id}: {e}")
+            continue
+        finally:
+            db.close()
+        if not owned:
+            print(f"Lost lease on job {job_id}, stopping agent")
+            agent_task.cancel()
+            return
+
+
+async def _run_job(job: TaskJob, worker_id: str, lease_seconds: int, system_config: SystemConfig, pool_size: int):
+    """Run one leased job end to end and record its result."""
+    progress = {"current_step": None, "current_action": None, "current_url": None}
+
+    def on_step(step: int, action: str | None, url: str | None):
+        progress.update(current_step=step, current_action=action, current_url=url)
+
+    pool = await get_browser_pool(pool_size)
+    try:
+        browser_session = await pool.acquire()
+    except Exception as e:  # noqa: BLE001
+        print(f"Browser pool unavailable, launching a dedicated browser: {e}")
+        browser_session = None
+
+    # Steps are streamed under a fresh id per attempt, so a retried job doesn't mix attempts
+    persona_run_id = str(uuid.uuid4())
+    event_sink = make_event_sink(SessionLocal, persona_run_id)
+    agent_task = asyncio.create_task(asyncio.wait_for(run_task_agent(
+        config_id=job.scenario_id,
+        report_id=job.report_id,
+        task=job.task,
+        system_config=system_config,
+        on_step_callback=on_step,
+        browser_session=browser_session,
+        persona_run_id=persona_run_id,
+        on_events=event_sink
+    ), timeout=TASK_TIMEOUT))
+    renewer = asyncio.create_task(_renew_until_done(job.id, worker_id, lease_seconds, progress, agent_task))
+
+    failed = False
+    error = None
+    cancelled = False
+    try:
+        persona_run_data = await agent_task
+    except asyncio.CancelledError:
+        # Lease lost or run cancelled: the job is no longer ours to record, and a
+        # retry streams its steps under a new id, so this attempt's steps are dropped
+        cancelled = True
+        await event_sink.flush()
+        await asyncio.to_thread(discard_run_events, SessionLocal, persona_run_id)
+        return
+    except TimeoutError:
+        failed = True
+        error = f"Task exceeded the {TASK_TIMEOUT:.0f}s deadline"
+        persona_run_data = build_error_run(job.scenario_id, job.report_id, job.task, error, persona_run_id)
+    except Exception as e:  # noqa: BLE001
+        failed = True
+        error = str(e)
+        persona_run_data = build_error_run(job.scenario_id, job.report_id, job.task, e, persona_run_id)
+    finally:
+        renewer.cancel()
+        if browser_session is not None:
+            await pool.release(browser_session, discard=cancelled)
+
+    def on_written(written_id: str | None):
+        db = SessionLocal()
+        try:
+            if written_id is None:
+                # The writer drops results of scenarios deleted while the job ran
+                task_queue.complete_task(db, job.id, worker_id, None, failed=True, error=error or "Run result not saved: write failed or scenario deleted")
+            else:
+                task_queue.complete_task(db, job.id, worker_id, written_id, failed=failed, error=error)
+        finally:
+            db.close()
+
+    await event_sink.flush()
+    await get_run_writer().submit(persona_run_data, on_written)
+
+
+def _record_exhausted_jobs():
+    """Write error PersonaRuns for jobs that kept losing their lease (e.g. crashed every worker)."""
+    db = SessionLocal()
+    try:
+        for job in task_queue.fail_exhausted_tasks(db):
+            try:
+                persona_run = create_persona_run(db, build_error_run(job.scenario_id, job.report_id, job.task, job.error))
+            except ValueError as e:
+                # The scenario was deleted while the job was queued; the job stays failed
+                print(f"Could not record exhausted job {job.id}: {e}")
+                continue
+            job.persona_run_id = persona_run.id
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_worker(
+    worker_id: str | None = None,
+    concurrency: int | None = None,
+    poll_interval: float = 2.0,
+    lease_seconds: int = task_queue.DEFAULT_LEASE_SECONDS
+):
+    """
+    Poll the task queue and run up to `concurrency` agents at a time.
+    Concurrency defaults to SystemConfig.max_browser_workers.
+    """
+    init_db()
+    worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+    running = set()
+    print(f"Worker {worker_id} started")
+
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                system_config = db.query(SystemConfig).filter(SystemConfig.id == 1).first()
+                if system_config:
+                    db.expunge(system_config)
+            finally:
+                db.close()
+
+            if not system_config:
+                print("System configuration not found, waiting...")
+                await asyncio.sleep(poll_interval)
+                continue
+
+            _record_exhausted_jobs()
+
+            limit = concurrency or system_config.max_browser_workers
+            while len(running) < limit:
+                db = SessionLocal()
+                try:
+                    job = task_queue.lease_next_task(db, worker_id, lease_seconds)
+                    if job:
+                        db.expunge(job)
+                finally:
+                    db.close()
+                if not job:
+                    break
+
+                print(f"Leased job {job.id} (run {job.run_id}, task {job.task_index})")
+                job_task = asyncio.create_task(_run_job(job, worker_id, lease_seconds, system_config, limit))
+                running.add(job_task)
+                job_task.add_done_callback(running.discard)
+
+            await asyncio.sleep(poll_interval)
+    finally:
+        for job_task in running:
+            job_task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        await close_run_writer()
+        await close_browser_pool()
+
+
+def main(worker_id: str | None = None, concurrency: int | None = None, poll_interval: float = 2.0, lease_seconds: int = task_queue.DEFAULT_LEASE_SECONDS):
+    asyncio.run(run_worker(worker_id, concurrency, poll_interval, lease_seconds))
@@ -0,0 +1,84 @@
+"""
+Benchmark remove_back_edges against the per-edge DFS reference on synthetic
+journey graphs. Not collected by pytest; run with:
+
+    python -m tests.bench_remove_back_edges [--urls 500 1000 ...] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+
+from src.handlers.reports import remove_back_edges
+
+
+def remove_back_edges_dfs(transitions: dict[tuple, int]) -> dict[tuple, int]:
+    """Reference implementation of remove_back_edges: a fresh DFS per candidate edge."""
+    sorted_edges = sorted(transitions.items(), key=lambda x: x[1], reverse=True)
+
+    graph = {}
+    acyclic = {}
+
+    def creates_cycle(source, target):
+        # Check if there's already a path from target back to source
+        visited = set()
+        stack = [target]
+        while stack:
+            node = stack.pop()
+            if node == source:
+                return True
+            if node not in visited:
+                visited.add(node)
+                stack.extend(graph.get(node, []))
+        return False
+
+    for (source, target), count in sorted_edges:
+        if not creates_cycle(source, target):
+            acyclic[(source, target)] = count
+            graph.setdefault(source, []).append(target)
+
+    return acyclic
+
+
+def synthetic_transitions(url_count: int, edges_per_url: int = 8, seed: int = 0) -> dict:
+    """Mostly-forward funnel transitions with some back navigation, Zipf-like counts."""
+    rng = random.Random(seed)
+    urls = [f"https://example.com/page/{i}" for i in range(url_count)]
+    transitions = {}
+    for i, source in enumerate(urls):
+        for _ in range(edges_per_url):
+            if rng.random() < 0.8:
+                j = min(url_count - 1, i + 1 + int(rng.expovariate(0.2)))
+            else:
+                j = rng.randrange(url_count)
+            if j != i:
+                transitions[(source, urls[j])] = int(1000 / (1 + rng.random() * 50))
+    return transitions
+
+
+def best_of(func, transitions, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(transitions)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, nargs="+", default=[100, 500, 1000, 2000, 4000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'urls':>6} {'edges':>7} {'dfs (s)':>10} {'incremental (s)':>16} {'speedup':>8}")
+    for url_count in args.urls:
+        transitions = synthetic_transitions(url_count)
+        assert remove_back_edges(transitions) == remove_back_edges_dfs(transitions)
+        dfs = best_of(remove_back_edges_dfs, transitions, args.repeat)
+        incremental = best_of(remove_back_edges, transitions, args.repeat)
+        print(f"{url_count:>6} {len(transitions):>7} {dfs:>10.4f} {incremental:>16.4f} {dfs / incremental:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,37 @@
 """Pytest configuration and fixtures for Usefly tests."""
 
+from unittest.mock import AsyncMock, MagicMock, Mock
+
 import pytest
-from datetime import datetime
-from unittest.mock import Mock, MagicMock, AsyncMock, patch
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
 from src.database import Base
-from src.models import SystemConfig, CrawlerRun
+from src.models import SystemConfig
+
+
+@pytest.fixture(autouse=True)
+def clear_report_cache():
+    """Report results are cached per process; don't let them leak between test databases."""
+    from src.handlers import reports
+    reports._report_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_url_dictionary():
+    """URL ids are cached per process but assigned per test database."""
+    from src.handlers import url_dictionary
+    url_dictionary._dictionary.clear()
 
 
 @pytest.fixture
 def test_db():
     """Create an in-memory SQLite database for tests."""
-    engine = create_engine("sqlite:///:memory:")
+    # One shared connection, so work handed to threads sees the same database
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
     Base.metadata.create_all(bind=engine)
     SessionLocal = sessionmaker(bind=engine)
     return SessionLocal()
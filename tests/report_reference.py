@@ -0,0 +1,209 @@
+"""
+Reference implementations of report reads, computed straight from persona_runs.
+
+Production reads the materialized aggregate tables (see src.handlers.report_aggregates);
+tests check those reads against these scans of every run.
+"""
+
+from sqlalchemy.orm import Session
+
+from src.handlers.persona_run_events import get_url_steps
+from src.handlers.reports import (
+    FrictionAccumulator,
+    _apply_run_filters,
+    _run_status,
+    aggregate_transitions,
+    break_sequence_on_cycles,
+    build_sankey_structure,
+    calculate_node_metrics,
+    extract_url_sequence_from_events,
+    friction_location_and_reason,
+    remove_back_edges,
+)
+from src.models import PersonaRun, Scenario
+
+
+def _matches_filters(row, filters: dict[str, str] | None) -> bool:
+    """Python twin of the UI filters in _apply_run_filters."""
+    if not filters:
+        return True
+    for key in ("persona_type", "platform"):
+        if filters.get(key) and filters[key] != "all" and getattr(row, key) != filters[key]:
+            return False
+    status = filters.get("status")
+    if status and status != "all" and status in ("success", "failed", "error"):
+        return _run_status(row.is_done, row.judgement_data) == status
+    return True
+
+
+class StepSankeyBuilder:
+    """Step-based Sankey data; each node is (step_index, url), so there are no cycles."""
+
+    def __init__(self, max_steps: int = 10):
+        self.max_steps = max_steps
+        self.node_map = {}  # (step, url) -> node_index
+        self.nodes = []
+        self.links_map = {}  # (source_idx, target_idx) -> count
+
+    def add(self, sequence: list[str]):
+        for i in range(min(len(sequence), self.max_steps)):
+            node_key = (i, sequence[i])
+            if node_key not in self.node_map:
+                self.node_map[node_key] = len(self.nodes)
+                self.nodes.append({"name": sequence[i], "step": i, "visits": 0, "event_count": 0})
+
+            node_idx = self.node_map[node_key]
+            self.nodes[node_idx]["visits"] += 1
+            self.nodes[node_idx]["event_count"] += 1
+
+            if i > 0:
+                link_key = (self.node_map[(i - 1, sequence[i - 1])], node_idx)
+                self.links_map[link_key] = self.links_map.get(link_key, 0) + 1
+
+    def build(self) -> dict:
+        links = [{"source": src, "target": tgt, "value": val} for (src, tgt), val in self.links_map.items()]
+        return {"nodes": self.nodes, "links": links}
+
+
+class SankeyAccumulator:
+    """Journey transitions collected run by run, in "compact" or "full" (step-based) mode."""
+
+    def __init__(self, mode: str = "compact"):
+        self.mode = mode
+        self.transitions = {}
+        self.node_metrics = {}
+        self.step_builder = StepSankeyBuilder()
+
+    def add(self, events: list[dict] | None):
+        if not events:
+            return
+        url_sequence = extract_url_sequence_from_events(events)
+        if self.mode == "full":
+            if url_sequence:
+                self.step_builder.add(url_sequence)
+            return
+        sequences = break_sequence_on_cycles(url_sequence)
+        aggregate_transitions(sequences, self.transitions)
+        calculate_node_metrics(sequences, self.node_metrics)
+
+    def build(self, friction_data: list[dict] | None = None) -> dict:
+        if self.mode == "full":
+            return self.step_builder.build()
+        return build_sankey_structure(self.node_metrics, remove_back_edges(self.transitions), friction_data)
+
+
+class ReportAccumulator:
+    """
+    Everything get_report_aggregate returns, computed in one pass over a report's runs.
+
+    Metrics and the Sankey diagram only count runs matching the filters, while
+    friction hotspots cover every failed run of the report.
+    """
+
+    def __init__(self, sankey_mode: str = "compact", filters: dict[str, str] | None = None):
+        self.filters = filters
+        self.scanned_count = 0
+        self.run_count = 0
+        self.config_id = None
+        self.status_counts = {"success": 0, "failed": 0, "error": 0}
+        self.durations = []
+        self.steps = []
+        self.sankey = SankeyAccumulator(sankey_mode)
+        self.friction = FrictionAccumulator() if sankey_mode != "full" else None
+
+    def add(self, row):
+        self.scanned_count += 1
+        if self.config_id is None:
+            self.config_id = row.config_id
+
+        status = _run_status(row.is_done, row.judgement_data)
+        if status == "failed" and self.friction is not None:
+            self.friction.add(row)
+
+        if not _matches_filters(row, self.filters):
+            return
+        if self.run_count == 0:
+            self.config_id = row.config_id
+        self.run_count += 1
+
+        if status:
+            self.status_counts[status] += 1
+        if row.duration_seconds is not None:
+            self.durations.append(row.duration_seconds)
+        if row.steps_completed is not None:
+            self.steps.append(row.steps_completed)
+        self.sankey.add(row.events)
+
+    def metrics_summary(self) -> dict:
+        success_count = self.status_counts["success"]
+        total_count = sum(self.status_counts.values())
+        return {
+            "total_runs": total_count,
+            "sucessfull_runs": success_count,
+            "failed_runs": self.status_counts["failed"],
+            "error_runs": self.status_counts["error"],
+            "success_rate": success_count / total_count if total_count > 0 else 0,
+            "avg_duration_seconds": sum(self.durations) / len(self.durations) if self.durations else 0.0,
+            "min_duration_seconds": float(min(self.durations, default=0.0)),
+            "max_duration_seconds": float(max(self.durations, default=0.0)),
+            "avg_steps": sum(self.steps) / len(self.steps) if self.steps else 0.0,
+            "max_steps": max(self.steps, default=0),
+        }
+
+    def journey_sankey(self) -> dict:
+        if not self.run_count:
+            return {"nodes": [], "links": []}
+        friction_data = self.friction.build() if self.friction is not None else None
+        return self.sankey.build(friction_data)
+
+
+def scan_report_aggregate(
+    db: Session,
+    report_id: str | None = None,
+    config_id: str | None = None,
+    sankey_mode: str = "compact",
+    filters: dict[str, str] | None = None
+) -> dict | None:
+    """get_report_aggregate computed by replaying every run of the report or scenario."""
+    report = ReportAccumulator(sankey_mode=sankey_mode, filters=filters)
+    for row in _apply_run_filters(db.query(PersonaRun), report_id, config_id):
+        report.add(row)
+
+    if report.scanned_count == 0:
+        return None
+
+    # Filters that match nothing still return an empty structure for a valid report
+    scenario = db.query(Scenario).filter(Scenario.id == report.config_id).first()
+    scenario_name = scenario.name if scenario else "Unknown Scenario"
+    if report.run_count:
+        scenario_id = report.config_id
+    else:
+        scenario_id = scenario.id if scenario else "unknown"
+
+    return {
+        "report_id": report_id,
+        "scenario_id": scenario_id,
+        "scenario_name": scenario_name,
+        "run_count": report.run_count,
+        "metrics_summary": report.metrics_summary(),
+        "journey_sankey": report.journey_sankey(),
+    }
+
+
+def scan_friction_hotspots(
+    db: Session,
+    report_id: str | None = None,
+    config_id: str | None = None
+) -> list[dict]:
+    """get_friction_hotspots computed from the failed runs and their stored steps."""
+    failed = _apply_run_filters(
+        db.query(PersonaRun.id, PersonaRun.error_type, PersonaRun.judgement_data),
+        report_id, config_id, {"status": "failed"}
+    ).all()
+    steps = get_url_steps(db, [run.id for run in failed])
+
+    friction = FrictionAccumulator()
+    for run in failed:
+        location, reason = friction_location_and_reason(run, steps[run.id])
+        friction.add_group(location, reason, count=1, run_ids=[run.id])
+    return friction.build()
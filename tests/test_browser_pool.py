@@ -0,0 +1,51 @@
+"""Tests for the warm browser pool."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.common.browser_pool import BrowserPool, PooledBrowser
+
+
+def _patch_pool(pool: BrowserPool):
+    pool._launch = AsyncMock(side_effect=lambda: PooledBrowser(MagicMock()))
+    pool._is_healthy = AsyncMock(return_value=True)
+    pool._reset = AsyncMock(return_value=True)
+    pool._kill = AsyncMock()
+
+
+@pytest.mark.asyncio
+async def test_released_browser_is_reused():
+    pool = BrowserPool(size=2)
+    _patch_pool(pool)
+
+    session = await pool.acquire()
+    await pool.release(session)
+    assert await pool.acquire() is session
+    assert pool._launch.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_browser_recycled_after_max_uses():
+    pool = BrowserPool(size=1, max_uses=2)
+    _patch_pool(pool)
+
+    first = await pool.acquire()
+    await pool.release(first)
+    await pool.release(await pool.acquire())
+
+    assert pool._kill.await_count == 1
+    assert await pool.acquire() is not first
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_idle_browser_is_replaced():
+    pool = BrowserPool(size=1)
+    _patch_pool(pool)
+
+    first = await pool.acquire()
+    await pool.release(first)
+    pool._is_healthy.return_value = False
+
+    assert await pool.acquire() is not first
+    assert pool._kill.await_count == 1
@@ -0,0 +1,53 @@
+"""Tests for browser concurrency auto-tuning."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.common.concurrency_controller import ConcurrencyController, decide_target
+
+
+def _metrics(**overrides):
+    metrics = {
+        "load_per_cpu": 0.3,
+        "available_mb": 8000,
+        "chromium_rss_mb": 1200,
+        "rate_limits": 0,
+        "in_use": 3,
+        "waiting": 5,
+    }
+    metrics.update(overrides)
+    return metrics
+
+
+def test_grows_when_tasks_wait_and_host_has_headroom():
+    assert decide_target(3, _metrics(), min_workers=1, max_workers=8) == 4
+
+
+def test_holds_when_nothing_is_waiting():
+    assert decide_target(3, _metrics(waiting=0), min_workers=1, max_workers=8) == 3
+
+
+@pytest.mark.parametrize("overrides", [
+    {"rate_limits": 2},
+    {"load_per_cpu": 1.5},
+    {"available_mb": 300},  # less than one more ~400 MB browser
+])
+def test_shrinks_under_pressure(overrides):
+    assert decide_target(3, _metrics(**overrides), min_workers=1, max_workers=8) == 2
+
+
+def test_stays_within_bounds():
+    assert decide_target(8, _metrics(), min_workers=1, max_workers=8) == 8
+    assert decide_target(2, _metrics(rate_limits=5), min_workers=2, max_workers=8) == 2
+
+
+@pytest.mark.asyncio
+async def test_controller_applies_new_target():
+    apply = AsyncMock()
+    controller = ConcurrencyController(apply=apply, get_load=lambda: (3, 5), initial=3, min_workers=1, max_workers=8)
+
+    with patch("src.common.concurrency_controller.sample_host_metrics", return_value=_metrics()):
+        assert await controller.step() == 4
+
+    apply.assert_awaited_once_with(4)
@@ -0,0 +1,59 @@
+"""Tests for the SQLite storage profile, lock retries and schema upgrades."""
+
+import sqlite3
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
+
+from src import database, models  # noqa: F401
+
+
+def test_profile_pragmas_are_applied_to_new_connections(tmp_path):
+    conn = sqlite3.connect(tmp_path / "usefly.db")
+    with patch.object(database, "SQLITE_PRAGMAS", database.SQLITE_PROFILES["wal"]):
+        database._apply_sqlite_pragmas(conn, None)
+
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    conn.close()
+
+
+def test_lock_errors_are_retried_after_rollback():
+    db = MagicMock()
+    locked = OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+    func = MagicMock(side_effect=[locked, locked, "ok"])
+
+    with patch("src.database.time.sleep"):
+        assert database.retry_on_lock(db, func, "arg") == "ok"
+
+    assert func.call_count == 3
+    func.assert_called_with(db, "arg")
+    assert db.rollback.call_count == 2
+
+
+def test_other_errors_are_not_retried():
+    db = MagicMock()
+    error = OperationalError("INSERT", {}, sqlite3.OperationalError("no such table: persona_runs"))
+    func = MagicMock(side_effect=error)
+
+    with pytest.raises(OperationalError):
+        database.retry_on_lock(db, func)
+
+    assert func.call_count == 1
+
+
+def test_upgrade_adds_columns_and_drops_changed_derived_tables():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE persona_run_events (id INTEGER PRIMARY KEY, persona_run_id VARCHAR, step INTEGER, url VARCHAR)"))
+        conn.execute(text("CREATE TABLE report_nodes (id INTEGER PRIMARY KEY, segment_id INTEGER, url VARCHAR)"))
+
+    database._upgrade_schema(engine)
+
+    tables = inspect(engine)
+    assert "action_type" in {column["name"] for column in tables.get_columns("persona_run_events")}
+    assert "ix_persona_run_events_action_type" in {index["name"] for index in tables.get_indexes("persona_run_events")}
+    assert "report_nodes" not in tables.get_table_names()
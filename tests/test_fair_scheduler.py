@@ -0,0 +1,62 @@
+"""Tests for the fair-share browser slot scheduler."""
+
+import asyncio
+
+import pytest
+
+from src.common.fair_scheduler import FairScheduler
+
+
+async def _run_all(scheduler, jobs, order):
+    async def job(run_id, key, priority):
+        async with scheduler.slot(run_id, key, priority):
+            order.append((run_id, key))
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(job(*j) for j in jobs))
+
+
+@pytest.mark.asyncio
+async def test_small_run_is_not_starved_by_big_run():
+    """A run submitted after a large one gets the next free slot instead of queueing behind it."""
+    scheduler = FairScheduler(capacity=2)
+    order = []
+    jobs = [("big", i, "interactive") for i in range(10)] + [("small", i, "interactive") for i in range(2)]
+
+    await _run_all(scheduler, jobs, order)
+
+    small_starts = [order.index(("small", i)) for i in range(2)]
+    assert max(small_starts) < 5
+
+
+@pytest.mark.asyncio
+async def test_interactive_runs_before_batch():
+    scheduler = FairScheduler(capacity=1)
+    order = []
+    jobs = [("nightly", i, "batch") for i in range(3)] + [("smoke", 0, "interactive")]
+
+    await _run_all(scheduler, jobs, order)
+
+    # The first batch task already holds the slot; the interactive task is next
+    assert order[1] == ("smoke", 0)
+
+
+@pytest.mark.asyncio
+async def test_queue_positions_and_cancelled_waiters():
+    scheduler = FairScheduler(capacity=1)
+    await scheduler.acquire("a", 0)
+
+    waiters = [asyncio.create_task(scheduler.acquire(run_id, key)) for run_id, key in [("a", 1), ("a", 2), ("b", 0)]]
+    await asyncio.sleep(0)
+
+    assert scheduler.queue_positions() == {("b", 0): 1, ("a", 1): 2, ("a", 2): 3}
+
+    waiters[2].cancel()
+    await asyncio.gather(waiters[2], return_exceptions=True)
+    assert scheduler.queue_positions() == {("a", 1): 1, ("a", 2): 2}
+
+    scheduler.release("a")
+    await waiters[0]
+    assert scheduler.in_use == 1
+    waiters[1].cancel()
+    await asyncio.gather(waiters[1], return_exceptions=True)
@@ -0,0 +1,87 @@
+"""Tests for the shared LLM rate limiter."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.common import llm_rate_limiter
+from src.common.llm_rate_limiter import RateLimitedLLM, RateLimiter
+
+
+class RateLimitError(Exception):
+    """Stand-in for a provider SDK's 429 error."""
+
+
+class FakeChat:
+    model = "fake-model"
+    provider = "fake"
+
+    def __init__(self):
+        self.ainvoke = AsyncMock(return_value=MagicMock(usage=None, usage_metadata=None))
+
+
+def test_requests_beyond_the_burst_wait():
+    limiter = RateLimiter(requests_per_minute=60)
+
+    assert all(limiter.reserve(0) == 0 for _ in range(60))
+    # The bucket refills at one request per second
+    assert limiter.reserve(0) == pytest.approx(1.0, abs=0.05)
+    assert limiter.reserve(0) == pytest.approx(2.0, abs=0.05)
+
+
+def test_token_budget_is_settled_with_real_usage():
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    assert limiter.reserve(100) == 0
+    limiter.settle(estimated=100, actual=700)
+    assert limiter.reserve(0) == pytest.approx(10.0, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_proxy_queues_calls_and_reports_wait():
+    llm = FakeChat()
+    limiter = RateLimiter(requests_per_minute=60)
+    proxy = RateLimitedLLM(llm, limiter)
+    waits = []
+
+    assert isinstance(proxy, FakeChat)
+    assert proxy.model == "fake-model"
+
+    for _ in range(60):
+        limiter.reserve(0)
+
+    token = llm_rate_limiter.wait_listener.set(waits.append)
+    try:
+        with patch("src.common.llm_rate_limiter.asyncio.sleep", new=AsyncMock()) as sleep:
+            await proxy.ainvoke(["hello"])
+    finally:
+        llm_rate_limiter.wait_listener.reset(token)
+
+    sleep.assert_awaited_once()
+    assert waits and waits[0] == pytest.approx(1.0, abs=0.05)
+    llm.ainvoke.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_429_holds_off_other_callers():
+    llm = FakeChat()
+    llm.ainvoke.side_effect = RateLimitError("Error code: 429 - rate limit exceeded")
+    limiter = RateLimiter()
+    proxy = RateLimitedLLM(llm, limiter)
+
+    with pytest.raises(RateLimitError):
+        await proxy.ainvoke(["hello"])
+
+    assert limiter.reserve(0) == pytest.approx(llm_rate_limiter.RATE_LIMIT_BACKOFF, abs=0.1)
+
+
+def test_pool_workers_split_the_configured_limits():
+    limits = {"openai:gpt-4o": {"rpm": 600, "tpm": 40000}}
+    with patch.object(llm_rate_limiter, "MODEL_LIMITS", limits), \
+            patch.object(llm_rate_limiter, "_limiters", {}), \
+            patch.object(llm_rate_limiter, "_process_share", 1.0):
+        llm_rate_limiter.set_process_share(4)
+        limiter = llm_rate_limiter.get_rate_limiter("OpenAI", "gpt-4o")
+
+    assert limiter._requests.capacity == 150
+    assert limiter._tokens.capacity == 10000
@@ -0,0 +1,267 @@
+"""Tests for persona task scheduling."""
+
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.handlers import persona_runner, run_writer
+from src.models import PersonaRun, PersonaRunEvent, Scenario
+
+
+@pytest.fixture(autouse=True)
+async def _close_run_writer():
+    """Each test gets a fresh writer bound to its own database and event loop."""
+    yield
+    await run_writer.close_run_writer()
+
+
+def _make_scenario(test_db, task_count: int) -> Scenario:
+    tasks = [
+        {
+            "number": i + 1,
+            "starting_url": "https://example.com",
+            "goal": f"Goal {i}",
+            "steps": "Click around",
+            "persona": "SHOPPER",
+        }
+        for i in range(task_count)
+    ]
+    scenario = Scenario(
+        id="scenario-1",
+        name="Test Scenario",
+        website_url="https://example.com",
+        tasks=tasks,
+        selected_task_indices=list(range(task_count)),
+    )
+    test_db.add(scenario)
+    test_db.commit()
+    return scenario
+
+
+@pytest.mark.asyncio
+async def test_run_persona_tasks_bounds_concurrency(mock_system_config, mock_agent_history, test_db):
+    """Tasks run on the event loop with at most max_browser_workers in flight."""
+    mock_system_config.max_browser_workers = 2
+    test_db.commit()
+    _make_scenario(test_db, task_count=5)
+
+    in_flight = 0
+    peak = 0
+
+    async def fake_agent(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return mock_agent_history
+
+    mock_agent_history.final_result.return_value = "Done"
+    mock_agent_history.is_done.return_value = True
+    mock_agent_history.judgement.return_value = {"verdict": True}
+    mock_agent_history.history = []
+    mock_agent_history.model_actions.return_value = []
+    mock_agent_history.action_results.return_value = []
+
+    fake_pool = MagicMock()
+    fake_pool.acquire = AsyncMock(return_value=MagicMock())
+    fake_pool.release = AsyncMock()
+
+    with patch('src.handlers.persona_runner.run_browser_use_agent_with_hooks', side_effect=fake_agent), \
+         patch('src.handlers.persona_runner.get_browser_pool', AsyncMock(return_value=fake_pool)):
+        await persona_runner.run_persona_tasks(MagicMock(return_value=test_db), "scenario-1", "report-1", "run-1")
+        await persona_runner._run_tasks["run-1"]
+
+    status = persona_runner.get_run_status("run-1")
+    assert status["status"] == "completed"
+    assert status["completed_tasks"] == 5
+    assert peak == 2
+    assert test_db.query(PersonaRun).filter(PersonaRun.report_id == "report-1").count() == 5
+    assert fake_pool.release.await_count == 5
+    persona_runner.cleanup_run_status("run-1")
+
+
+@pytest.mark.asyncio
+async def test_orphaned_run_is_failed_on_restart(mock_system_config, test_db):
+    """A run checkpointed mid-flight gets error PersonaRuns for its unfinished tasks after a restart."""
+    _make_scenario(test_db, task_count=2)
+    session_factory = MagicMock(return_value=test_db)
+    scenario = test_db.query(Scenario).first()
+
+    persona_runner.init_run_status(
+        "run-orphan", scenario.id, scenario.name, "report-orphan", 2, scenario.tasks
+    )
+    persona_runner.update_run_status("run-orphan", completed=1, agent_run_id="done-run", task_index=0)
+    await persona_runner._checkpoint_runs_off_loop(session_factory)
+
+    # Simulate the process going away
+    persona_runner._active_runs.clear()
+    assert persona_runner.get_run_status("run-orphan", test_db)["status"] == "in_progress"
+
+    await persona_runner.recover_orphaned_runs(session_factory, policy="fail")
+
+    status = persona_runner.get_run_status("run-orphan", test_db)
+    assert status["status"] == "partial_failure"
+    assert [t["status"] for t in status["task_progress"]] == ["completed", "failed"]
+    assert test_db.query(PersonaRun).filter(PersonaRun.report_id == "report-orphan").count() == 1
+
+    persona_runner.cleanup_run_status("run-orphan", test_db)
+    assert persona_runner.get_run_status("run-orphan", test_db) is None
+
+
+def test_checkpoint_snapshot_is_not_changed_by_later_progress(test_db):
+    """Snapshots are serialized in a thread while tasks keep updating their progress."""
+    _make_scenario(test_db, task_count=2)
+    scenario = test_db.query(Scenario).first()
+    persona_runner.init_run_status("run-snap", scenario.id, scenario.name, "report-snap", 2, scenario.tasks)
+    persona_runner.update_task_progress("run-snap", 0, status="running", current_step=1)
+
+    _, snapshots = persona_runner._snapshot_dirty_runs()
+    persona_runner.update_task_progress("run-snap", 0, current_step=2, current_url="https://example.com/cart")
+
+    task = snapshots[0]["task_progress"][0]
+    assert task["current_step"] == 1
+    assert task["current_url"] != "https://example.com/cart"
+    persona_runner.cleanup_run_status("run-snap")
+
+
+@pytest.mark.asyncio
+async def test_cancel_run_stops_agents_and_discards_browsers(mock_system_config, test_db):
+    """Cancelling a run stops its agents, closes their browsers and leaves pending tasks unrun."""
+    mock_system_config.max_browser_workers = 1
+    test_db.commit()
+    _make_scenario(test_db, task_count=2)
+
+    started = asyncio.Event()
+    history = MagicMock()
+    history.history = [MagicMock(state=MagicMock(url="https://example.com"))]
+    history.model_actions.return_value = [{"navigate": {"url": "https://example.com"}}]
+    history.action_results.return_value = [MagicMock(metadata=None)]
+
+    async def hanging_agent(on_history_callback=None, **kwargs):
+        # Streams a step, then hangs until cancelled
+        on_history_callback(history)
+        started.set()
+        await asyncio.sleep(3600)
+
+    fake_pool = MagicMock()
+    fake_pool.acquire = AsyncMock(return_value=MagicMock())
+    fake_pool.release = AsyncMock()
+
+    with patch('src.handlers.persona_runner.run_browser_use_agent_with_hooks', side_effect=hanging_agent), \
+         patch('src.handlers.persona_runner.get_browser_pool', AsyncMock(return_value=fake_pool)):
+        await persona_runner.run_persona_tasks(MagicMock(return_value=test_db), "scenario-1", "report-1", "run-1")
+        run_task = persona_runner._run_tasks["run-1"]
+        await started.wait()
+
+        assert persona_runner.cancel_run("run-1")
+        with pytest.raises(asyncio.CancelledError):
+            await run_task
+
+    status = persona_runner.get_run_status("run-1")
+    assert status["status"] == "cancelled"
+    assert [p["status"] for p in status["task_progress"]] == ["cancelled", "cancelled"]
+    fake_pool.release.assert_awaited_once()
+    assert fake_pool.release.await_args.kwargs["discard"] is True
+    assert test_db.query(PersonaRun).filter(PersonaRun.report_id == "report-1").count() == 0
+    # The streamed step of the cancelled task doesn't outlive it
+    assert test_db.query(PersonaRunEvent).count() == 0
+    persona_runner.cleanup_run_status("run-1")
+
+
+@pytest.mark.asyncio
+async def test_task_deadline_records_failed_run(mock_system_config, test_db):
+    """A task that outlives TASK_TIMEOUT is stopped and recorded as an error run."""
+    _make_scenario(test_db, task_count=1)
+
+    async def hanging_agent(**kwargs):
+        await asyncio.sleep(3600)
+
+    fake_pool = MagicMock()
+    fake_pool.acquire = AsyncMock(return_value=MagicMock())
+    fake_pool.release = AsyncMock()
+
+    with patch('src.handlers.persona_runner.run_browser_use_agent_with_hooks', side_effect=hanging_agent), \
+         patch('src.handlers.persona_runner.get_browser_pool', AsyncMock(return_value=fake_pool)), \
+         patch.object(persona_runner, 'TASK_TIMEOUT', 0.05):
+        await persona_runner.run_persona_tasks(MagicMock(return_value=test_db), "scenario-1", "report-1", "run-1")
+        await persona_runner._run_tasks["run-1"]
+
+    status = persona_runner.get_run_status("run-1")
+    assert status["status"] == "failed"
+    run = test_db.query(PersonaRun).filter(PersonaRun.report_id == "report-1").one()
+    assert "deadline" in run.error_type
+    persona_runner.cleanup_run_status("run-1")
+
+
+@pytest.mark.asyncio
+async def test_steps_are_streamed_and_kept_when_the_agent_crashes(mock_system_config, test_db):
+    """Steps stored from on_step_end end up in the PersonaRun even if the agent fails afterwards."""
+    _make_scenario(test_db, task_count=1)
+
+    history = MagicMock()
+    history.history = [MagicMock(state=MagicMock(url="https://example.com")), MagicMock(state=MagicMock(url="https://example.com/cart"))]
+    history.model_actions.return_value = [{"navigate": {"url": "https://example.com"}}, {"click_element": {"index": 4}}]
+    history.action_results.return_value = [MagicMock(metadata=None), MagicMock(metadata=None)]
+
+    async def crashing_agent(on_history_callback=None, **kwargs):
+        history.history, all_steps = history.history[:1], history.history
+        on_history_callback(history)
+        history.history = all_steps
+        on_history_callback(history)
+        raise RuntimeError("Browser crashed")
+
+    fake_pool = MagicMock()
+    fake_pool.acquire = AsyncMock(return_value=MagicMock())
+    fake_pool.release = AsyncMock()
+
+    with patch('src.handlers.persona_runner.run_browser_use_agent_with_hooks', side_effect=crashing_agent), \
+         patch('src.handlers.persona_runner.get_browser_pool', AsyncMock(return_value=fake_pool)):
+        await persona_runner.run_persona_tasks(MagicMock(return_value=test_db), "scenario-1", "report-1", "run-1")
+        await persona_runner._run_tasks["run-1"]
+
+    run = test_db.query(PersonaRun).filter(PersonaRun.report_id == "report-1").one()
+    assert "Browser crashed" in run.error_type
+    assert [(e["step"], e["type"]) for e in run.events] == [(1, "navigate"), (2, "click")]
+    assert test_db.query(PersonaRunEvent).filter(PersonaRunEvent.persona_run_id == run.id).count() == 2
+    assert run.steps_completed == 2
+    persona_runner.cleanup_run_status("run-1")
+
+
+@pytest.mark.asyncio
+async def test_event_sink_writes_in_order_off_the_event_loop(test_db):
+    """Step batches are stored from a worker thread, in the order they were handed over."""
+    from src.handlers.persona_run_events import make_event_sink
+
+    writer_threads = set()
+    stored = []
+
+    def append(db, persona_run_id, events):
+        writer_threads.add(threading.get_ident())
+        stored.extend(event["step"] for event in events)
+
+    sink = make_event_sink(MagicMock(return_value=test_db), "persona-run-1")
+    with patch("src.handlers.persona_run_events.append_run_events", append):
+        for step in range(1, 6):
+            sink([{"step": step, "url": "https://example.com"}])
+        await sink.flush()
+
+    assert stored == [1, 2, 3, 4, 5]
+    assert threading.get_ident() not in writer_threads
+
+
+@pytest.mark.asyncio
+async def test_report_cache_is_warmed_off_the_event_loop(test_db):
+    """The finished report's aggregates are precomputed in a thread, not on the event loop."""
+    persona_runner.init_run_status("run-warm", "scenario-1", "Test Scenario", "report-warm", 0, [])
+    warm_threads = []
+
+    with patch("src.handlers.persona_runner.reports.warm_report_cache",
+               side_effect=lambda db, report_id: warm_threads.append(threading.get_ident())):
+        await persona_runner._wait_for_completion([], "run-warm", MagicMock(return_value=test_db))
+
+    assert len(warm_threads) == 1
+    assert threading.get_ident() not in warm_threads
+    persona_runner.cleanup_run_status("run-warm")
@@ -0,0 +1,108 @@
+"""Tests for listing persona runs with keyset pagination and sparse fieldsets."""
+
+import json
+from datetime import datetime, timedelta
+from typing import get_args
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import event
+
+from src.handlers import persona_runs
+from src.models import (
+    PERSONA_RUN_SUMMARY_FIELDS,
+    PersonaRun,
+    PersonaRunResponse,
+    Scenario,
+    ScenarioResponse,
+)
+from src.routers import persona_runs as persona_runs_router
+from src.routers import scenarios as scenarios_router
+
+
+@pytest.fixture
+def runs(test_db):
+    test_db.add(Scenario(id="scenario-1", name="Test", website_url="https://example.com", tasks=[]))
+    start = datetime(2025, 1, 1)
+    # Two runs share each timestamp, so ids break the ties
+    for i in range(7):
+        test_db.add(PersonaRun(
+            id=f"run-{i}", config_id="scenario-1", report_id="report-1", persona_type="SHOPPER",
+            is_done=True, timestamp=start + timedelta(minutes=i // 2), final_result="",
+            task_description="", task_goal="", task_steps="", task_url="", events=[],
+        ))
+    test_db.commit()
+    return sorted(test_db.query(PersonaRun).all(), key=lambda run: (run.timestamp, run.id), reverse=True)
+
+
+def test_cursor_pages_cover_every_run_once_newest_first(test_db, runs):
+    pages = []
+    cursor = None
+    while True:
+        page = persona_runs.list_persona_runs(test_db, config_id="scenario-1", limit=3, cursor=cursor)
+        if not page:
+            break
+        pages.append([run.id for run in page])
+        cursor = persona_runs.run_cursor(page[-1])
+
+    assert pages == [["run-6", "run-5", "run-4"], ["run-3", "run-2", "run-1"], ["run-0"]]
+    assert [run_id for page in pages for run_id in page] == [run.id for run in runs]
+
+
+def test_route_sets_next_cursor_only_for_full_pages(test_db, runs):
+    def list_runs(**kwargs):
+        response = Response()
+        params = {
+            "config_id": None, "persona_type": None, "report_id": None, "status": None,
+            "platform": None, "offset": 0, "cursor": None, "fields": None,
+        }
+        params.update(kwargs)
+        return persona_runs_router.list_persona_runs(response=response, db=test_db, **params), response.headers
+
+    page, headers = list_runs(limit=5)
+    assert headers["X-Next-Cursor"] == persona_runs.run_cursor(page[-1])
+
+    rest, headers = list_runs(limit=5, cursor=headers["X-Next-Cursor"])
+    assert [run.id for run in page + rest] == [run.id for run in runs]
+    assert "X-Next-Cursor" not in headers
+
+    with pytest.raises(HTTPException) as error:
+        list_runs(limit=5, cursor="not a cursor")
+    assert error.value.status_code == 400
+
+
+def _statements(test_db):
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_summary_listing_never_reads_heavy_columns(test_db, runs):
+    test_db.expunge_all()
+    statements = _statements(test_db)
+
+    response = persona_runs_router.list_persona_runs(
+        config_id=None, persona_type=None, report_id=None, status=None, platform=None,
+        limit=5, offset=0, cursor=None, fields="summary", response=Response(), db=test_db,
+    )
+
+    page = json.loads(response.body)
+    assert [list(run) for run in page] == [PERSONA_RUN_SUMMARY_FIELDS] * 5
+    assert response.headers["X-Next-Cursor"] == persona_runs.run_cursor(runs[4])
+    assert not any("persona_runs.events" in statement or "judgement_data" in statement for statement in statements)
+
+
+def test_explicit_fields_and_unknown_fields(test_db, runs):
+    response = scenarios_router.list_scenarios(fields="name,website_url", db=test_db)
+    assert json.loads(response.body) == [{"id": "scenario-1", "name": "Test", "website_url": "https://example.com"}]
+
+    with pytest.raises(HTTPException) as error:
+        scenarios_router.list_scenarios(fields="name,password", db=test_db)
+    assert error.value.status_code == 400
+
+
+def test_routes_without_fields_keep_the_full_response_models():
+    runs_route = persona_runs_router.router.routes[0]
+    assert get_args(runs_route.response_model) == (PersonaRunResponse,)
+    assert not runs_route.response_model_exclude_unset
+    assert get_args(scenarios_router.router.routes[0].response_model) == (ScenarioResponse,)
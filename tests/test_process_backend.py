@@ -0,0 +1,103 @@
+"""Tests for the process-pool execution backend, without spawning worker processes."""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.handlers import process_backend
+
+
+def _system_config():
+    config = MagicMock()
+    config.max_browser_workers = 1
+    return config
+
+
+async def _run(executor, **kwargs):
+    with patch.object(process_backend, "_get_executor", return_value=executor), \
+            patch.object(process_backend, "_ensure_progress_pump"):
+        return await process_backend.run_task_in_process(
+            "scenario-1", "report-1", "run-1", {}, 0, _system_config(), on_progress=MagicMock(), **kwargs
+        )
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_caller_flags_the_worker_task():
+    started = threading.Event()
+    release = threading.Event()
+
+    def run_task(payload):
+        started.set()
+        release.wait(5)
+
+    with ThreadPoolExecutor(max_workers=1) as executor, \
+            patch.object(process_backend, "_run_task", run_task), \
+            patch.object(process_backend, "_cancel_flags", {}) as flags:
+        caller = asyncio.create_task(_run(executor))
+        await asyncio.to_thread(started.wait, 5)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        release.set()
+
+    assert flags == {"run-1:0": True}
+
+
+@pytest.mark.asyncio
+async def test_worker_stops_its_agent_once_flagged():
+    agent = asyncio.create_task(asyncio.sleep(10))
+    flags = {}
+
+    with patch.object(process_backend, "_worker_cancel_flags", flags), \
+            patch.object(process_backend, "CANCEL_POLL_INTERVAL", 0.01):
+        watcher = asyncio.create_task(process_backend._watch_cancel_flag("run-1:0", agent))
+        await asyncio.sleep(0.03)
+        assert not agent.done()
+        flags["run-1:0"] = True
+        await asyncio.wait_for(watcher, 1)
+
+    with pytest.raises(asyncio.CancelledError):
+        await agent
+
+
+@pytest.mark.asyncio
+async def test_worker_progress_is_relayed_to_the_tracker():
+    progress = queue.Queue()
+    received = asyncio.Event()
+    on_progress = MagicMock(side_effect=lambda *item: received.set())
+
+    with patch.object(process_backend, "_progress_queue", progress):
+        pump = asyncio.create_task(process_backend._pump_progress(on_progress))
+        progress.put(("run-1", 0, 3, "click", "https://example.com"))
+        await asyncio.wait_for(received.wait(), 2)
+        pump.cancel()
+
+    on_progress.assert_called_once_with("run-1", 0, 3, "click", "https://example.com")
+
+
+@pytest.mark.asyncio
+async def test_crashed_pool_is_replaced_for_the_next_task():
+    def run_task(payload):
+        raise BrokenProcessPool("worker died")
+
+    with ThreadPoolExecutor(max_workers=1) as executor, \
+            patch.object(process_backend, "_run_task", run_task), \
+            patch.object(process_backend, "_executor", executor):
+        with pytest.raises(RuntimeError, match="crashed"):
+            await _run(executor)
+        assert process_backend._executor is None
+
+
+def test_worker_init_takes_its_share_of_the_llm_rate_limits():
+    with patch.object(process_backend.mp_util, "Finalize"), \
+            patch("src.common.llm_rate_limiter.set_process_share") as set_share, \
+            patch.object(process_backend.asyncio, "set_event_loop"):
+        process_backend._init_worker(queue.Queue(), {}, 4)
+    process_backend._worker_loop.close()
+
+    set_share.assert_called_once_with(4)
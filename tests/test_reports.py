@@ -0,0 +1,424 @@
+"""Tests for report aggregation."""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.common.lru_cache import LRUCache
+from src.common.single_flight import SingleFlight
+from src.database import Base, retry_on_lock
+from src.handlers import (
+    persona_run_events,
+    persona_runs,
+    report_aggregates,
+    reports,
+    scenarios,
+    url_dictionary,
+)
+from src.models import (
+    PersonaRun,
+    PersonaRunCreate,
+    ReportFriction,
+    ReportSegment,
+    Scenario,
+    Url,
+)
+from tests import report_reference
+from tests.bench_remove_back_edges import remove_back_edges_dfs
+
+
+def _add_run(db, run_id, is_done, verdict=None, duration=None, steps=0, persona="SHOPPER"):
+    db.add(PersonaRun(
+        id=run_id,
+        config_id="scenario-1",
+        report_id="report-1",
+        persona_type=persona,
+        is_done=is_done,
+        timestamp=datetime.now(),
+        duration_seconds=duration,
+        steps_completed=steps,
+        final_result="",
+        judgement_data={} if verdict is None else {"verdict": verdict},
+        task_description="Buy a thing",
+        task_goal="Buy a thing",
+        task_steps="Click around",
+        task_url="https://example.com",
+        events=[],
+    ))
+
+
+@pytest.fixture
+def report(test_db):
+    test_db.add(Scenario(id="scenario-1", name="Test", website_url="https://example.com", tasks=[]))
+    _add_run(test_db, "success-1", True, verdict=True, duration=10, steps=4)
+    _add_run(test_db, "success-2", True, verdict=True, duration=30, steps=8, persona="ADMIN")
+    _add_run(test_db, "failed-1", True, verdict=False, duration=20, steps=6)
+    _add_run(test_db, "error-1", False, steps=2)
+    test_db.commit()
+
+
+def test_metrics_summary_from_segments(test_db, report):
+    report_aggregates.backfill_report_aggregates(test_db)
+
+    metrics = reports.get_report_aggregate(test_db, "report-1")["metrics_summary"]
+
+    assert metrics["total_runs"] == 4
+    assert metrics["sucessfull_runs"] == 2
+    assert metrics["failed_runs"] == 1
+    assert metrics["error_runs"] == 1
+    assert metrics["success_rate"] == 0.5
+    assert metrics["avg_duration_seconds"] == 20.0
+    assert metrics["min_duration_seconds"] == 10.0
+    assert metrics["max_duration_seconds"] == 30.0
+    assert metrics["avg_steps"] == 5.0
+    assert metrics["max_steps"] == 8
+
+
+def test_metrics_summary_counts_match_status_filters(test_db, report):
+    report_aggregates.backfill_report_aggregates(test_db)
+    filters = {"persona_type": "SHOPPER"}
+    metrics = reports.get_report_aggregate(test_db, "report-1", filters=filters)["metrics_summary"]
+
+    for status, key in [("success", "sucessfull_runs"), ("failed", "failed_runs"), ("error", "error_runs")]:
+        runs = reports.get_report_runs(test_db, "report-1", filters={**filters, "status": status})
+        assert metrics[key] == len(runs)
+    assert metrics["total_runs"] == 3
+
+
+@pytest.fixture
+def journeys(test_db, report):
+    for run_id, urls in [
+        ("success-1", ["https://example.com", "https://example.com/cart", "https://example.com/checkout"]),
+        ("failed-1", ["https://example.com", "https://example.com/cart", "https://example.com"]),
+        ("error-1", ["https://example.com/cart"]),
+    ]:
+        run = test_db.get(PersonaRun, run_id)
+        run.events = [{"step": i + 1, "url": url} for i, url in enumerate(urls)]
+    test_db.commit()
+    # Runs stored before persona_run_events held every run's steps
+    assert persona_run_events.backfill_run_events(test_db) == 3
+
+
+@pytest.mark.parametrize("filters", [None, {"persona_type": "SHOPPER"}, {"status": "failed"}, {"platform": "mobile"}])
+@pytest.mark.parametrize("mode", ["compact", "full"])
+def test_materialized_aggregate_matches_scan(test_db, journeys, filters, mode):
+    assert report_aggregates.backfill_report_aggregates(test_db) == 4
+
+    # Later runs update the tables incrementally as they are inserted
+    persona_runs.insert_persona_runs(test_db, [
+        PersonaRunCreate(
+            config_id="scenario-1", report_id="report-1", persona_type="SHOPPER", timestamp=datetime.now(),
+            is_done=True, duration_seconds=40, steps_completed=3, judgement_data={"verdict": False},
+            final_result="", task_description="", task_goal="", task_steps="", task_url="",
+            events=[{"url": "https://example.com"}, {"url": "https://example.com/cart/"}, {"url": "https://example.com"}],
+        )
+        for _ in range(2)
+    ])
+
+    expected = report_reference.scan_report_aggregate(test_db, "report-1", sankey_mode=mode, filters=filters)
+    assert reports.get_report_aggregate(test_db, "report-1", sankey_mode=mode, filters=filters) == expected
+    assert reports.get_friction_hotspots(test_db, report_id="report-1") == report_reference.scan_friction_hotspots(test_db, report_id="report-1")
+
+
+def test_aggregate_of_unknown_report_is_none(test_db, report):
+    report_aggregates.backfill_report_aggregates(test_db)
+    assert reports.get_report_aggregate(test_db, "missing") is None
+
+
+def test_aggregate_is_cached_until_a_run_lands(test_db, journeys):
+    report_aggregates.backfill_report_aggregates(test_db)
+    first = reports.get_report_aggregate(test_db, "report-1")
+
+    with patch("src.handlers.reports._read_report_aggregate") as read:
+        assert reports.get_report_aggregate(test_db, "report-1") is first
+        # Unset and "all" filters share the unfiltered entry
+        assert reports.get_report_aggregate(test_db, "report-1", filters={"persona_type": "all"}) is first
+        read.assert_not_called()
+
+    persona_runs.insert_persona_runs(test_db, [PersonaRunCreate(
+        config_id="scenario-1", report_id="report-1", persona_type="SHOPPER", timestamp=datetime.now(),
+        is_done=False, final_result="", task_description="", task_goal="", task_steps="", task_url="",
+    )])
+
+    assert reports.get_report_aggregate(test_db, "report-1")["run_count"] == first["run_count"] + 1
+
+
+def test_cache_is_invalidated_when_a_scenario_is_deleted_and_refilled(test_db):
+    test_db.add(Scenario(id="scenario-1", name="Test", website_url="https://example.com", tasks=[]))
+    _add_run(test_db, "success-1", True, verdict=True, duration=10)
+    test_db.commit()
+    report_aggregates.backfill_report_aggregates(test_db)
+    assert reports.get_report_aggregate(test_db, "report-1")["metrics_summary"]["avg_duration_seconds"] == 10.0
+
+    # Same segment count and run count as before, so only a monotonic version tells them apart
+    scenarios.delete_scenario(test_db, "scenario-1")
+    test_db.add(Scenario(id="scenario-1", name="Test", website_url="https://example.com", tasks=[]))
+    test_db.commit()
+    persona_runs.insert_persona_runs(test_db, [PersonaRunCreate(
+        config_id="scenario-1", report_id="report-1", persona_type="SHOPPER", timestamp=datetime.now(),
+        is_done=True, duration_seconds=50, steps_completed=0, judgement_data={"verdict": True},
+        final_result="", task_description="", task_goal="", task_steps="", task_url="",
+    )])
+
+    assert reports.get_report_aggregate(test_db, "report-1")["metrics_summary"]["avg_duration_seconds"] == 50.0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1, "A")
+    cache.put("b", 1, "B")
+    cache.get("a", 1)
+    cache.put("c", 1, "C")
+
+    assert cache.get("a", 1) == (True, "A")
+    assert cache.get("b", 1) == (False, None)
+    assert cache.get("a", 2) == (False, None)
+
+
+def test_identical_concurrent_calls_share_one_computation():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"nodes": []}
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        leader = pool.submit(flights.do, "report-1", compute)
+        started.wait(5)
+        followers = [pool.submit(flights.do, "report-1", compute) for _ in range(2)]
+        while flights._calls["report-1"].waiters < 2:
+            time.sleep(0.01)
+        release.set()
+        results = [leader.result()] + [follower.result() for follower in followers]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert "report-1" not in flights._calls
+
+
+def test_inserted_runs_get_indexed_step_rows(test_db, report):
+    run_id = persona_runs.insert_persona_runs(test_db, [PersonaRunCreate(
+        config_id="scenario-1", report_id="report-1", persona_type="SHOPPER", timestamp=datetime.now(),
+        final_result="", task_description="", task_goal="", task_steps="", task_url="",
+        events=[{"url": "https://example.com"}, {"type": "done"}, {"url": "https://example.com/cart/"}, {"url": ""}],
+    )])[0].id
+
+    assert persona_run_events.get_url_steps(test_db, [run_id])[run_id] == [
+        {"step": 1, "url": "https://example.com"},
+        {"step": 2, "url": None},
+        {"step": 3, "url": "https://example.com/cart/"},
+        {"step": 4, "url": ""},
+    ]
+
+
+def test_urls_are_interned_once_and_shared_after_commit(test_db):
+    ids = url_dictionary.intern_urls(test_db, {"https://example.com", "https://example.com/cart"})
+    assert url_dictionary._dictionary._ids == {}  # Not committed yet
+    assert url_dictionary.intern_urls(test_db, ["https://example.com/cart"]) == {"https://example.com/cart": ids["https://example.com/cart"]}
+    test_db.commit()
+
+    assert test_db.query(Url).count() == 2
+    assert url_dictionary.resolve_urls(test_db, ids.values()) == {v: k for k, v in ids.items()}
+    url_dictionary._dictionary.clear()
+    assert url_dictionary.resolve_urls(test_db, [ids["https://example.com"]]) == {ids["https://example.com"]: "https://example.com"}
+
+
+def test_url_interned_concurrently_elsewhere_gets_the_committed_id(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usefly.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    committed = {}
+
+    def insert_from_another_session(conn, cursor, statement, *args):
+        # Right after the lookup misses, another writer commits the same new URL
+        if statement.startswith("SELECT") and "FROM urls" in statement and not committed:
+            committed["url"] = None
+            with session_factory() as other:
+                row = Url(url="https://example.com/new")
+                other.add(row)
+                other.commit()
+                committed["url"] = row.id
+
+    event.listen(engine, "after_cursor_execute", insert_from_another_session)
+    with session_factory() as db:
+        ids = url_dictionary.intern_urls(db, {"https://example.com/new"})
+        db.commit()
+
+    assert ids == {"https://example.com/new": committed["url"]}
+    engine.dispose()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_remove_back_edges_matches_per_edge_dfs(seed):
+    rng = random.Random(seed)
+    urls = [f"/page/{i}" for i in range(rng.randint(2, 40))]
+    # Small count range so ties (kept in insertion order) are common; self loops included
+    transitions = {(rng.choice(urls), rng.choice(urls)): rng.randint(1, 5) for _ in range(rng.randint(1, 200))}
+
+    acyclic = reports.remove_back_edges(transitions)
+
+    assert acyclic == remove_back_edges_dfs(transitions)
+    assert list(acyclic) == list(remove_back_edges_dfs(transitions))
+
+
+def test_prune_sankey_folds_tail_into_other_without_cycles():
+    sankey = {
+        "nodes": [{"name": name, "visits": visits, "event_count": visits} for name, visits in
+                  [("/a", 10), ("/b", 8), ("/c", 3), ("/d", 2), ("/e", 1)]],
+        # /c and /d fold together: c->d disappears, a->c + a->d merge, d->a closes a cycle with a->Other
+        "links": [{"source": s, "target": t, "value": v} for s, t, v in
+                  [(0, 1, 6), (0, 2, 2), (0, 3, 1), (2, 3, 1), (3, 0, 1), (1, 4, 1)]],
+    }
+    original = repr(sankey)
+
+    pruned = reports.prune_sankey(sankey, top_k=2)
+
+    assert [node["name"] for node in pruned["nodes"]] == ["/a", "/b", "Other"]
+    assert pruned["nodes"][2] == {"name": "Other", "visits": 6, "event_count": 6, "other_count": 3}
+    assert pruned["links"] == [
+        {"source": 0, "target": 1, "value": 6},
+        {"source": 0, "target": 2, "value": 3},
+        {"source": 1, "target": 2, "value": 1},
+    ]
+    assert repr(sankey) == original
+    assert reports.prune_sankey(sankey, top_k=2, min_link_value=2)["links"] == pruned["links"][:2]
+    assert reports.prune_sankey(sankey, top_k=2, other=False) == {
+        "nodes": sankey["nodes"][:2], "links": [{"source": 0, "target": 1, "value": 6}],
+    }
+
+
+def test_pruned_full_sankey_has_an_other_node_per_step(test_db, journeys):
+    report_aggregates.backfill_report_aggregates(test_db)
+    full = reports.get_report_aggregate(test_db, "report-1", sankey_mode="full")
+
+    pruned = reports.get_report_aggregate(test_db, "report-1", sankey_mode="full", top_k=2)
+
+    other_steps = [node["step"] for node in pruned["journey_sankey"]["nodes"] if node["name"] == "Other"]
+    assert len(other_steps) == len(set(other_steps)) > 0
+    assert sum(node["visits"] for node in pruned["journey_sankey"]["nodes"]) == sum(node["visits"] for node in full["journey_sankey"]["nodes"])
+    # The cached full graph is untouched
+    assert reports.get_report_aggregate(test_db, "report-1", sankey_mode="full") is full
+
+
+def test_aggregates_are_rebuilt_when_url_rules_change(test_db, journeys):
+    run_count = test_db.query(PersonaRun).count()
+    assert report_aggregates.backfill_report_aggregates(test_db) == run_count
+    assert report_aggregates.backfill_report_aggregates(test_db) == 0
+
+    with patch("src.handlers.report_aggregates.rules_fingerprint", return_value="other rules"):
+        assert report_aggregates.backfill_report_aggregates(test_db) == run_count
+
+    reports._report_cache.clear()
+    expected = report_reference.scan_report_aggregate(test_db, "report-1")
+    assert reports.get_report_aggregate(test_db, "report-1") == expected
+
+
+REPORTS = {"scenario-a": ["report-a1", "report-a2"], "scenario-b": ["report-b1"]}
+
+
+def _random_run(rng, config_id):
+    pages = ["https://example.com", "https://example.com/cart/", "https://example.com/item/1", "https://example.com/item/2"]
+    return PersonaRunCreate(
+        config_id=config_id, report_id=rng.choice(REPORTS[config_id]), persona_type=rng.choice(["SHOPPER", "BROWSER"]),
+        platform=rng.choice(["web", "mobile"]), timestamp=datetime.now(), is_done=rng.random() < 0.8,
+        duration_seconds=rng.choice([None, rng.randint(1, 90)]), steps_completed=rng.randint(0, 6),
+        judgement_data=rng.choice([{}, {"verdict": True}, {"verdict": False, "failure_reason": "Stuck"}]),
+        error_type=rng.choice([None, None, "timeout"]), final_result="", task_description="", task_goal="",
+        task_steps="", task_url="", events=[{"url": rng.choice(pages)} for _ in range(rng.randint(0, 5))],
+    )
+
+
+def _assert_aggregates_match_scan(db):
+    for config_id, report_ids in REPORTS.items():
+        for scope in [{"config_id": config_id}] + [{"report_id": report_id} for report_id in report_ids]:
+            for mode in ("compact", "full"):
+                for filters in (None, {"status": "failed"}):
+                    expected = report_reference.scan_report_aggregate(db, **scope, sankey_mode=mode, filters=filters)
+                    assert reports.get_report_aggregate(db, **scope, sankey_mode=mode, filters=filters) == expected
+            assert reports.get_friction_hotspots(db, **scope) == report_reference.scan_friction_hotspots(db, **scope)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_aggregates_match_scan_through_inserts_deletes_and_reinserts(test_db, seed):
+    rng = random.Random(seed)
+    for config_id in REPORTS:
+        test_db.add(Scenario(id=config_id, name=config_id, website_url="https://example.com", tasks=[]))
+    test_db.commit()
+    report_aggregates.backfill_report_aggregates(test_db)
+
+    runs = {config_id: [] for config_id in REPORTS}
+    for _ in range(3):
+        for config_id in REPORTS:
+            batch = [_random_run(rng, config_id) for _ in range(rng.randint(1, 4))]
+            persona_runs.insert_persona_runs(test_db, batch)
+            runs[config_id] += batch
+        _assert_aggregates_match_scan(test_db)
+
+    # Deleting a scenario removes its share; re-applying its runs brings it back
+    deleted = rng.choice(list(REPORTS))
+    scenarios.delete_scenario(test_db, deleted)
+    _assert_aggregates_match_scan(test_db)
+
+    test_db.add(Scenario(id=deleted, name=deleted, website_url="https://example.com", tasks=[]))
+    test_db.commit()
+    for run in runs[deleted]:
+        persona_runs.insert_persona_runs(test_db, [run])
+    _assert_aggregates_match_scan(test_db)
+
+
+def test_rebuild_repairs_drifted_aggregates(test_db):
+    rng = random.Random(0)
+    for config_id in REPORTS:
+        test_db.add(Scenario(id=config_id, name=config_id, website_url="https://example.com", tasks=[]))
+    test_db.commit()
+    report_aggregates.backfill_report_aggregates(test_db)
+    persona_runs.insert_persona_runs(test_db, [_random_run(rng, config_id) for config_id in REPORTS for _ in range(5)])
+    reports.get_report_aggregate(test_db, report_id="report-b1")
+
+    test_db.query(ReportSegment).update({ReportSegment.run_count: ReportSegment.run_count + 1})
+    test_db.commit()
+    assert reports.get_report_aggregate(test_db, report_id="report-a1") != report_reference.scan_report_aggregate(test_db, report_id="report-a1")
+    # Same rules, so a plain backfill leaves the drift alone
+    assert report_aggregates.backfill_report_aggregates(test_db) == 0
+
+    assert report_aggregates.backfill_report_aggregates(test_db, rebuild=True) == 10
+    _assert_aggregates_match_scan(test_db)
+
+
+def test_concurrent_writers_do_not_lose_aggregate_counts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usefly.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add(Scenario(id="scenario-1", name="Test", website_url="https://example.com", tasks=[]))
+        db.commit()
+
+    def write_runs(_):
+        with session_factory() as db:
+            for _ in range(10):
+                retry_on_lock(db, persona_runs.insert_persona_runs, [PersonaRunCreate(
+                    config_id="scenario-1", report_id="report-1", persona_type="SHOPPER", timestamp=datetime.now(),
+                    is_done=True, duration_seconds=5, steps_completed=1, judgement_data={"verdict": False},
+                    final_result="", task_description="", task_goal="", task_steps="", task_url="", events=[],
+                )])
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(write_runs, range(4)))
+
+    with session_factory() as db:
+        assert db.query(ReportSegment.run_count).scalar() == 40
+        assert db.query(ReportFriction.count).scalar() == 40
+        assert len(db.query(ReportFriction.example_run_ids).scalar()) == report_aggregates.FRICTION_EXAMPLES
+    engine.dispose()
@@ -0,0 +1,135 @@
+"""Tests for the batched PersonaRun writer."""
+
+import asyncio
+import threading
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.handlers import persona_run_events, persona_runs
+from src.handlers.run_writer import PersonaRunWriter
+from src.models import (
+    PersonaRun,
+    PersonaRunCreate,
+    PersonaRunEvent,
+    ReportSegment,
+    ReportVersion,
+    Scenario,
+)
+
+
+def _run_data(**overrides) -> PersonaRunCreate:
+    data = {
+        "config_id": "scenario-1",
+        "report_id": "report-1",
+        "persona_type": "SHOPPER",
+        "timestamp": datetime.now(),
+        "final_result": "Done",
+        "task_description": "Buy a thing",
+        "task_goal": "Buy a thing",
+        "task_steps": "Click around",
+        "task_url": "https://example.com",
+    }
+    data.update(overrides)
+    return PersonaRunCreate(**data)
+
+
+@pytest.fixture
+def scenario(test_db):
+    test_db.add(Scenario(id="scenario-1", name="Test", website_url="https://example.com", tasks=[]))
+    test_db.commit()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_results_are_written_in_one_transaction(test_db, scenario):
+    writer = PersonaRunWriter(MagicMock(return_value=test_db))
+    written = []
+
+    with patch("src.handlers.run_writer.insert_persona_runs", wraps=persona_runs.insert_persona_runs) as insert:
+        ids = await asyncio.gather(*(writer.submit(_run_data(), written.append) for _ in range(10)))
+        await writer.flush()
+
+    assert insert.call_count == 1
+    assert sorted(written) == sorted(ids)
+    assert test_db.query(PersonaRun).count() == 10
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_bad_row_does_not_sink_the_batch(test_db, scenario):
+    writer = PersonaRunWriter(MagicMock(return_value=test_db))
+    written = []
+
+    good = _run_data()
+    bad = _run_data(id="dup")
+    test_db.add(PersonaRun(**{**_run_data().model_dump(exclude={"id"}), "id": "dup"}))
+    test_db.commit()
+
+    good_id = await writer.submit(good, written.append)
+    await writer.submit(bad, written.append)
+    await writer.flush()
+
+    assert written == [good_id, None]
+    assert test_db.query(PersonaRun).count() == 2
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_submit_waits_when_the_queue_is_full(test_db, scenario):
+    writer = PersonaRunWriter(MagicMock(return_value=test_db), queue_size=1)
+    # Stand-in for a writer stuck behind a slow commit
+    writer._task = asyncio.create_task(asyncio.sleep(3600))
+
+    await writer.submit(_run_data())
+    second = asyncio.create_task(writer.submit(_run_data()))
+    await asyncio.sleep(0.01)
+    assert not second.done()
+
+    writer._task.cancel()
+    writer._task = asyncio.create_task(writer._run())
+    await second
+    await writer.flush()
+
+    assert test_db.query(PersonaRun).count() == 2
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_batches_are_written_off_the_event_loop(test_db, scenario):
+    writer = PersonaRunWriter(MagicMock(return_value=test_db))
+    write_threads = []
+    callback_threads = []
+
+    def insert(db, runs):
+        write_threads.append(threading.get_ident())
+        return persona_runs.insert_persona_runs(db, runs)
+
+    with patch("src.handlers.run_writer.insert_persona_runs", insert):
+        await writer.submit(_run_data(), lambda _: callback_threads.append(threading.get_ident()))
+        await writer.flush()
+
+    assert threading.get_ident() not in write_threads
+    assert callback_threads == [threading.get_ident()]
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_results_of_deleted_scenarios_are_dropped(test_db, scenario):
+    writer = PersonaRunWriter(MagicMock(return_value=test_db))
+    written = []
+
+    # The agent streamed a step before its scenario was deleted
+    test_db.add_all(persona_run_events.build_event_rows("orphan", [{"url": "https://example.com"}], datetime.now()))
+    test_db.commit()
+
+    kept_id = await writer.submit(_run_data(), written.append)
+    await writer.submit(_run_data(id="orphan", config_id="deleted-scenario", report_id="report-2"), written.append)
+    await writer.flush()
+
+    assert written == [kept_id, None]
+    assert [run.id for run in test_db.query(PersonaRun)] == [kept_id]
+    assert test_db.query(PersonaRunEvent).filter(PersonaRunEvent.persona_run_id == "orphan").count() == 0
+    assert {segment.report_id for segment in test_db.query(ReportSegment)} == {"report-1"}
+    assert not any("report-2" in version.scope for version in test_db.query(ReportVersion))
+    await writer.close()
@@ -0,0 +1,160 @@
+"""Tests for the DB-backed task queue used by `usefly worker`."""
+
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import event
+
+from src.handlers import task_queue
+from src.handlers.run_writer import PersonaRunWriter
+from src.models import PersonaRun, PersonaRunCreate, Scenario, TaskJob
+
+
+def _enqueue(test_db, task_count: int = 2) -> Scenario:
+    scenario = Scenario(id="scenario-1", name="Queue Scenario", website_url="https://example.com")
+    test_db.add(scenario)
+    test_db.commit()
+    tasks = [{"persona": "SHOPPER", "starting_url": "https://example.com", "goal": "g", "steps": "s"} for _ in range(task_count)]
+    task_queue.enqueue_run_tasks(test_db, scenario, tasks, report_id="report-1", run_id="run-1")
+    return scenario
+
+
+def test_jobs_are_leased_once(test_db):
+    _enqueue(test_db, task_count=2)
+
+    first = task_queue.lease_next_task(test_db, "worker-a")
+    second = task_queue.lease_next_task(test_db, "worker-b")
+
+    assert first.id != second.id
+    assert task_queue.lease_next_task(test_db, "worker-c") is None
+
+
+def test_expired_lease_is_taken_over(test_db):
+    _enqueue(test_db, task_count=1)
+    job = task_queue.lease_next_task(test_db, "worker-a")
+
+    test_db.query(TaskJob).filter(TaskJob.id == job.id).update(
+        {TaskJob.lease_expires_at: task_queue._utcnow() - timedelta(seconds=1)}
+    )
+    test_db.commit()
+
+    retaken = task_queue.lease_next_task(test_db, "worker-b")
+    assert retaken.id == job.id
+    assert retaken.attempts == 2
+    # The original worker lost ownership and must stop
+    assert task_queue.renew_lease(test_db, job.id, "worker-a") is False
+    assert task_queue.renew_lease(test_db, job.id, "worker-b", current_step=3) is True
+
+
+def test_queued_run_status(test_db):
+    _enqueue(test_db, task_count=2)
+    job = task_queue.lease_next_task(test_db, "worker-a")
+    task_queue.complete_task(test_db, job.id, "worker-a", persona_run_id="persona-run-1")
+
+    status = task_queue.get_queued_run_status(test_db, "run-1")
+    assert status["status"] == "in_progress"
+    assert status["completed_tasks"] == 1
+    assert status["agent_run_ids"] == ["persona-run-1"]
+    assert [t["status"] for t in status["task_progress"]] == ["completed", "pending"]
+
+
+def test_exhausted_job_of_deleted_scenario_is_skipped(test_db):
+    from src import worker
+
+    _enqueue(test_db, task_count=1)
+    test_db.query(TaskJob).update({
+        TaskJob.status: "leased",
+        TaskJob.attempts: task_queue.MAX_ATTEMPTS,
+        TaskJob.lease_expires_at: task_queue._utcnow() - timedelta(seconds=1),
+    })
+    test_db.query(Scenario).delete()
+    test_db.commit()
+
+    with patch.object(worker, "SessionLocal", MagicMock(return_value=test_db)):
+        worker._record_exhausted_jobs()
+
+    job = test_db.query(TaskJob).one()
+    assert job.status == "failed"
+    assert job.persona_run_id is None
+
+
+@pytest.mark.asyncio
+async def test_cancel_route_cancels_worker_run(test_db):
+    from src.routers import persona_runner as persona_runner_router
+
+    _enqueue(test_db, task_count=2)
+
+    status = await persona_runner_router.cancel_run("run-1", test_db)
+
+    assert status.status == "cancelled"
+    assert {job.status for job in test_db.query(TaskJob)} == {"cancelled"}
+
+
+@pytest.mark.asyncio
+async def test_worker_drops_the_result_of_a_scenario_deleted_mid_job(test_db):
+    from src import worker
+
+    _enqueue(test_db, task_count=1)
+    job = task_queue.lease_next_task(test_db, "worker-a")
+    test_db.expunge(job)
+    result = PersonaRunCreate(
+        config_id="scenario-1", report_id="report-1", persona_type="SHOPPER", timestamp=datetime.now(),
+        final_result="Done", task_description="", task_goal="", task_steps="", task_url="",
+    )
+    # The scenario goes away while the agent runs
+    test_db.query(Scenario).delete()
+    test_db.commit()
+
+    factory = MagicMock(return_value=test_db)
+    writer = PersonaRunWriter(factory)
+    pool = MagicMock(acquire=AsyncMock(side_effect=RuntimeError("no browsers")))
+    with patch.object(worker, "SessionLocal", factory), \
+            patch.object(worker, "get_browser_pool", AsyncMock(return_value=pool)), \
+            patch.object(worker, "run_task_agent", AsyncMock(return_value=result)), \
+            patch.object(worker, "get_run_writer", return_value=writer):
+        await worker._run_job(job, "worker-a", 30, MagicMock(), 1)
+        await writer.flush()
+    await writer.close()
+
+    assert test_db.query(PersonaRun).count() == 0
+    job = test_db.query(TaskJob).one()
+    assert job.status == "failed"
+    assert job.persona_run_id is None
+
+
+@pytest.mark.asyncio
+async def test_start_route_reads_and_enqueues_off_the_event_loop(test_db, mock_system_config):
+    from src.handlers import persona_runner
+    from src.routers import persona_runner as persona_runner_router
+
+    test_db.add(Scenario(
+        id="scenario-1", name="Queue Scenario", website_url="https://example.com",
+        tasks=[{"persona": "SHOPPER", "starting_url": "https://example.com", "goal": "g", "steps": "s"}],
+        selected_task_indices=[0],
+    ))
+    test_db.commit()
+    statement_threads = set()
+    event.listen(test_db.get_bind(), "before_cursor_execute", lambda *args: statement_threads.add(threading.get_ident()))
+
+    with patch.object(persona_runner, "EXECUTION_BACKEND", "queue"), \
+            patch.object(persona_runner_router, "SessionLocal", MagicMock(return_value=test_db)):
+        response = await persona_runner_router.run_persona("scenario-1", "interactive", test_db)
+
+    assert statement_threads and threading.get_ident() not in statement_threads
+    assert [job.run_id for job in test_db.query(TaskJob)] == [response.run_id]
+
+
+def test_deleting_a_scenario_removes_its_jobs(test_db):
+    from src.handlers import scenarios
+
+    _enqueue(test_db, task_count=2)
+    job_id = task_queue.lease_next_task(test_db, "worker-a").id
+
+    assert scenarios.delete_scenario(test_db, "scenario-1")
+
+    assert test_db.query(TaskJob).count() == 0
+    assert task_queue.lease_next_task(test_db, "worker-b") is None
+    # The worker running the leased job stops at its next renewal
+    assert task_queue.renew_lease(test_db, job_id, "worker-a") is False
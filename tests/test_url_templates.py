@@ -0,0 +1,36 @@
+"""Tests for mapping journey URLs to route templates."""
+
+import pytest
+
+from src.handlers.url_templates import UrlTemplater
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://shop.com/product/123/", "https://shop.com/product/{id}"),
+    ("https://shop.com/orders/3f2b8c1e-9a4d-4e2f-8b1a-0c9d8e7f6a5b/items", "https://shop.com/orders/{id}/items"),
+    ("https://shop.com/dp/B07XJ8C8F5", "https://shop.com/dp/{id}"),
+    ("https://shop.com/commit/9fceb02d0ae598e95dc970b74767f19372d61af8", "https://shop.com/commit/{id}"),
+    ("https://shop.com/about-us/careers", "https://shop.com/about-us/careers"),
+    ("https://shop.com/cart?utm_source=mail&fbclid=x&step=2", "https://shop.com/cart?step=2"),
+    ("https://shop.com/cart?utm_source=mail", "https://shop.com/cart"),
+    ("https://shop.com", "https://shop.com"),
+])
+def test_auto_detected_templates(url, expected):
+    templater = UrlTemplater(ignore_params=["utm_*", "fbclid"])
+    assert templater.apply(url) == expected
+
+
+def test_configured_templates_take_precedence():
+    templater = UrlTemplater(templates=["/p/{slug}", "/users/{user}/orders/{order}/"], auto_detect=False)
+
+    assert templater.apply("https://shop.com/p/blue-shirt") == "https://shop.com/p/{slug}"
+    assert templater.apply("https://shop.com/users/ann/orders/77") == "https://shop.com/users/{user}/orders/{order}"
+    # Templates match whole paths; without auto-detection other URLs are kept
+    assert templater.apply("https://shop.com/p/blue-shirt/reviews") == "https://shop.com/p/blue-shirt/reviews"
+    assert templater.apply("https://shop.com/product/123") == "https://shop.com/product/123"
+
+
+def test_fingerprint_changes_with_rules():
+    assert UrlTemplater().fingerprint() == UrlTemplater().fingerprint()
+    assert UrlTemplater().fingerprint() != UrlTemplater(auto_detect=False).fingerprint()
+    assert UrlTemplater().fingerprint() != UrlTemplater(templates=["/p/{slug}"]).fingerprint()
@@ -2,7 +2,7 @@
 
 import { useExecutions } from "@/contexts/execution-context"
 import { RunStatusResponse, TaskProgressStatus } from "@/types/api"
-import { ChevronUp, ChevronDown, Loader2, CheckCircle2, XCircle, Clock, Globe, Sparkles, Save } from "lucide-react"
+import { ChevronUp, ChevronDown, Loader2, CheckCircle2, XCircle, Clock, Globe, Sparkles, Save, Ban } from "lucide-react"
 import { cn } from "@/lib/utils"
 
 function formatAction(action: string | undefined): string {
@@ -19,22 +19,30 @@ function TaskProgressItem({ task }: { task: TaskProgressStatus }) {
     pending: <Clock className="w-3 h-3 text-muted-foreground" />,
     running: <Loader2 className="w-3 h-3 animate-spin text-blue-500" />,
     completed: <CheckCircle2 className="w-3 h-3 text-green-500" />,
-    failed: <XCircle className="w-3 h-3 text-red-500" />
+    failed: <XCircle className="w-3 h-3 text-red-500" />,
+    cancelled: <Ban className="w-3 h-3 text-muted-foreground" />
   }
 
   return (
     <div className="flex items-center gap-2 text-xs py-1">
       {statusIcons[task.status]}
       <span className="font-medium min-w-[100px]">{task.persona}</span>
+      {task.status === "pending" && task.queue_position != null && (
+        <span className="text-muted-foreground">#{task.queue_position} in queue</span>
+      )}
       {task.status === "running" && (
         <span className="text-muted-foreground">
           Step {task.current_step}/{task.max_steps}
           {task.current_action && ` - ${formatAction(task.current_action)}`}
+          {!!task.llm_wait_seconds && ` · LLM queue ${Math.round(task.llm_wait_seconds)}s`}
         </span>
       )}
       {task.status === "completed" && (
         <span className="text-green-600">Done</span>
       )}
+      {task.status === "cancelled" && (
+        <span className="text-muted-foreground">Cancelled</span>
+      )}
       {task.status === "failed" && (
         <span className="text-red-600 truncate max-w-[200px]">
           {task.error || "Failed"}
@@ -21,6 +21,8 @@ import {
   GenerateMoreTasksRequest,
   GenerateMoreTasksResponse,
   FrictionHotspotItem,
+  PersonaRunPage,
+  ScenarioSummary,
 } from "@/types/api";
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL ||
@@ -56,6 +58,9 @@ async function apiFetch<T>(
 export const scenarioApi = {
   list: () => apiFetch<Scenario[]>("/api/scenarios"),
 
+  /** Scenarios without tasks and crawler output, for list views */
+  listSummaries: () => apiFetch<ScenarioSummary[]>("/api/scenarios?fields=summary"),
+
   get: (id: string) => apiFetch<Scenario>(`/api/scenarios/${id}`),
 
   create: (data: CreateScenarioRequest) =>
@@ -91,30 +96,51 @@ export const scenarioApi = {
     }),
 };
 
+type PersonaRunFilters = {
+  configId?: string;
+  personaType?: string;
+  reportId?: string;
+  status?: string;
+  platform?: string;
+  limit?: number;
+  offset?: number;
+  cursor?: string;
+  fields?: "summary" | string; // Comma-separated fields; responses then only carry those
+};
+
+function personaRunsQuery(filters?: PersonaRunFilters): string {
+  const params = new URLSearchParams();
+  if (filters?.configId) params.append("config_id", filters.configId);
+  if (filters?.personaType) params.append("persona_type", filters.personaType);
+  if (filters?.reportId) params.append("report_id", filters.reportId);
+  if (filters?.status) params.append("status", filters.status);
+  if (filters?.platform) params.append("platform", filters.platform);
+  if (filters?.limit) params.append("limit", filters.limit.toString());
+  if (filters?.offset) params.append("offset", filters.offset.toString());
+  if (filters?.cursor) params.append("cursor", filters.cursor);
+  if (filters?.fields) params.append("fields", filters.fields);
+  return params.toString() ? `?${params.toString()}` : "";
+}
+
 /**
  * Persona Run Records API methods
  */
 export const personaRecordsApi = {
-  list: (filters?: {
-    configId?: string;
-    personaType?: string;
-    reportId?: string;
-    status?: string;
-    platform?: string;
-    limit?: number;
-    offset?: number;
-  }) => {
-    const params = new URLSearchParams();
-    if (filters?.configId) params.append("config_id", filters.configId);
-    if (filters?.personaType) params.append("persona_type", filters.personaType);
-    if (filters?.reportId) params.append("report_id", filters.reportId);
-    if (filters?.status) params.append("status", filters.status);
-    if (filters?.platform) params.append("platform", filters.platform);
-    if (filters?.limit) params.append("limit", filters.limit.toString());
-    if (filters?.offset) params.append("offset", filters.offset.toString());
-
-    const query = params.toString() ? `?${params.toString()}` : "";
-    return apiFetch<PersonaRun[]>(`/api/persona-runs${query}`);
+  list: (filters?: PersonaRunFilters) => apiFetch<PersonaRun[]>(`/api/persona-runs${personaRunsQuery(filters)}`),
+
+  /**
+   * One page of runs, newest first, plus the cursor of the next page
+   * (null on the last page). Pass nextCursor back as filters.cursor.
+   */
+  listPage: async (filters?: PersonaRunFilters): Promise<PersonaRunPage> => {
+    const response = await fetch(`${API_BASE_URL}/api/persona-runs${personaRunsQuery(filters)}`, {
+      headers: { "Content-Type": "application/json" },
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || `API error: ${response.status}`);
+    }
+    return { runs: await response.json(), nextCursor: response.headers.get("X-Next-Cursor") };
   },
 
   get: (id: string) => apiFetch<PersonaRun>(`/api/persona-runs/${id}`),
@@ -145,11 +171,12 @@ export const reportApi = {
     return apiFetch<ReportAggregate>(`/api/reports/aggregate${query}`);
   },
 
-  getRuns: (reportId: string, filters?: { persona?: string; status?: string; platform?: string }) => {
+  getRuns: (reportId: string, filters?: { persona?: string; status?: string; platform?: string; fields?: string }) => {
     const params = new URLSearchParams();
     if (filters?.persona && filters.persona !== "all") params.append("persona", filters.persona);
     if (filters?.status && filters.status !== "all") params.append("status", filters.status);
     if (filters?.platform && filters.platform !== "all") params.append("platform", filters.platform);
+    if (filters?.fields) params.append("fields", filters.fields);
 
     const query = params.toString() ? `?${params.toString()}` : "";
     return apiFetch<PersonaRun[]>(`/api/reports/${reportId}/runs${query}`);
@@ -210,6 +237,11 @@ export const personaExecutionApi = {
   getStatus: (runId: string) =>
     apiFetch<RunStatusResponse>(`/api/persona/run/${runId}/status`),
 
+  cancel: (runId: string) =>
+    apiFetch<RunStatusResponse>(`/api/persona/run/${runId}/cancel`, {
+      method: "POST",
+    }),
+
   acknowledgeCompletion: (runId: string) =>
     apiFetch<void>(`/api/persona/run/${runId}`, {
       method: "DELETE",
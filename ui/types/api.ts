@@ -56,6 +56,15 @@ export interface Scenario {
   selected_task_indices?: number[];
 }
 
+/**
+ * Scenario Summary
+ * Scenario list item from /api/scenarios?fields=summary (no tasks or crawler output)
+ */
+export type ScenarioSummary = Omit<
+  Scenario,
+  "tasks" | "tasks_metadata" | "discovered_urls" | "crawler_final_result" | "crawler_extracted_content"
+>;
+
 export interface CreateScenarioRequest {
   name: string;
   website_url: string;
@@ -184,6 +193,24 @@ export interface PersonaRun {
   events: any[];
 }
 
+/**
+ * Persona Run Summary
+ * Run list item with fields=summary (no events, judgement or long task texts)
+ */
+export type PersonaRunSummary = Omit<
+  PersonaRun,
+  "events" | "judgement_data" | "final_result" | "task_description" | "task_steps"
+>;
+
+/**
+ * Persona Run Page
+ * One keyset-paginated page of /api/persona-runs (cursor from the X-Next-Cursor header)
+ */
+export interface PersonaRunPage {
+  runs: PersonaRun[];
+  nextCursor: string | null;
+}
+
 export interface CreatePersonaRunRequest {
   config_id: string;
   report_id?: string;
@@ -226,6 +253,8 @@ export interface SankeyNode {
   friction_reasons?: FrictionReason[];
   friction_impact?: number;
   example_run_ids?: string[];
+  step?: number; // Full (step-based) mode only
+  other_count?: number; // Pages folded into an "Other" node by server-side pruning
 }
 
 /**
@@ -258,7 +287,10 @@ export interface MetricsSummary {
   error_runs: number;
   success_rate: number;
   avg_duration_seconds: number;
+  min_duration_seconds: number;
+  max_duration_seconds: number;
   avg_steps: number;
+  max_steps: number;
 }
 
 /**
@@ -303,13 +335,15 @@ export interface PersonaExecutionResponse {
 export interface TaskProgressStatus {
   task_index: number;
   persona: string;
-  status: "pending" | "running" | "completed" | "failed";
+  status: "pending" | "running" | "completed" | "failed" | "cancelled";
   current_step: number;
   max_steps: number;
   current_action?: string;
   current_url?: string;
   started_at?: string;
   error?: string;
+  queue_position?: number;
+  llm_wait_seconds?: number;
 }
 
 /**
@@ -321,13 +355,15 @@ export interface RunStatusResponse {
   scenario_id: string;
   scenario_name?: string;
   run_type: "persona_run" | "scenario_analysis";
-  status: "in_progress" | "completed" | "partial_failure" | "failed";
+  priority?: "interactive" | "batch";
+  status: "in_progress" | "completed" | "partial_failure" | "failed" | "cancelled";
   total_tasks: number;
   completed_tasks: number;
   failed_tasks: number;
   agent_run_ids: string[];
   task_progress: TaskProgressStatus[];
   started_at?: string;
+  queue_position?: number;
   logs: string[];
 }
 